@@ -1,6 +1,34 @@
+import asyncio
+import json
 import logging
 import threading
-from .mqtt_client import MQTTClient
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from .adaptive_rate import AdaptiveSampleRate
+from .at_config import io_settings, sample_rate_bytes
+from .frame_recorder import FrameRecorder
+from .history import SampleHistory
+from .line_map import LineMap
+from .metrics import DEFAULT_SUMMARY_INTERVAL_S, METRICS, configure_sample_log
+from .mqtt_client import (
+    DEFAULT_RECONNECT_MAX_S,
+    DEFAULT_RECONNECT_MIN_S,
+    DEFAULT_REPLAY_RATE,
+    PROTOCOL_311,
+    STREAM_STATS,
+    STREAM_STATUS,
+    MQTTClient,
+)
+from .mqtt_payloads import NodePayloads
+from .node_state import DEFAULT_TOPIC_BASE, NodeState, set_time_zone
+from .provisioning import Provisioner, remote_settings
+from .publish_policy import PublishFilter
+from .publish_queue import PublishQueue
+from .radios import DEFAULT_RADIO, Radio, radio_configs
+from .spool import DiskSpool
+from .supervisor import RadioSupervisor
 from .xbee_device_handler import XBeeDeviceHandler
 
 _LOGGER = logging.getLogger(__name__)
@@ -8,19 +36,73 @@ _LOGGER.warning("xbee_bridge __init__.py file loaded")
 
 DOMAIN = "xbee_bridge"
 
+ENGINE_DIGI = "digi"  # digi-xbee library with its reader threads
+ENGINE_ASYNCIO = "asyncio"  # asyncio serial transport on the HA event loop
+ENGINE_PROCESS = "process"  # asyncio engine in a worker process, samples via shared memory
+ENGINES = (ENGINE_DIGI, ENGINE_ASYNCIO, ENGINE_PROCESS)
+
+# Config keys grouped by what has to be redone when they change on reload
+SERIAL_KEYS = ("port", "baud_rate", "engine", "api_mode", "process")
+MQTT_KEYS = (
+    "mqtt_broker", "mqtt_port", "mqtt_user", "mqtt_password",
+    "mqtt_protocol", "mqtt_max_inflight", "mqtt_topic_aliases", "mqtt_qos", "mqtt_message_expiry_s",
+    "mqtt_reconnect_min_s", "mqtt_reconnect_max_s",
+)
+PAYLOAD_KEYS = ("publish_format", "mqtt_discovery", "discovery_prefix")
+
+# 64-bit address of the placeholder node the test_publish service publishes for
+TEST_NODE_ADDRESS = bytes(8)
+
+
+def changed_keys(old_conf, new_conf, keys):
+    return [key for key in keys if old_conf.get(key) != new_conf.get(key)]
+
+
+def create_mqtt_client(conf, spool):
+    replay_rate = (conf.get("spool") or {}).get("replay_rate", DEFAULT_REPLAY_RATE)
+    return MQTTClient(
+        conf.get("mqtt_broker", "localhost"),
+        conf.get("mqtt_port", 1883),
+        conf.get("mqtt_user"),
+        conf.get("mqtt_password"),
+        spool,
+        replay_rate,
+        protocol=conf.get("mqtt_protocol", PROTOCOL_311),
+        max_inflight=conf.get("mqtt_max_inflight"),
+        topic_aliases=conf.get("mqtt_topic_aliases", True),
+        qos=conf.get("mqtt_qos"),
+        message_expiry_s=conf.get("mqtt_message_expiry_s"),
+        reconnect_min_s=conf.get("mqtt_reconnect_min_s", DEFAULT_RECONNECT_MIN_S),
+        reconnect_max_s=conf.get("mqtt_reconnect_max_s", DEFAULT_RECONNECT_MAX_S),
+    )
+
+
+def prepare_handler(handler, force_configure=False):
+    """
+    Open and configure the device and register the sample callback (blocking, run in
+    the executor). `force_configure` writes every setting without reading it first.
+    """
+    _LOGGER.warning("xbee_bridge: about to call handler.open_device() N2")
+    handler.open_device()
+    _LOGGER.warning("xbee_bridge: handler.open_device() succeeded N3")
+    try:
+        handler.configure_device(force_configure)
+        handler.register_io_sample_callback()
+    except Exception:
+        handler.close_device()
+        raise
+
+
 def start_xbee_listener(handler, stop_event):
-    # This will run in a background thread
+    # This will run in a background thread; samples arrive on digi's reader thread,
+    # this one only holds the device until stop_event is set
     _LOGGER.warning("xbee_bridge: start_xbee_listener called N1")
     try:
-        _LOGGER.warning("xbee_bridge: about to call handler.open_device() N2")
-        handler.open_device()
-        _LOGGER.warning("xbee_bridge: handler.open_device() succeeded N3")
-        handler.configure_device()
-        handler.register_io_sample_callback()
+        # The handler is normally prepared at setup and handed over already open
+        if handler.device is None or not handler.device.is_open():
+            prepare_handler(handler)
         _LOGGER.info("XBee listener started, running until stopped...")
-        while not stop_event.is_set():
-            import time
-            time.sleep(1)
+        stop_event.wait()
     except Exception as e:
         _LOGGER.error(f"XBee listener stopped: {e}", exc_info=True)
     finally:
@@ -36,126 +118,673 @@ def start_xbee_listener(handler, stop_event):
 async def async_setup(hass, config):
     _LOGGER.info("XBee Bridge initializing...")
     _LOGGER.warning("xbee_bridge async_setup() called")
+    setup_started = time.monotonic()
+    background_s = 0.0  # Time spent in executor jobs, off the event loop
     conf = config.get(DOMAIN, {})
-    broker = conf.get("mqtt_broker", "localhost")
-    port = conf.get("mqtt_port", 1883)
-    username = conf.get("mqtt_user")
-    password = conf.get("mqtt_password")
     debug_mode = conf.get("debug_mode", False)
-    xbee_port = conf.get("port", "/dev/ttyUSB1")
-    baud_rate = conf.get("baud_rate", 57600)
-    sample_rate_ms = conf.get("sample_rate_ms", 1000)
 
     # Save config for reload use
     hass.data.setdefault(DOMAIN, {})["config"] = conf
+    data = hass.data[DOMAIN]
+    data["publish_filter"] = PublishFilter.from_config(conf.get("publish"))
+    data["payloads"] = NodePayloads.from_config(conf)
+    # Line modes and value conversion, compiled into lookup tables once
+    try:
+        data["line_map"] = LineMap.from_config(conf.get("line_map"))
+    except (KeyError, TypeError, ValueError) as e:
+        _LOGGER.error(f"Invalid line map: {e}")
+        return False
+    # Sample times are formatted in the HA time zone, looked up once here
+    from homeassistant.util import dt as dt_util
+    set_time_zone(dt_util.DEFAULT_TIME_ZONE)
+    # Per-sample logging is off by default; a summary is logged every interval instead
+    configure_sample_log(
+        conf.get("log_samples", False), conf.get("log_summary_interval_s", DEFAULT_SUMMARY_INTERVAL_S)
+    )
 
     # Disconnect and cleanup old client if present
-    if DOMAIN in hass.data and "mqtt_client" in hass.data[DOMAIN]:
-        old_client = hass.data[DOMAIN]["mqtt_client"]
-        old_client.disconnect()
+    if "mqtt_client" in data:
+        old_client = data["mqtt_client"]
+        await hass.async_add_executor_job(old_client.disconnect)
 
-    # Create and connect new MQTT client
-    mqtt = MQTTClient(broker, port, username, password)
+    # Optional store-and-forward spool, kept across reloads
+    spool = data.get("spool")
+    if spool is None and conf.get("spool") is not None:
+        spool = await hass.async_add_executor_job(
+            DiskSpool.from_config, conf["spool"], hass.config.path("xbee_bridge_spool.bin")
+        )
+        data["spool"] = spool
+
+    # Optional raw API frame recording, for replay through src/xbee_simulator.py
+    if conf.get("record_frames") and data.get("recorder") is None:
+        data["recorder"] = await hass.async_add_executor_job(FrameRecorder, conf["record_frames"])
+
+    # Create and connect new MQTT client; connect() returns at once and the
+    # connection completes on paho's thread
+    try:
+        mqtt = create_mqtt_client(conf, spool)
+    except ValueError as e:
+        _LOGGER.error(f"Invalid MQTT configuration: {e}")
+        return False
     mqtt.connect()
-    hass.data[DOMAIN]["mqtt_client"] = mqtt
+    data["mqtt_client"] = mqtt
+
+    # Test values go to the topics of a placeholder node, as real samples would
+    async def publish_test_values():
+        topic_base = data["config"].get("topic_base", DEFAULT_TOPIC_BASE)
+        node = NodeState(TEST_NODE_ADDRESS, topic_base, data["line_map"])
+        await hass.async_add_executor_job(data["mqtt_client"].publish_constant_test, node, f"{topic_base}/status")
 
     async def handle_test_publish(call):
         _LOGGER.warning("xbee_bridge: Test publish service called")
-        await hass.async_add_executor_job(hass.data[DOMAIN]["mqtt_client"].publish_constant_test)
+        await publish_test_values()
     hass.services.async_register(DOMAIN, "test_publish", handle_test_publish)
 
     ## Debug mode: only send test MQTT messages, skip XBee setup
     if debug_mode:
         _LOGGER.warning("Running in debug_mode: publishing constant test values.")
-        await hass.async_add_executor_job(hass.data[DOMAIN]["mqtt_client"].publish_constant_test)
+        await publish_test_values()
 
     ## Real mode: Use XBee device handler
-    # 1. Only check device availability here
-    try:
-        test_device = XBeeDeviceHandler(xbee_port, baud_rate, sample_rate_ms)
-        test_device.open_device()
-        test_device.close_device()
-        _LOGGER.info("XBee device available and port can be opened/closed")
-    except Exception as e:
-        _LOGGER.error(f"XBee device unavailable at setup: {e}")
-        _LOGGER.error("xbee_bridge: Returning False from async_setup due to XBee device error")
-        return False
+    # Everything below reads the current config and pipeline objects from hass.data,
+    # so reload can swap them individually while the serial port stays open.
 
-    # 2. XBee data callback: always use latest mqtt_client from hass.data
-    # Called whenever new sensor data is available
-    # Publish each value to MQTT
-    def xbee_data_callback(data):
-        _LOGGER.warning(f"xbee_bridge: Received XBee data: {data}")
-        mqtt_client = hass.data[DOMAIN].get("mqtt_client")
-        if mqtt_client:
-            for key, value in data.items():
-                topic = f"home/sensors/xbee/{key}"
-                mqtt_client.client.publish(topic, str(value), retain=True)
-                _LOGGER.info(f"Published {key}: {value} to {topic}")
-        else:
+    # 1. Publisher stage: always use latest mqtt_client from hass.data
+    # Runs on the publish queue's own thread, never on the XBee reader thread
+    def mqtt_publish(topic, payload, retain, stream):
+        mqtt_client = data.get("mqtt_client")
+        if not mqtt_client:
             _LOGGER.error("No mqtt_client available to publish data!")
+            return False
+        return mqtt_client.publish(topic, payload, retain=retain, stream=stream)
+
+    def start_publish_queue(conf):
+        """Start a queue and swap it in; returns the previous one, still to be stopped (it drains)."""
+        publish_queue = PublishQueue.from_config(mqtt_publish, conf.get("publish_queue"))
+        publish_queue.start()
+        old_queue = data.get("publish_queue")
+        data["publish_queue"] = publish_queue
+        return old_queue
+
+    start_publish_queue(conf)
+
+    # Gauges pulled into METRICS snapshots (diagnostic sensors, stats topic)
+    METRICS.add_source("publish_queue", lambda: data["publish_queue"].stats())
+    METRICS.add_source("publish_filter", lambda: data["publish_filter"].stats())
+    if spool is not None:
+        METRICS.add_source("spool", spool.stats)
+
+    # Optional native entities fed through the dispatcher, skipping the MQTT round-trip;
+    # MQTT then only mirrors the samples if mqtt_mirror is on
+    if conf.get("entities", False):
+        from .entity_updates import EntityUpdates
+        data["entity_updates"] = EntityUpdates(hass)
+        METRICS.add_source("entity_updates", data["entity_updates"].stats)
+
+    # Optional adaptive sample rate: IR follows how much the analog lines move
+    def create_adaptive_rate(conf):
+        if conf.get("adaptive_rate") is None:
+            return None
+        return AdaptiveSampleRate.from_config(conf["adaptive_rate"], io_settings(conf)[0])
+
+    data["adaptive_rate"] = create_adaptive_rate(conf)
+    METRICS.add_source("sample_rate", lambda: data["adaptive_rate"].stats() if data["adaptive_rate"] else None)
+
+    # Optional raw history of fast analog lines, published as window aggregates
+    def start_history(conf):
+        unsubscribe = data.pop("history_unsub", None)
+        if unsubscribe is not None:
+            unsubscribe()
+        if conf.get("aggregate") is None:
+            data["history"] = None
+            return
+        from homeassistant.helpers.event import async_track_time_interval
+        history = data["history"] = SampleHistory.from_config(conf["aggregate"])
+
+        def publish_windows(now):
+            history.queue_windows(data["publish_queue"], data["payloads"])
+
+        data["history_unsub"] = async_track_time_interval(hass, publish_windows, timedelta(seconds=history.window_s))
+
+    start_history(conf)
+    METRICS.add_source("history", lambda: data["history"].stats() if data["history"] else None)
+
+    async def apply_sample_rate(address, sample_rate_ms):
+        """
+        Write IR to the node with 64-bit `address` only: on the local module of the radio
+        it belongs to, or with a remote AT command through the radio that hears it.
+        """
+        for radio in list(data["radios"].values()):
+            acquisition = radio.acquisition
+            if not radio.connected() or acquisition is None:
+                continue
+            try:
+                if address == acquisition.local_address:
+                    await radio_call(radio, "set_sample_rate", sample_rate_ms)
+                elif acquisition.nodes.get(address) is not None:
+                    await radio_call(radio, "configure_remote", address, {"IR": sample_rate_bytes(sample_rate_ms)})
+                else:
+                    continue
+            except Exception:
+                _LOGGER.exception(f"Failed to update sample rate of {address.hex().upper()} on {radio.name}")
+            return
+
+    def schedule_sample_rate(address, sample_rate_ms):
+        # Called from the data callback, which may be the digi reader thread; AT commands
+        # cannot be sent from that thread, so the write is handed to the event loop
+        hass.loop.call_soon_threadsafe(hass.async_create_task, apply_sample_rate(address, sample_rate_ms))
 
-    # 3. Helper to start handler
-    def start_handler():
+    # XBee data callback: called with the NodeState of the node that sent new sensor data
+    # Push it to the entities, and queue changed values (per the publish policies) for
+    # the node's own MQTT topics, or the whole node as one JSON document
+    def xbee_data_callback(node):
+        _LOGGER.debug("xbee_bridge: Received XBee data from %s: %s", node.address_hex, node.values)
+        now = time.monotonic()
+        adaptive_rate = data["adaptive_rate"]
+        if adaptive_rate is not None:
+            sample_rate_ms = adaptive_rate.observe(node, now)
+            if sample_rate_ms is not None:
+                schedule_sample_rate(node.address, sample_rate_ms)
+        entity_updates = data.get("entity_updates")
+        if entity_updates is not None:
+            entity_updates.push(node)
+            if not data["config"].get("mqtt_mirror", True):
+                return
+        # Aggregated lines go to the history only and are left out of the publish filter
+        history = data["history"]
+        aggregated = history.record(node, node.last_seen) if history is not None else ()
+        selected = data["publish_filter"].select(node, now, aggregated)
+        data["payloads"].queue(data["publish_queue"], node, selected, aggregated)
+
+    # Publish each radio's local module status once its device is open
+    def status_callback_for(radio):
+        def xbee_status_callback(status):
+            topic_base = data["config"].get("topic_base", DEFAULT_TOPIC_BASE)
+            data["publish_queue"].put(radio.topic(topic_base, "status"), status, True, STREAM_STATUS)
+        return xbee_status_callback
+
+    def acquisition_settings(conf, address=None):
+        """
+        (IR milliseconds, IC mask) to configure a node with; with an adaptive rate, the
+        IR that node (64-bit `address`) currently runs at.
+        """
+        sample_rate_ms, change_detect = io_settings(conf)
+        if data["adaptive_rate"] is not None and address is not None:
+            sample_rate_ms = data["adaptive_rate"].rate_for(address)
+        return sample_rate_ms, change_detect
+
+    # 2. Helpers to start/stop the engine of a radio: the asyncio engine runs on the event
+    # loop, the process engine in a worker process drained from the event loop
+    async def start_engine(radio):
+        conf = radio.conf
+        sample_rate_ms, change_detect = acquisition_settings(conf)
+        if conf.get("engine") == ENGINE_PROCESS:
+            from .process_engine import ProcessXBeeEngine
+            engine = ProcessXBeeEngine.from_config(conf, sample_rate_ms, change_detect, data["line_map"])
+        else:
+            from .async_engine import AsyncXBeeEngine
+            engine = AsyncXBeeEngine(
+                conf.get("port", "/dev/ttyUSB1"),
+                conf.get("baud_rate", 57600),
+                sample_rate_ms,
+                conf.get("topic_base", DEFAULT_TOPIC_BASE),
+                conf.get("api_mode", 1),
+                change_detect,
+                data["line_map"],
+            )
+        engine.set_data_callback(xbee_data_callback)
+        engine.set_status_callback(status_callback_for(radio))
+        engine.set_frame_recorder(data.get("recorder"))
+        engine.set_lost_callback(radio.notify_lost)
+        await engine.start()
+        radio.engine = engine
+
+    async def stop_engine(radio):
+        engine, radio.engine = radio.engine, None
+        if engine:
+            await engine.stop()
+            _LOGGER.info("XBee engine %s stopped: %s", radio.name, engine.stats())
+
+    # 3. Helpers to create and start the handler of a radio
+    def create_handler(radio):
+        conf = radio.conf
+        sample_rate_ms, change_detect = acquisition_settings(conf)
+        handler = XBeeDeviceHandler(
+            conf.get("port", "/dev/ttyUSB1"),
+            conf.get("baud_rate", 57600),
+            sample_rate_ms,
+            conf.get("topic_base", DEFAULT_TOPIC_BASE),
+            change_detect,
+            data["line_map"],
+        )
+        handler.set_data_callback(xbee_data_callback)
+        handler.set_status_callback(status_callback_for(radio))
+        handler.set_frame_recorder(data.get("recorder"))
+        return handler
+
+    def start_handler(radio, handler):
         _LOGGER.warning("xbee_bridge: start_handler called N1")
         stop_event = threading.Event()
-        handler = XBeeDeviceHandler(xbee_port, baud_rate, sample_rate_ms)
-        handler.set_data_callback(xbee_data_callback)
-        thread = threading.Thread(target=start_xbee_listener, args=(handler, stop_event), daemon=True)
+        thread = threading.Thread(
+            target=start_xbee_listener, args=(handler, stop_event), name=f"xbee_bridge_{radio.name}", daemon=True
+        )
         thread.start()
         _LOGGER.warning("xbee_bridge: start_handler called N2")
-        return handler, thread, stop_event
-
-    # 4. Helper to stop handler
-    def stop_handler():
-        stop_event = hass.data[DOMAIN].get("stop_event")
-        if stop_event:
-            stop_event.set()
-        thread = hass.data[DOMAIN].get("thread")
-        if thread:
-            thread.join(timeout=5)
-        _LOGGER.info("XBee handler stopped.")
-
-    # 5. Store everything in hass.data
-    if DOMAIN not in hass.data:
-        hass.data[DOMAIN] = {}
-
-    handler, thread, stop_event = start_handler()
-    hass.data[DOMAIN]["handler"] = handler
-    hass.data[DOMAIN]["thread"] = thread
-    hass.data[DOMAIN]["stop_event"] = stop_event
-
-    # 6. Reload service
+        radio.handler, radio.thread, radio.stop_event = handler, thread, stop_event
+
+    # 4. Helper to stop the handler of a radio
+    def stop_handler(radio):
+        if radio.stop_event:
+            radio.stop_event.set()
+        if radio.thread:
+            radio.thread.join(timeout=5)
+        if radio.handler:
+            _LOGGER.info("XBee handler %s: %s", radio.name, radio.handler.stats())
+        radio.handler, radio.thread, radio.stop_event = None, None, None
+        _LOGGER.info("XBee handler %s stopped.", radio.name)
+
+    def log_pipeline_stats():
+        data["publish_filter"].log_stats()
+        _LOGGER.info("Publish queue: %s", data["publish_queue"].stats())
+        if data.get("spool") is not None:
+            _LOGGER.info("Spool: %s", data["spool"].stats())
+
+    async def start_radio(radio):
+        """Open, configure and start one radio. A failure is recorded on the radio, not raised."""
+        try:
+            engine = radio.conf.get("engine", ENGINE_DIGI)
+            if engine not in ENGINES:
+                raise ValueError(f"Unknown engine: {engine}")
+            if engine != ENGINE_DIGI:
+                await start_engine(radio)
+            else:
+                # Open and configure the device off the event loop, and hand the
+                # open device to the listener thread
+                handler = create_handler(radio)
+                await hass.async_add_executor_job(
+                    prepare_handler, handler, radio.conf.get("force_configure", False)
+                )
+                start_handler(radio, handler)
+        except Exception as e:  # noqa: BLE001
+            radio.failed(e)
+            return False
+        radio.started()
+        if data["adaptive_rate"] is not None:
+            # The local module was just configured with the base IR
+            data["adaptive_rate"].forget(radio.acquisition.local_address)
+        _LOGGER.info("XBee radio %s opened and configured on %s", radio.name, radio.conf.get("port"))
+        return True
+
+    async def stop_radio(radio):
+        if radio.engine is not None:
+            await stop_engine(radio)
+        elif radio.handler is not None:
+            await hass.async_add_executor_job(stop_handler, radio)
+
+    async def radio_call(radio, method, *args):
+        """Call a method of a radio's acquisition: awaited on the engine, in the executor on the handler."""
+        if radio.engine is not None:
+            await getattr(radio.engine, method)(*args)
+        elif radio.handler is not None:
+            await hass.async_add_executor_job(getattr(radio.handler, method), *args)
+
+    async def restart_radio(radio):
+        async with radio.lock:
+            await stop_radio(radio)
+            return await start_radio(radio)
+
+    async def request_sample(radio):
+        await radio_call(radio, "request_sample")
+
+    # Optional per-radio supervisor: watchdog on the sample flow and reopen with backoff
+    def supervise_enabled(conf):
+        return (conf.get("supervisor") or {}).get("enabled", True)
+
+    supervise = supervise_enabled(conf)
+
+    def add_supervisor(radio):
+        if not supervise_enabled(data["config"]):
+            return
+        radio.supervisor = RadioSupervisor.from_config(
+            radio, restart_radio, request_sample, data["config"].get("supervisor") or {}
+        )
+        radio.supervisor.start()
+
+    # 5. Start every radio and store them in hass.data; the radios open concurrently,
+    # and one that is missing does not keep the others from running
+    try:
+        configs = radio_configs(conf)
+    except ValueError as e:
+        _LOGGER.error(f"Invalid radios configuration: {e}")
+        return False
+    data["radios"] = {name: Radio(name, radio_conf) for name, radio_conf in configs.items()}
+    started = time.monotonic()
+    results = await asyncio.gather(*(start_radio(radio) for radio in data["radios"].values()))
+    background_s += time.monotonic() - started
+    if not any(results) and not supervise:
+        _LOGGER.error("xbee_bridge: Returning False from async_setup due to XBee device error")
+        return False
+    # The supervisors keep reopening radios that are missing now, e.g. a stick plugged in later
+    for radio in data["radios"].values():
+        add_supervisor(radio)
+
+    def radios_stats():
+        radios = data["radios"]
+        return {
+            "configured": len(radios),
+            "connected": sum(radio.connected() for radio in radios.values()),
+            "radios": {name: radio.stats() for name, radio in radios.items()},
+        }
+
+    METRICS.add_source("radios", radios_stats)
+    METRICS.add_source("mqtt", lambda: data["mqtt_client"].stats())
+
+    async def reconfigure_radio(radio, line_map_changed, topic_base_changed):
+        """Apply the reloaded IO settings to a running radio without reopening it."""
+        acquisition = radio.acquisition
+        sample_rate_ms, change_detect = acquisition_settings(radio.conf, acquisition.local_address)
+        if sample_rate_ms != acquisition.sample_rate_ms:
+            try:
+                await radio_call(radio, "set_sample_rate", sample_rate_ms)
+            except Exception:
+                _LOGGER.exception(f"Failed to update sample rate on {radio.name}")
+        if change_detect != acquisition.change_detect:
+            try:
+                await radio_call(radio, "set_change_detection", change_detect)
+            except Exception:
+                _LOGGER.exception(f"Failed to update change detection on {radio.name}")
+        if line_map_changed:
+            try:
+                await radio_call(radio, "set_line_map", data["line_map"])
+                _LOGGER.info("Line map updated on %s", radio.name)
+            except Exception:
+                _LOGGER.exception(f"Failed to update line map on {radio.name}")
+        if topic_base_changed:
+            acquisition.nodes.set_topic_base(radio.conf.get("topic_base", DEFAULT_TOPIC_BASE))
+            if acquisition.status:
+                status_callback_for(radio)(acquisition.status)
+
+    # 6. Reload service: diff the new config against the running one and
+    # only redo what changed; the serial ports and broker session stay up otherwise.
+    # Reloads run one at a time: each tears down and starts parts of the pipeline
+    reload_lock = asyncio.Lock()
+
     async def handle_reload(call):
         _LOGGER.warning("xbee_bridge: Reload service called")
-        await hass.async_add_executor_job(stop_handler)
+        async with reload_lock:
+            await reload_config()
 
-        # Disconnect MQTT client before restarting
+    async def reload_config():
+        from homeassistant.config import async_hass_config_yaml
+        from homeassistant.exceptions import HomeAssistantError
         try:
-            old_mqtt = hass.data[DOMAIN].get("mqtt_client")
-            if old_mqtt:
-                old_mqtt.disconnect()
-                _LOGGER.info("Disconnected old MQTT client.")
-        except Exception as e:
-            _LOGGER.error(f"Error disconnecting MQTT client: {e}")
-
-        # Re-create and connect new MQTT client using saved config
-        conf = hass.data[DOMAIN].get("config", {})
-        broker = conf.get("mqtt_broker", "localhost")
-        port = conf.get("mqtt_port", 1883)
-        username = conf.get("mqtt_user")
-        password = conf.get("mqtt_password")
-        new_mqtt = MQTTClient(broker, port, username, password)
-        new_mqtt.connect()
-        hass.data[DOMAIN]["mqtt_client"] = new_mqtt
-
-        new_handler, new_thread, new_stop_event = await hass.async_add_executor_job(start_handler)
-        hass.data[DOMAIN]["handler"] = new_handler
-        hass.data[DOMAIN]["thread"] = new_thread
-        hass.data[DOMAIN]["stop_event"] = new_stop_event
+            new_conf = (await async_hass_config_yaml(hass)).get(DOMAIN, {})
+            new_configs = radio_configs(new_conf)
+        except (HomeAssistantError, ValueError) as e:
+            _LOGGER.error(f"Could not read configuration for reload: {e}")
+            return
+        old_conf = data.get("config", {})
+        if new_conf == old_conf:
+            _LOGGER.info("xbee_bridge: Reload found no configuration changes.")
+            return
+        data["config"] = new_conf
+
+        if new_conf.get("adaptive_rate") != old_conf.get("adaptive_rate"):
+            data["adaptive_rate"] = create_adaptive_rate(new_conf)
+            _LOGGER.info("Adaptive sample rate %s", "updated" if data["adaptive_rate"] else "disabled")
+
+        line_map_changed = new_conf.get("line_map") != old_conf.get("line_map")
+        if line_map_changed:
+            try:
+                data["line_map"] = LineMap.from_config(new_conf.get("line_map"))
+            except (KeyError, TypeError, ValueError) as e:
+                _LOGGER.error(f"Invalid line map, keeping the current one: {e}")
+                line_map_changed = False
+
+        # Radios: only a removed, added or re-wired radio is stopped or (re)opened,
+        # every other radio keeps its port open
+        radios = data["radios"]
+        # New supervisor settings: every supervisor is replaced once the radios are settled
+        supervisor_changed = new_conf.get("supervisor") != old_conf.get("supervisor")
+        if supervisor_changed:
+            for radio in radios.values():
+                if radio.supervisor is not None:
+                    await radio.supervisor.stop()
+                    radio.supervisor = None
+        for name in [name for name in radios if name not in new_configs]:
+            _LOGGER.info("Radio %s removed, stopping it", name)
+            radio = radios.pop(name)
+            if radio.supervisor is not None:
+                await radio.supervisor.stop()
+            async with radio.lock:
+                await stop_radio(radio)
+        restart = []
+        added = []
+        for name, radio_conf in new_configs.items():
+            radio = radios.get(name)
+            if radio is None:
+                _LOGGER.info("Radio %s added", name)
+                radio = radios[name] = Radio(name, radio_conf)
+                restart.append(radio)
+                added.append(radio)
+                continue
+            serial_changes = changed_keys(radio.conf, radio_conf, SERIAL_KEYS)
+            if serial_changes:
+                _LOGGER.info("Serial settings of %s changed (%s), restarting it", name, ", ".join(serial_changes))
+                restart.append(radio)
+            radio.conf = radio_conf
+        topic_base_changed = new_conf.get("topic_base", DEFAULT_TOPIC_BASE) != old_conf.get(
+            "topic_base", DEFAULT_TOPIC_BASE
+        )
+        for radio in radios.values():
+            if radio not in restart and radio.acquisition is not None:
+                await reconfigure_radio(radio, line_map_changed, topic_base_changed)
+        if restart:
+            await asyncio.gather(*(restart_radio(radio) for radio in restart))
+            METRICS.inc("serial_reconnects", len(restart))
+            log_pipeline_stats()
+        for radio in radios.values() if supervisor_changed else added:
+            add_supervisor(radio)
+        if supervisor_changed:
+            _LOGGER.info("Radio supervisors %s", "restarted" if supervise_enabled(new_conf) else "disabled")
+        if topic_base_changed:
+            _LOGGER.info("Topic base changed to %s", new_conf.get("topic_base", DEFAULT_TOPIC_BASE))
+
+        # Publish policies: swapped atomically, per-node publish history is kept
+        if new_conf.get("publish") != old_conf.get("publish"):
+            data["publish_filter"] = PublishFilter.from_config(new_conf.get("publish"))
+            _LOGGER.info("Publish policies updated")
+
+        # Payload format and discovery: a fresh NodePayloads re-announces every node
+        if changed_keys(old_conf, new_conf, PAYLOAD_KEYS):
+            data["payloads"] = NodePayloads.from_config(new_conf)
+            _LOGGER.info("MQTT payload format updated")
+
+        if new_conf.get("aggregate") != old_conf.get("aggregate"):
+            start_history(new_conf)
+            _LOGGER.info("Line aggregation %s", "updated" if data["history"] else "disabled")
+
+        if new_conf.get("publish_queue") != old_conf.get("publish_queue"):
+            old_queue = start_publish_queue(new_conf)
+            if old_queue:
+                # Joins the publisher thread after draining, off the event loop
+                await hass.async_add_executor_job(old_queue.stop)
+            _LOGGER.info("Publish queue restarted")
+
+        configure_sample_log(
+            new_conf.get("log_samples", False), new_conf.get("log_summary_interval_s", DEFAULT_SUMMARY_INTERVAL_S)
+        )
+
+        if new_conf.get("spool") != old_conf.get("spool"):
+            _LOGGER.warning("Spool settings only take effect after a Home Assistant restart")
+        if new_conf.get("entities", False) != old_conf.get("entities", False):
+            _LOGGER.warning("Switching native entities on or off takes effect after a Home Assistant restart")
+        if new_conf.get("diagnostic_sensors", True) != old_conf.get("diagnostic_sensors", True):
+            _LOGGER.warning("Switching diagnostic sensors on or off takes effect after a Home Assistant restart")
+        if new_conf.get("record_frames") != old_conf.get("record_frames"):
+            _LOGGER.warning("Frame recording settings only take effect after a Home Assistant restart")
+
+        if new_conf.get("stats_interval_s") != old_conf.get("stats_interval_s"):
+            start_stats(new_conf)
+            _LOGGER.info("MQTT stats topic %s", "updated" if new_conf.get("stats_interval_s") else "disabled")
+
+        # Broker settings: connect the new client before dropping the old one
+        mqtt_changes = changed_keys(old_conf, new_conf, MQTT_KEYS)
+        new_mqtt = None
+        if mqtt_changes:
+            _LOGGER.info("MQTT settings changed (%s), reconnecting", ", ".join(mqtt_changes))
+            try:
+                new_mqtt = create_mqtt_client(new_conf, data.get("spool"))
+            except ValueError as e:
+                _LOGGER.error(f"Invalid MQTT configuration, keeping the current connection: {e}")
+        if new_mqtt is not None:
+            await hass.async_add_executor_job(new_mqtt.connect)
+            old_mqtt = data.get("mqtt_client")
+            data["mqtt_client"] = new_mqtt
+            try:
+                if old_mqtt:
+                    await hass.async_add_executor_job(old_mqtt.disconnect)
+                    _LOGGER.info("Disconnected old MQTT client.")
+            except Exception as e:
+                _LOGGER.error(f"Error disconnecting MQTT client: {e}")
+
         _LOGGER.info("xbee_bridge: Reload complete.")
 
     hass.services.async_register(DOMAIN, "reload", handle_reload)
 
+    # Restart a single radio, e.g. after its stick was plugged back in
+    async def handle_restart_radio(call):
+        name = call.data.get("radio", DEFAULT_RADIO)
+        radio = data["radios"].get(name)
+        if radio is None:
+            _LOGGER.error("xbee_bridge: No radio named %s", name)
+            return
+        _LOGGER.warning("xbee_bridge: Restarting radio %s", name)
+        await restart_radio(radio)
+        METRICS.inc("serial_reconnects")
+
+    hass.services.async_register(DOMAIN, "restart_radio", handle_restart_radio)
+
+    # Raw history of an aggregated line, answered from memory without the broker
+    async def handle_history(call):
+        history = data["history"]
+        node = call.data["node"].upper()
+        line = call.data["line"]
+        result = None
+        if history is not None:
+            result = history.recent(bytes.fromhex(node), line, call.data.get("limit"))
+        return {"node": node, "line": line, **(result or {"counts": [], "times": []})}
+
+    import voluptuous as vol
+    from homeassistant.core import SupportsResponse
+    from homeassistant.helpers import config_validation as cv
+    history_schema = vol.Schema({
+        vol.Required("node"): vol.All(cv.string, vol.Match(r"^[0-9A-Fa-f]{16}$")),
+        vol.Required("line"): cv.string,
+        vol.Optional("limit"): vol.All(vol.Coerce(int), vol.Range(min=1)),
+    })
+    hass.services.async_register(
+        DOMAIN, "history", handle_history, schema=history_schema, supports_response=SupportsResponse.ONLY,
+    )
+
+    # 7. Remote node provisioning: discover each radio's network and configure the nodes
+    # concurrently, in the background at startup and on demand through the provision service
+    provisioning_lock = asyncio.Lock()
+    data["provisioning"] = {}  # radio name -> ProvisioningReport
+
+    async def provision_radio(radio, provisioner, settings_for):
+        if radio.engine is not None:
+            engine = radio.engine
+            return await provisioner.run(
+                engine.discover_nodes,
+                lambda address, settings: engine.configure_remote(address, settings, provisioner.command_timeout_s),
+                settings_for,
+            )
+        handler = radio.handler
+        loop = asyncio.get_running_loop()
+        # Bounded pool: at most `workers` blocking digi round-trips at once
+        pool = ThreadPoolExecutor(provisioner.workers, thread_name_prefix=f"xbee_bridge_provision_{radio.name}")
+        # The sync operations timeout bounds every AT round-trip of the device, the
+        # reader's own commands included, so it is only lowered while provisioning
+        sync_ops_timeout_s = await loop.run_in_executor(pool, handler.device.get_sync_ops_timeout)
+        try:
+            await loop.run_in_executor(pool, handler.device.set_sync_ops_timeout, provisioner.command_timeout_s)
+            return await provisioner.run(
+                lambda timeout_s: loop.run_in_executor(pool, handler.discover_nodes, timeout_s),
+                lambda address, settings: loop.run_in_executor(pool, handler.configure_remote, address, settings),
+                settings_for,
+            )
+        finally:
+            await loop.run_in_executor(pool, handler.device.set_sync_ops_timeout, sync_ops_timeout_s)
+            pool.shutdown(wait=False)
+
+    async def run_provisioning():
+        conf = data["config"]
+        provisioner = Provisioner.from_config(conf.get("provisioning") or {})
+
+        def settings_for(address):
+            sample_rate_ms, change_detect = acquisition_settings(conf, address)
+            return remote_settings(data["line_map"], address.hex().upper(), sample_rate_ms, change_detect)
+
+        radios = [radio for radio in data["radios"].values() if radio.connected()]
+        if not radios:
+            _LOGGER.error("No XBee device open, cannot provision remote nodes")
+            return
+        async with provisioning_lock:
+            reports = await asyncio.gather(*(provision_radio(radio, provisioner, settings_for) for radio in radios))
+        topic_base = conf.get("topic_base", DEFAULT_TOPIC_BASE)
+        for radio, report in zip(radios, reports):
+            data["provisioning"][radio.name] = report
+            data["publish_queue"].put(
+                radio.topic(topic_base, "provisioning"), json.dumps(report.as_dict()), True, STREAM_STATUS
+            )
+
+    async def handle_provision(call):
+        _LOGGER.warning("xbee_bridge: Provision service called")
+        await run_provisioning()
+
+    hass.services.async_register(DOMAIN, "provision", handle_provision)
+    METRICS.add_source(
+        "provisioning",
+        lambda: {name: report.counts() for name, report in data["provisioning"].items()} or None,
+    )
+    if conf.get("provisioning") is not None:
+        hass.async_create_task(run_provisioning())
+
+    # 8. Native node entities, and runtime metrics: diagnostic sensors and an optional MQTT stats topic
+    from homeassistant.helpers import discovery
+    if "entity_updates" in data:
+        for platform in ("sensor", "binary_sensor"):
+            hass.async_create_task(discovery.async_load_platform(hass, platform, DOMAIN, {"nodes": True}, config))
+
+    if conf.get("diagnostic_sensors", True):
+        hass.async_create_task(discovery.async_load_platform(hass, "sensor", DOMAIN, {}, config))
+
+    def start_stats(conf):
+        unsubscribe = data.pop("stats_unsub", None)
+        if unsubscribe is not None:
+            unsubscribe()
+        stats_interval_s = conf.get("stats_interval_s")
+        if not stats_interval_s:
+            return
+        from homeassistant.helpers.event import async_track_time_interval
+
+        def publish_stats(now):
+            topic_base = data["config"].get("topic_base", DEFAULT_TOPIC_BASE)
+            data["publish_queue"].put(f"{topic_base}/stats", json.dumps(METRICS.snapshot()), False, STREAM_STATS)
+
+        data["stats_unsub"] = async_track_time_interval(hass, publish_stats, timedelta(seconds=stats_interval_s))
+
+    start_stats(conf)
+
+    setup_s = time.monotonic() - setup_started
+    data["setup_stats"] = {
+        "setup_ms": round(setup_s * 1000),
+        "background_ms": round(background_s * 1000),
+    }
+    _LOGGER.info(
+        "xbee_bridge: setup took %.0f ms, %.0f ms of it in the executor (device open/configure)",
+        setup_s * 1000, background_s * 1000,
+    )
     _LOGGER.warning("xbee_bridge: About to return True from async_setup")
     return True
@@ -0,0 +1,145 @@
+import logging
+import threading
+
+from .at_config import MAX_SAMPLE_RATE_MS
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_MIN_MS = 250
+DEFAULT_MAX_MS = 10000
+DEFAULT_THRESHOLD_COUNTS = 8
+DEFAULT_STABLE_SAMPLES = 10
+DEFAULT_MIN_INTERVAL_S = 5
+# Weight of the newest sample interval in the effective interval average
+INTERVAL_SMOOTHING = 0.2
+
+
+class NodeRate:
+    """Adaptive rate state of one node."""
+
+    __slots__ = ("changed_at", "interval_ms", "last_analog", "last_seen", "sample_rate_ms", "stable")
+
+    def __init__(self, sample_rate_ms):
+        self.sample_rate_ms = sample_rate_ms  # IR the node is believed to run at
+        self.last_analog = None  # analog values of the previous sample
+        self.last_seen = None  # monotonic time of the previous sample
+        self.interval_ms = None  # smoothed time between samples, as measured
+        self.stable = 0  # samples in a row without movement
+        self.changed_at = None
+
+
+class AdaptiveSampleRate:
+    """
+    Picks the IR sample rate of each node from how much its analog lines move: as soon
+    as a line moves by more than threshold_counts between two samples, the node's rate
+    jumps to min_ms; after stable_samples samples in a row without movement it halves
+    (IR doubles), down to max_ms. A node's IR is changed at most once every min_interval_s.
+
+        adaptive_rate:
+          min_ms: 250
+          max_ms: 10000
+          threshold_counts: 8
+          stable_samples: 10
+
+    observe() only decides; the caller writes IR to that node, locally or with a remote
+    AT command. Samples may come from several reader threads, so the state is locked.
+    """
+
+    def __init__(
+        self, initial_ms, min_ms=DEFAULT_MIN_MS, max_ms=DEFAULT_MAX_MS, threshold_counts=DEFAULT_THRESHOLD_COUNTS,
+        stable_samples=DEFAULT_STABLE_SAMPLES, min_interval_s=DEFAULT_MIN_INTERVAL_S,
+    ):
+        self.min_ms = min_ms
+        self.max_ms = min(max_ms, MAX_SAMPLE_RATE_MS)
+        self.threshold_counts = threshold_counts
+        self.stable_samples = stable_samples
+        self.min_interval_s = min_interval_s
+        self.initial_ms = max(self.min_ms, min(initial_ms, self.max_ms))  # IR nodes are configured with
+        self.changes = 0
+        self._nodes = {}  # address -> NodeRate
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, conf, initial_ms):
+        return cls(
+            initial_ms,
+            min_ms=conf.get("min_ms", DEFAULT_MIN_MS),
+            max_ms=conf.get("max_ms", DEFAULT_MAX_MS),
+            threshold_counts=conf.get("threshold_counts", DEFAULT_THRESHOLD_COUNTS),
+            stable_samples=conf.get("stable_samples", DEFAULT_STABLE_SAMPLES),
+            min_interval_s=conf.get("min_interval_s", DEFAULT_MIN_INTERVAL_S),
+        )
+
+    def rate_for(self, address):
+        """IR in milliseconds to configure the node with `address` with."""
+        with self._lock:
+            state = self._nodes.get(address)
+            return state.sample_rate_ms if state is not None else self.initial_ms
+
+    def forget(self, address):
+        """The node was (re)configured with initial_ms, e.g. its radio restarted."""
+        with self._lock:
+            self._nodes.pop(address, None)
+
+    def observe(self, node, now):
+        """
+        Account for the node's latest sample (`now` is monotonic seconds) and return the
+        node's new IR in milliseconds when it should change, else None.
+        """
+        analog = node.sample.analog_values
+        with self._lock:
+            state = self._nodes.get(node.address)
+            if state is None:
+                state = self._nodes[node.address] = NodeRate(self.initial_ms)
+            last = state.last_analog
+            state.last_analog = analog
+            if state.last_seen is not None:
+                interval_ms = (now - state.last_seen) * 1000
+                if state.interval_ms is None:
+                    state.interval_ms = interval_ms
+                else:
+                    state.interval_ms += INTERVAL_SMOOTHING * (interval_ms - state.interval_ms)
+            state.last_seen = now
+            if last is None:
+                return None
+
+            threshold = self.threshold_counts
+            moving = False
+            for value, previous in zip(analog, last):
+                if value is not None and previous is not None and abs(value - previous) > threshold:
+                    moving = True
+                    break
+            if moving:
+                state.stable = 0
+                target = self.min_ms
+            else:
+                state.stable += 1
+                if state.stable < self.stable_samples:
+                    return None
+                state.stable = 0
+                target = min(state.sample_rate_ms * 2, self.max_ms)
+
+            if target == state.sample_rate_ms:
+                return None
+            if state.changed_at is not None and now - state.changed_at < self.min_interval_s:
+                return None
+            _LOGGER.debug(
+                "Sample rate of %s %d -> %d ms (%s)",
+                node.address_hex, state.sample_rate_ms, target, "moving" if moving else "stable",
+            )
+            state.sample_rate_ms = target
+            state.changed_at = now
+            self.changes += 1
+            return target
+
+    def stats(self):
+        """The fastest node's IR and measured interval, the number of nodes and of IR changes."""
+        with self._lock:
+            nodes = list(self._nodes.values())
+        intervals = [state.interval_ms for state in nodes if state.interval_ms is not None]
+        return {
+            "sample_rate_ms": min((state.sample_rate_ms for state in nodes), default=self.initial_ms),
+            "effective_interval_ms": round(min(intervals)) if intervals else None,
+            "nodes": len(nodes),
+            "rate_changes": self.changes,
+        }
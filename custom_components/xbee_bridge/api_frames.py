@@ -0,0 +1,175 @@
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+START_DELIMITER = 0x7E
+ESCAPE = 0x7D
+XON = 0x11
+XOFF = 0x13
+ESCAPE_XOR = 0x20
+ESCAPED_BYTES = frozenset((START_DELIMITER, ESCAPE, XON, XOFF))
+
+# API operating modes (AP parameter)
+API_MODE = 1
+API_MODE_ESCAPED = 2
+
+# Frame types
+FRAME_AT_COMMAND = 0x08
+FRAME_REMOTE_AT_COMMAND = 0x17
+FRAME_AT_RESPONSE = 0x88
+FRAME_MODEM_STATUS = 0x8A
+FRAME_IO_SAMPLE_RX = 0x92
+FRAME_REMOTE_AT_RESPONSE = 0x97
+
+AT_STATUS_OK = 0
+
+# Remote AT command options
+REMOTE_AT_QUEUE = 0x00  # write now, apply on a later AC
+REMOTE_AT_APPLY_CHANGES = 0x02
+UNKNOWN_NETWORK_ADDRESS = b"\xFF\xFE"
+
+MODEM_STATUS = {
+    0x00: "Hardware reset",
+    0x01: "Watchdog timer reset",
+    0x02: "Joined network",
+    0x03: "Disassociated",
+    0x06: "Coordinator started",
+    0x07: "Network security key updated",
+    0x0D: "Voltage supply limit exceeded",
+    0x11: "Modem configuration changed while join in progress",
+}
+
+
+def checksum(frame_data):
+    return 0xFF - (sum(frame_data) & 0xFF)
+
+
+def build_frame(frame_data, api_mode=API_MODE):
+    """Wrap frame data (type byte onwards) with delimiter, length and checksum."""
+    length = len(frame_data)
+    body = bytes((length >> 8, length & 0xFF)) + bytes(frame_data) + bytes((checksum(frame_data),))
+    if api_mode == API_MODE_ESCAPED:
+        escaped = bytearray()
+        for b in body:
+            if b in ESCAPED_BYTES:
+                escaped.append(ESCAPE)
+                escaped.append(b ^ ESCAPE_XOR)
+            else:
+                escaped.append(b)
+        body = bytes(escaped)
+    return bytes((START_DELIMITER,)) + body
+
+
+def build_at_command(frame_id, command, parameter=b"", api_mode=API_MODE):
+    """Build a local AT Command (0x08) frame."""
+    return build_frame(bytes((FRAME_AT_COMMAND, frame_id)) + command.encode() + bytes(parameter), api_mode)
+
+
+def build_remote_at_command(
+    frame_id, address, command, parameter=b"", options=REMOTE_AT_APPLY_CHANGES, api_mode=API_MODE
+):
+    """Build a Remote AT Command Request (0x17) frame for the node with 64-bit `address` (bytes)."""
+    return build_frame(
+        bytes((FRAME_REMOTE_AT_COMMAND, frame_id)) + bytes(address) + UNKNOWN_NETWORK_ADDRESS
+        + bytes((options,)) + command.encode() + bytes(parameter),
+        api_mode,
+    )
+
+
+def parse_at_response(frame):
+    """Split an AT Command Response (0x88) frame into (frame_id, command, status, value bytes)."""
+    return frame[1], bytes(frame[2:4]).decode(), frame[4], bytes(frame[5:])
+
+
+def parse_remote_at_response(frame):
+    """Split a Remote AT Command Response (0x97) frame into (frame_id, address, command, status, value bytes)."""
+    return frame[1], bytes(frame[2:10]), bytes(frame[12:14]).decode(), frame[14], bytes(frame[15:])
+
+
+def parse_node_discovery(value):
+    """Return (64-bit address, node identifier) from one ND response value."""
+    address = bytes(value[2:10])
+    end = value.find(b"\x00", 10)
+    node_id = bytes(value[10:end if end >= 0 else len(value)]).decode(errors="replace")
+    return address, node_id
+
+
+class FrameParser:
+    """
+    Incremental XBee API frame parser for API mode 1 and escaped mode 2.
+
+    Bytes are accumulated in one bytearray (unescaped on arrival in mode 2). Each
+    complete frame with a valid checksum is handed to `on_frame` as a memoryview of
+    the frame data (type byte onwards) that is only valid during the call; callers
+    copy what they keep. Consumed bytes are dropped once per feed() call.
+    """
+
+    def __init__(self, on_frame, api_mode=API_MODE):
+        self.on_frame = on_frame
+        self.escaped = api_mode == API_MODE_ESCAPED
+        self._buffer = bytearray()
+        self._escape_next = False
+        self.frames = 0
+        self.checksum_errors = 0
+        self.discarded_bytes = 0
+
+    def _append_escaped(self, data):
+        buffer = self._buffer
+        if not self._escape_next and ESCAPE not in data:
+            buffer += data
+            return
+        for b in data:
+            if self._escape_next:
+                buffer.append(b ^ ESCAPE_XOR)
+                self._escape_next = False
+            elif b == ESCAPE:
+                self._escape_next = True
+            else:
+                buffer.append(b)
+
+    def feed(self, data):
+        if self.escaped:
+            self._append_escaped(data)
+        else:
+            self._buffer += data
+        buffer = self._buffer
+        size = len(buffer)
+        pos = 0
+        with memoryview(buffer) as view:
+            while True:
+                start = buffer.find(START_DELIMITER, pos)
+                if start < 0:
+                    self.discarded_bytes += size - pos
+                    pos = size
+                    break
+                if start > pos:
+                    self.discarded_bytes += start - pos
+                if size - start < 3:
+                    pos = start
+                    break
+                length = (buffer[start + 1] << 8) | buffer[start + 2]
+                end = start + 3 + length
+                if end >= size:
+                    pos = start
+                    break
+                frame = view[start + 3:end]
+                if (sum(frame) + buffer[end]) & 0xFF != 0xFF:
+                    self.checksum_errors += 1
+                    # Resync on the next delimiter
+                    frame.release()
+                    pos = start + 1
+                    continue
+                if not length:
+                    frame.release()
+                    pos = end + 1
+                    continue
+                self.frames += 1
+                try:
+                    self.on_frame(frame)
+                except Exception:
+                    _LOGGER.exception("Error handling API frame 0x%02X", frame[0])
+                finally:
+                    frame.release()
+                pos = end + 1
+        if pos:
+            del buffer[:pos]
@@ -0,0 +1,388 @@
+import asyncio
+import logging
+import struct
+import time
+
+import serial_asyncio_fast
+
+from .api_frames import (
+    API_MODE,
+    AT_STATUS_OK,
+    FRAME_AT_RESPONSE,
+    FRAME_IO_SAMPLE_RX,
+    FRAME_MODEM_STATUS,
+    FRAME_REMOTE_AT_RESPONSE,
+    MODEM_STATUS,
+    REMOTE_AT_APPLY_CHANGES,
+    REMOTE_AT_QUEUE,
+    FrameParser,
+    build_at_command,
+    build_remote_at_command,
+    parse_at_response,
+    parse_node_discovery,
+    parse_remote_at_response,
+)
+from .at_config import (
+    PhaseTimer,
+    desired_settings,
+    diff_settings,
+    same_value,
+    sample_rate_bytes,
+)
+from .io_decoder import decode_io_sample_frame
+from .metrics import METRICS, SAMPLE_LOG
+from .node_state import DEFAULT_LINE_MAP, DEFAULT_TOPIC_BASE, NodeTable
+
+_LOGGER = logging.getLogger(__name__)
+
+AT_TIMEOUT_S = 2.0
+
+
+class ATCommandError(Exception):
+    """The module answered an AT command with a non-OK status."""
+
+
+class AsyncXBeeEngine(asyncio.Protocol):
+    """
+    XBee engine running on the event loop: an asyncio serial transport feeding the
+    in-house API frame parser, with no reader or polling threads.
+
+    Mirrors XBeeDeviceHandler (open/configure/disable/close, data and status callbacks,
+    NodeTable) so the rest of the integration does not care which engine is running.
+    Callbacks run on the event loop and must not block.
+    """
+
+    def __init__(
+        self, port, baud_rate, sample_rate_ms, topic_base=DEFAULT_TOPIC_BASE, api_mode=API_MODE, change_detect=0,
+        line_map=None,
+    ):
+        self.port = port
+        self.baud_rate = baud_rate
+        self.sample_rate_ms = sample_rate_ms
+        self.change_detect = change_detect  # IC mask of digital lines sampled on change
+        self.line_map = line_map or DEFAULT_LINE_MAP  # Line modes and value conversion
+        self.api_mode = api_mode
+        self.parser = FrameParser(self._on_frame, api_mode)
+        self.nodes = NodeTable(topic_base, self.line_map)
+        self.status = None
+        self.local_address = None
+        self.transport = None
+        self.data_callback = None
+        self.status_callback = None
+        self.lost_callback = None  # Called when the serial connection drops on its own
+        self.opened_at = None
+        self.timer = PhaseTimer()  # Startup time broken down by phase
+        self.applied_settings = {}  # AT parameters known to be on the module
+        self.recorder = None  # Optional FrameRecorder for raw API frames
+        self._frame_id = 0
+        self._pending = {}  # frame id -> future awaiting the AT response
+        self._collectors = {}  # frame id -> list of response values (ND answers once per node)
+        self._closing = False
+        self._received = None  # monotonic time the chunk being parsed arrived
+
+    def set_data_callback(self, callback):
+        self.data_callback = callback
+
+    def set_status_callback(self, callback):
+        self.status_callback = callback
+
+    def set_frame_recorder(self, recorder):
+        self.recorder = recorder
+
+    def set_lost_callback(self, callback):
+        self.lost_callback = callback
+
+    # asyncio.Protocol
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.opened_at = time.monotonic()
+
+    def data_received(self, data):
+        # Every frame completed by this chunk arrived now
+        self._received = time.monotonic()
+        self.parser.feed(data)
+
+    def connection_lost(self, exc):
+        if exc:
+            _LOGGER.error("XBee serial connection lost: %s", exc)
+        self.transport = None
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Serial connection closed"))
+        self._pending.clear()
+        if not self._closing and self.lost_callback:
+            self.lost_callback()
+
+    # Frame dispatch
+
+    def _on_frame(self, frame):
+        if self.recorder is not None:
+            self.recorder.record(frame)
+        frame_type = frame[0]
+        if frame_type == FRAME_IO_SAMPLE_RX:
+            started = time.perf_counter()
+            METRICS.inc("frames_received")
+            address, sample = decode_io_sample_frame(frame)
+            node = self.nodes.update(address, sample, self._received)
+            parsed = time.perf_counter()
+            METRICS.observe("parse", parsed - started)
+            SAMPLE_LOG.sample(node)
+            if self.data_callback:
+                try:
+                    self.data_callback(node)
+                except Exception:
+                    _LOGGER.exception("Error in data_callback")
+                METRICS.observe("callback", time.perf_counter() - parsed)
+        elif frame_type == FRAME_AT_RESPONSE:
+            frame_id, command, status, value = parse_at_response(frame)
+            collector = self._collectors.get(frame_id)
+            if collector is not None:
+                if status == AT_STATUS_OK and value:
+                    collector.append(value)
+                return
+            self._resolve(frame_id, command, status, value)
+        elif frame_type == FRAME_REMOTE_AT_RESPONSE:
+            frame_id, _address, command, status, value = parse_remote_at_response(frame)
+            self._resolve(frame_id, command, status, value)
+        elif frame_type == FRAME_MODEM_STATUS:
+            _LOGGER.info("XBee modem status: %s", MODEM_STATUS.get(frame[1], f"0x{frame[1]:02X}"))
+        else:
+            _LOGGER.debug("Ignoring API frame type 0x%02X", frame_type)
+
+    def _resolve(self, frame_id, command, status, value):
+        future = self._pending.pop(frame_id, None)
+        if future is None or future.done():
+            return
+        if status == AT_STATUS_OK:
+            future.set_result(value)
+        else:
+            future.set_exception(ATCommandError(f"AT{command} failed with status {status}"))
+
+    # AT commands
+
+    def _next_frame_id(self):
+        """Next frame id 1..255, skipping ids still awaiting a response (e.g. a running ND)."""
+        for _ in range(255):
+            self._frame_id = self._frame_id % 255 + 1
+            if self._frame_id not in self._pending and self._frame_id not in self._collectors:
+                return self._frame_id
+        raise RuntimeError("No free frame id, 255 AT commands in flight")
+
+    async def at_command(self, command, parameter=b"", timeout=AT_TIMEOUT_S):
+        """Send a local AT command and return the response value bytes."""
+        if self.transport is None:
+            raise ConnectionError("XBee device is not open")
+        frame_id = self._next_frame_id()
+        future = asyncio.get_running_loop().create_future()
+        self._pending[frame_id] = future
+        self.transport.write(build_at_command(frame_id, command, parameter, self.api_mode))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(frame_id, None)
+
+    async def remote_at_command(
+        self, address, command, parameter=b"", timeout=AT_TIMEOUT_S, options=REMOTE_AT_APPLY_CHANGES
+    ):
+        """Send an AT command to the remote node with 64-bit `address` and return the response value bytes."""
+        if self.transport is None:
+            raise ConnectionError("XBee device is not open")
+        frame_id = self._next_frame_id()
+        future = asyncio.get_running_loop().create_future()
+        self._pending[frame_id] = future
+        self.transport.write(build_remote_at_command(frame_id, address, command, parameter, options, self.api_mode))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(frame_id, None)
+
+    # Remote nodes
+
+    async def discover_nodes(self, timeout_s):
+        """Run a node discovery (ND) and return the 64-bit addresses that answered within timeout_s."""
+        if self.transport is None:
+            raise ConnectionError("XBee device is not open")
+        frame_id = self._next_frame_id()
+        answers = self._collectors[frame_id] = []
+        self.transport.write(build_at_command(frame_id, "ND", b"", self.api_mode))
+        try:
+            await asyncio.sleep(timeout_s)
+        finally:
+            self._collectors.pop(frame_id, None)
+        nodes = dict(parse_node_discovery(value) for value in answers)
+        for address, node_id in nodes.items():
+            _LOGGER.debug("Discovered node %s (%s)", address.hex().upper(), node_id)
+        return list(nodes)
+
+    async def configure_remote(self, address, settings, timeout_s=AT_TIMEOUT_S):
+        """
+        Read `settings` from a remote node in one pipelined batch, write the ones that
+        differ and apply them with a single AC. Returns the changed commands.
+        """
+        results = await asyncio.gather(
+            *(self.remote_at_command(address, command, timeout=timeout_s) for command in settings),
+            return_exceptions=True,
+        )
+        current = {
+            command: value for command, value in zip(settings, results) if not isinstance(value, Exception)
+        }
+        changes = diff_settings(current, settings)
+        if changes:
+            await asyncio.gather(*(
+                self.remote_at_command(address, command, value, timeout_s, REMOTE_AT_QUEUE)
+                for command, value in changes.items()
+            ))
+            await self.remote_at_command(address, "AC", timeout=timeout_s)
+        return list(changes)
+
+    # Device lifecycle
+
+    async def open_device(self):
+        """Open the serial port and fetch device information."""
+        try:
+            loop = asyncio.get_running_loop()
+            with self.timer.phase("open"):
+                await serial_asyncio_fast.create_serial_connection(
+                    loop, lambda: self, self.port, baudrate=self.baud_rate
+                )
+            with self.timer.phase("device info"):
+                node_id, version, serial_high, serial_low = await asyncio.gather(
+                    self.at_command("NI"), self.at_command("VR"), self.at_command("SH"), self.at_command("SL")
+                )
+            node_id = node_id.decode(errors="replace").strip()
+            version_hex = version.hex()
+            self.local_address = serial_high.rjust(4, b"\x00") + serial_low.rjust(4, b"\x00")
+            status_str = f"XBEE module: {node_id}, Firmware version: {version_hex}"
+            self.status = status_str
+            _LOGGER.info(status_str)
+            if self.status_callback:
+                try:
+                    self.status_callback(status_str)
+                except Exception:
+                    _LOGGER.exception("Error in status_callback")
+        except Exception as e:
+            _LOGGER.error("Failed to open XBee device: %s", e)
+            await self.close_device()
+            raise
+
+    async def configure_device(self):
+        """
+        Configure the XBee device, same settings as XBeeDeviceHandler.configure_device.
+        All reads go out in one pipelined batch, then only the differences are written.
+        """
+        try:
+            desired = desired_settings(self.sample_rate_ms, self.change_detect, self.line_map.mode_settings())
+            with self.timer.phase("read"):
+                results = await asyncio.gather(
+                    *(self.at_command(command) for command in desired), return_exceptions=True
+                )
+            current = {
+                command: value for command, value in zip(desired, results) if not isinstance(value, Exception)
+            }
+            changes = diff_settings(current, desired)
+            if changes:
+                with self.timer.phase("write"):
+                    await asyncio.gather(*(self.at_command(command, value) for command, value in changes.items()))
+                with self.timer.phase("apply"):
+                    await self.at_command("AC")  # Apply changes
+                _LOGGER.info("Configuration changed: %s", ", ".join(changes))
+            else:
+                _LOGGER.info("Configuration already up to date, nothing written")
+            self.applied_settings = dict(desired)
+            with self.timer.phase("sample request"):
+                await self.at_command("IS")  # Request an immediate sample
+            _LOGGER.info("Startup took %s", self.timer.report())
+        except Exception as e:
+            _LOGGER.error("Failed to configure XBee device: %s", e)
+            raise
+
+    async def set_sample_rate(self, sample_rate_ms):
+        """Change IR on the open device without reopening or reconfiguring anything else."""
+        value = sample_rate_bytes(sample_rate_ms)
+        self.sample_rate_ms = sample_rate_ms
+        if same_value(self.applied_settings.get("IR"), value):
+            return
+        await self.at_command("IR", value)
+        await self.at_command("AC")
+        self.applied_settings["IR"] = value
+        _LOGGER.info("Sample rate set to %d milliseconds", sample_rate_ms)
+
+    async def set_line_map(self, line_map):
+        """Convert values with a new line map from the next sample on, and write any changed line modes."""
+        previous, self.line_map = self.line_map, line_map
+        self.nodes.set_line_map(line_map)
+        changes = diff_settings(self.applied_settings, line_map.mode_settings(previous=previous))
+        if not changes:
+            return
+        await asyncio.gather(*(self.at_command(command, value) for command, value in changes.items()))
+        await self.at_command("AC")
+        self.applied_settings.update(changes)
+        _LOGGER.info("Line modes changed: %s", ", ".join(changes))
+
+    async def set_change_detection(self, change_detect):
+        """Change the IC mask on the open device."""
+        value = struct.pack(">H", change_detect)
+        self.change_detect = change_detect
+        if same_value(self.applied_settings.get("IC"), value):
+            return
+        await self.at_command("IC", value)
+        await self.at_command("AC")
+        self.applied_settings["IC"] = value
+        _LOGGER.info("Change detection mask set to 0x%04X", change_detect)
+
+    async def request_sample(self):
+        """Ask the module for an immediate IO sample (IS); raises when it does not answer."""
+        await self.at_command("IS")
+
+    async def disable_io_sampling(self):
+        try:
+            await self.at_command("IR", b"\x00\x00")
+            await self.at_command("AC")
+            self.applied_settings["IR"] = b"\x00\x00"
+            _LOGGER.info("I/O sampling disabled")
+        except Exception as e:
+            _LOGGER.error("Failed to disable I/O sampling: %s", e)
+            raise
+
+    async def close_device(self):
+        if self.transport is not None:
+            self._closing = True
+            self.transport.close()
+            self.transport = None
+            _LOGGER.info("Device closed")
+
+    def is_open(self):
+        return self.transport is not None
+
+    async def start(self):
+        self._closing = False
+        await self.open_device()
+        try:
+            await self.configure_device()
+        except Exception:
+            await self.close_device()
+            raise
+
+    async def stop(self):
+        try:
+            if self.transport is not None:
+                await self.disable_io_sampling()
+        except Exception as e:
+            # The device is closed anyway; it may already be gone
+            _LOGGER.debug("Could not disable IO sampling on %s: %s", self.port, e, exc_info=True)
+        finally:
+            await self.close_device()
+
+    def stats(self):
+        elapsed = time.monotonic() - self.opened_at if self.opened_at else 0
+        return {
+            "startup_ms": round(self.timer.total() * 1000),
+            "sample_rate_ms": self.sample_rate_ms,
+            "change_detect": self.change_detect,
+            "frames": self.parser.frames,
+            "checksum_errors": self.parser.checksum_errors,
+            "discarded_bytes": self.parser.discarded_bytes,
+            "samples": self.nodes.samples,
+            "frames_per_s": round(self.parser.frames / elapsed, 1) if elapsed else 0.0,
+        }
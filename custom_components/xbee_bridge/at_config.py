@@ -0,0 +1,97 @@
+import struct
+import time
+from contextlib import contextmanager
+
+from .io_decoder import DIGITAL_KEYS
+from .line_map import LineMap
+
+BROADCAST_DH = b"\x00\x00\x00\x00"
+BROADCAST_DL = b"\x00\x00\xFF\xFF"
+
+MAX_SAMPLE_RATE_MS = 0xFFFF  # IR is a 16-bit number of milliseconds
+DEFAULT_HEARTBEAT_MS = 60000  # IR while change detection (IC) does the real work
+
+
+def sample_rate_bytes(sample_rate_ms):
+    return struct.pack(">H", sample_rate_ms)
+
+
+def change_detect_mask(keys):
+    """IC bit mask for digital line keys such as "dio3_ad3"."""
+    mask = 0
+    for key in keys:
+        if key not in DIGITAL_KEYS:
+            raise ValueError(f"Unknown digital line for change detection: {key}")
+        mask |= 1 << DIGITAL_KEYS.index(key)
+    return mask
+
+
+def io_settings(conf):
+    """
+    Return (IR milliseconds, IC mask) for the integration config. With change_detection
+    the module sends a sample whenever a listed digital line changes, and IR drops to a
+    slow heartbeat:
+
+        change_detection:
+          lines: [dio3_ad3]
+          heartbeat_ms: 60000
+    """
+    change_detection = conf.get("change_detection")
+    if not change_detection:
+        return min(conf.get("sample_rate_ms", 1000), MAX_SAMPLE_RATE_MS), 0
+    mask = change_detect_mask(change_detection.get("lines", ()))
+    heartbeat_ms = change_detection.get("heartbeat_ms", DEFAULT_HEARTBEAT_MS)
+    return min(heartbeat_ms, MAX_SAMPLE_RATE_MS), mask
+
+
+def desired_settings(sample_rate_ms, change_detect=0, line_modes=None):
+    """
+    AT parameters the integration wants on the local module, in write order.
+    `line_modes` are the D/P line mode parameters from the line map (default: AD2 analog, DIO3 digital).
+    """
+    if line_modes is None:
+        line_modes = LineMap().mode_settings()
+    return {
+        **line_modes,
+        "DH": BROADCAST_DH,  # Destination address: broadcast
+        "DL": BROADCAST_DL,
+        "IR": sample_rate_bytes(sample_rate_ms),  # I/O sampling rate
+        "IC": struct.pack(">H", change_detect),  # Digital lines sampled on change, 0 = none
+        "SC": b"\x00\x02",  # RF channels to scan - prevent RF spam
+        "PL": b"\x00",  # 0 = -8 dBm - lowest radio power
+        #  note: NJ (Node Join) is N/A for XBee-PRO
+    }
+
+
+def same_value(current, desired):
+    """Compare AT values numerically; modules may drop leading zero bytes in responses."""
+    if current is None:
+        return False
+    return int.from_bytes(current, "big") == int.from_bytes(desired, "big")
+
+
+def diff_settings(current, desired):
+    """Return the subset of `desired` whose value differs from `current` (AT command -> bytes)."""
+    return {command: value for command, value in desired.items() if not same_value(current.get(command), value)}
+
+
+class PhaseTimer:
+    """Records how long each startup phase took, for the startup breakdown log."""
+
+    def __init__(self):
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.monotonic() - started
+
+    def total(self):
+        return sum(self.phases.values())
+
+    def report(self):
+        parts = ", ".join(f"{name} {elapsed * 1000:.0f} ms" for name, elapsed in self.phases.items())
+        return f"{self.total() * 1000:.0f} ms ({parts})"
@@ -0,0 +1,20 @@
+from homeassistant.components.binary_sensor import BinarySensorEntity
+
+from .entity_updates import XBeeNodeEntity, async_setup_node_entities
+from .io_decoder import DIGITAL_NAMES
+from .node_state import digital_keys
+
+
+async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
+    """Set up the per-node digital line sensors (loaded via discovery from async_setup)."""
+    if discovery_info is None:
+        return
+    async_setup_node_entities(hass, async_add_entities, digital_keys, XBeeNodeBinarySensor)
+
+
+class XBeeNodeBinarySensor(XBeeNodeEntity, BinarySensorEntity):
+    """Digital line of an XBee node, pushed on every changed sample."""
+
+    def _set_value(self, value):
+        super()._set_value(value)
+        self._attr_is_on = value == DIGITAL_NAMES[1] if value is not None else None
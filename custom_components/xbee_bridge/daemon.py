@@ -0,0 +1,264 @@
+"""
+Headless bridge: the same XBeeDeviceHandler -> publish filter -> publish queue -> MQTT
+pipeline as the integration, as a standalone service, e.g. on a small box next to
+the radios. Samples arrive through digi's callbacks; the main thread only runs an
+idle event loop for the supervisors and waits for SIGTERM/SIGINT.
+
+The config file holds the same keys as the `xbee_bridge:` section of configuration.yaml
+(YAML, or JSON for a .json file), either at the top level or under `xbee_bridge:`.
+
+    python -m custom_components.xbee_bridge.daemon --config /etc/xbee_bridge.yaml
+
+Options the daemon does not implement (see UNSUPPORTED_SECTIONS; reload and the
+history service need Home Assistant) are ignored with a warning.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import signal
+import threading
+import time
+from zoneinfo import ZoneInfo
+
+from . import (
+    DOMAIN,
+    ENGINE_DIGI,
+    create_mqtt_client,
+    prepare_handler,
+    start_xbee_listener,
+)
+from .at_config import io_settings
+from .history import SampleHistory
+from .line_map import LineMap
+from .metrics import DEFAULT_SUMMARY_INTERVAL_S, METRICS, configure_sample_log
+from .mqtt_client import STREAM_STATS, STREAM_STATUS
+from .mqtt_payloads import NodePayloads
+from .node_state import DEFAULT_TOPIC_BASE, set_time_zone
+from .publish_policy import PublishFilter
+from .publish_queue import PublishQueue
+from .radios import Radio, radio_configs
+from .spool import DiskSpool
+from .supervisor import RadioSupervisor
+from .xbee_device_handler import XBeeDeviceHandler
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_SPOOL_PATH = "xbee_bridge_spool.bin"
+# Integration config sections the daemon ignores
+UNSUPPORTED_SECTIONS = (
+    "adaptive_rate", "provisioning", "record_frames", "debug_mode", "entities", "diagnostic_sensors",
+)
+
+
+def load_config(path):
+    """Read the bridge config from a YAML or JSON file."""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".json"):
+            conf = json.load(f)
+        else:
+            import yaml  # PyYAML, only needed for YAML config files
+            conf = yaml.safe_load(f)
+    conf = conf or {}
+    return conf.get(DOMAIN, conf)
+
+
+class BridgeDaemon:
+    """Runs the bridge pipeline for every configured radio until stop() is called."""
+
+    def __init__(self, conf):
+        self.conf = conf
+        self.topic_base = conf.get("topic_base", DEFAULT_TOPIC_BASE)
+        self.line_map = LineMap.from_config(conf.get("line_map"))
+        self.publish_filter = PublishFilter.from_config(conf.get("publish"))
+        self.payloads = NodePayloads.from_config(conf)
+        self.history = SampleHistory.from_config(conf["aggregate"]) if conf.get("aggregate") is not None else None
+        self.spool = None
+        self.mqtt = None
+        self.publish_queue = None
+        self.radios = {name: Radio(name, radio_conf) for name, radio_conf in radio_configs(conf).items()}
+        self._stop = None
+
+    def _data_callback(self, node):
+        # Called on digi's reader thread
+        now = time.monotonic()
+        aggregated = self.history.record(node, node.last_seen) if self.history is not None else ()
+        selected = self.publish_filter.select(node, now, aggregated)
+        self.payloads.queue(self.publish_queue, node, selected, aggregated)
+
+    def _status_callback_for(self, radio):
+        def status_callback(status):
+            self.publish_queue.put(radio.topic(self.topic_base, "status"), status, True, STREAM_STATUS)
+        return status_callback
+
+    def _publish_stats(self, interval_s):
+        self.publish_queue.put(f"{self.topic_base}/stats", json.dumps(METRICS.snapshot()), False, STREAM_STATS)
+        asyncio.get_running_loop().call_later(interval_s, self._publish_stats, interval_s)
+
+    def _publish_windows(self):
+        self.history.queue_windows(self.publish_queue, self.payloads)
+        asyncio.get_running_loop().call_later(self.history.window_s, self._publish_windows)
+
+    async def _start_radio(self, radio):
+        """Open, configure and hand the device to its listener thread; failures are recorded on the radio."""
+        conf = radio.conf
+        sample_rate_ms, change_detect = io_settings(conf)
+        handler = XBeeDeviceHandler(
+            conf.get("port", "/dev/ttyUSB1"),
+            conf.get("baud_rate", 57600),
+            sample_rate_ms,
+            self.topic_base,
+            change_detect,
+            self.line_map,
+        )
+        handler.set_data_callback(self._data_callback)
+        handler.set_status_callback(self._status_callback_for(radio))
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, prepare_handler, handler, conf.get("force_configure", False))
+        except Exception as e:  # noqa: BLE001
+            radio.failed(e)
+            return False
+        stop_event = threading.Event()
+        thread = threading.Thread(
+            target=start_xbee_listener, args=(handler, stop_event), name=f"xbee_bridge_{radio.name}", daemon=True
+        )
+        thread.start()
+        radio.handler, radio.thread, radio.stop_event = handler, thread, stop_event
+        radio.started()
+        _LOGGER.info("XBee radio %s opened and configured on %s", radio.name, conf.get("port"))
+        return True
+
+    def _stop_handler(self, radio):
+        if radio.stop_event:
+            radio.stop_event.set()
+        if radio.thread:
+            radio.thread.join(timeout=5)
+        if radio.handler:
+            _LOGGER.info("XBee handler %s: %s", radio.name, radio.handler.stats())
+        radio.handler, radio.thread, radio.stop_event = None, None, None
+
+    async def _stop_radio(self, radio):
+        await asyncio.get_running_loop().run_in_executor(None, self._stop_handler, radio)
+
+    async def _restart_radio(self, radio):
+        async with radio.lock:
+            await self._stop_radio(radio)
+            return await self._start_radio(radio)
+
+    async def _request_sample(self, radio):
+        if radio.handler is not None:
+            await asyncio.get_running_loop().run_in_executor(None, radio.handler.request_sample)
+
+    async def run(self):
+        """Start the pipeline, wait for stop(), then shut everything down in order."""
+        conf = self.conf
+        self._stop = asyncio.Event()
+        for radio in self.radios.values():
+            engine = radio.conf.get("engine", ENGINE_DIGI)
+            if engine != ENGINE_DIGI:
+                _LOGGER.warning("Radio %s: engine %s is not available in the daemon, using digi", radio.name, engine)
+        for section in UNSUPPORTED_SECTIONS:
+            if conf.get(section) not in (None, False):
+                _LOGGER.warning("Config option %s is not supported by the daemon, ignored", section)
+        # Sample times are formatted in time_zone (an IANA name), UTC if not set
+        if conf.get("time_zone"):
+            set_time_zone(ZoneInfo(conf["time_zone"]))
+        configure_sample_log(
+            conf.get("log_samples", False), conf.get("log_summary_interval_s", DEFAULT_SUMMARY_INTERVAL_S)
+        )
+        if conf.get("spool") is not None:
+            self.spool = DiskSpool.from_config(conf["spool"], DEFAULT_SPOOL_PATH)
+        try:
+            self.mqtt = create_mqtt_client(conf, self.spool)
+        except ValueError as e:
+            _LOGGER.error("Invalid MQTT configuration: %s", e)
+            if self.spool is not None:
+                self.spool.close()
+            return False
+        self.mqtt.connect()
+        self.publish_queue = PublishQueue.from_config(
+            lambda topic, payload, retain, stream: self.mqtt.publish(topic, payload, retain=retain, stream=stream),
+            conf.get("publish_queue"),
+        )
+        self.publish_queue.start()
+        METRICS.add_source("publish_queue", self.publish_queue.stats)
+        METRICS.add_source("publish_filter", self.publish_filter.stats)
+        METRICS.add_source("mqtt", self.mqtt.stats)
+        METRICS.add_source("radios", lambda: {name: radio.stats() for name, radio in self.radios.items()})
+        if self.spool is not None:
+            METRICS.add_source("spool", self.spool.stats)
+        if self.history is not None:
+            METRICS.add_source("history", self.history.stats)
+
+        await asyncio.gather(*(self._start_radio(radio) for radio in self.radios.values()))
+        supervise = (conf.get("supervisor") or {}).get("enabled", True)
+        if supervise:
+            for radio in self.radios.values():
+                radio.supervisor = RadioSupervisor.from_config(
+                    radio, self._restart_radio, self._request_sample, conf.get("supervisor") or {}
+                )
+                radio.supervisor.start()
+        elif not any(radio.connected() for radio in self.radios.values()):
+            _LOGGER.error("No XBee radio could be opened")
+            await self._shutdown()
+            return False
+        stats_interval_s = conf.get("stats_interval_s")
+        if stats_interval_s:
+            asyncio.get_running_loop().call_later(stats_interval_s, self._publish_stats, stats_interval_s)
+        if self.history is not None:
+            asyncio.get_running_loop().call_later(self.history.window_s, self._publish_windows)
+        _LOGGER.info("XBee bridge running, %d radio(s)", len(self.radios))
+
+        await self._stop.wait()
+        await self._shutdown()
+        return True
+
+    async def _shutdown(self):
+        _LOGGER.info("XBee bridge stopping")
+        for radio in self.radios.values():
+            if radio.supervisor is not None:
+                await radio.supervisor.stop()
+        # Sampling is disabled and the ports closed before the queue is flushed to the broker
+        await asyncio.gather(*(self._stop_radio(radio) for radio in self.radios.values()))
+        self.publish_filter.log_stats()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.publish_queue.stop)
+        await loop.run_in_executor(None, self.mqtt.disconnect)
+        if self.spool is not None:
+            self.spool.close()
+        _LOGGER.info("XBee bridge stopped: %s", json.dumps(METRICS.snapshot()))
+
+    def stop(self):
+        """Ask run() to shut down; call on the daemon's event loop (e.g. from a signal handler)."""
+        if self._stop is not None:
+            self._stop.set()
+
+
+async def run_daemon(conf):
+    daemon = BridgeDaemon(conf)
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, daemon.stop)
+    return await daemon.run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="XBee to MQTT bridge without Home Assistant")
+    parser.add_argument("--config", "-c", required=True, help="YAML or JSON file with the xbee_bridge settings")
+    parser.add_argument("--log-level", default="INFO", help="DEBUG, INFO, WARNING, ...")
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    try:
+        conf = load_config(args.config)
+        radio_configs(conf)
+    except Exception as e:  # noqa: BLE001
+        _LOGGER.error("Could not read %s: %s", args.config, e)
+        return 2
+    return 0 if asyncio.run(run_daemon(conf)) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
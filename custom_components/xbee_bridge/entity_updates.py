@@ -0,0 +1,130 @@
+import logging
+import threading
+
+from homeassistant.core import callback
+from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.dispatcher import (
+    async_dispatcher_connect,
+    async_dispatcher_send,
+)
+from homeassistant.helpers.entity import Entity
+
+from . import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+# Sent with a NodeState when a node (or a new line on it) is first seen
+SIGNAL_NEW_NODE = "xbee_bridge_new_node"
+# Sent with a NodeState after its values changed; one per node per loop tick
+SIGNAL_NODE_UPDATED = "xbee_bridge_node_updated_{}"
+
+
+def node_signal(node):
+    return SIGNAL_NODE_UPDATED.format(node.address_hex)
+
+
+class EntityUpdates:
+    """
+    Pushes node samples straight to the native sensor/binary_sensor entities through
+    the dispatcher, skipping the MQTT round-trip.
+
+    push() is safe from any thread (digi reader thread or the event loop). Nodes are
+    collected until the next loop tick and each node is dispatched once per tick,
+    however many samples it sent in between.
+    """
+
+    def __init__(self, hass):
+        self.hass = hass
+        self.nodes = {}  # address -> NodeState, every node seen so far
+        self._keys = {}  # address -> number of keys announced to the platforms
+        self._pending = {}
+        self._scheduled = False
+        self._lock = threading.Lock()
+        # Counters
+        self.pushed = 0
+        self.dispatched = 0
+
+    def push(self, node):
+        with self._lock:
+            self.pushed += 1
+            self._pending[node.address] = node
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.hass.loop.call_soon_threadsafe(self._flush)
+
+    @callback
+    def _flush(self):
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._scheduled = False
+        for address, node in pending.items():
+            if self._keys.get(address) != len(node.values):
+                self.nodes[address] = node
+                self._keys[address] = len(node.values)
+                async_dispatcher_send(self.hass, SIGNAL_NEW_NODE, node)
+            async_dispatcher_send(self.hass, node_signal(node), node)
+        self.dispatched += len(pending)
+
+    def stats(self):
+        return {"nodes": len(self.nodes), "pushed": self.pushed, "dispatched": self.dispatched}
+
+
+def async_setup_node_entities(hass, async_add_entities, keys_for, entity_class):
+    """
+    Add an `entity_class` entity for each of a node's `keys_for(node)` lines: now for
+    the nodes already seen, and later whenever a new node or line shows up.
+    """
+    entity_updates = hass.data[DOMAIN]["entity_updates"]
+    added = set()
+
+    @callback
+    def add_node(node):
+        entities = []
+        for key in keys_for(node):
+            if (node.address, key) not in added:
+                added.add((node.address, key))
+                entities.append(entity_class(node, key))
+        if entities:
+            async_add_entities(entities)
+
+    for node in list(entity_updates.nodes.values()):
+        add_node(node)
+    return async_dispatcher_connect(hass, SIGNAL_NEW_NODE, add_node)
+
+
+class XBeeNodeEntity(Entity):
+    """One line of one XBee node, updated by dispatcher push instead of polling."""
+
+    _attr_should_poll = False
+
+    def __init__(self, node, key):
+        self._node = node
+        self._key = key
+        self._value = None
+        self._attr_name = f"XBee {node.address_hex} {key}"
+        self._attr_unique_id = f"xbee_bridge_{node.address_hex}_{key}"
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, node.address_hex)},
+            name=f"XBee {node.address_hex}",
+            manufacturer="Digi",
+        )
+        self._set_value(node.values.get(key))
+
+    async def async_added_to_hass(self):
+        self.async_on_remove(
+            async_dispatcher_connect(self.hass, node_signal(self._node), self._handle_update)
+        )
+
+    @callback
+    def _handle_update(self, node):
+        value = node.values.get(self._key)
+        if value == self._value:
+            return
+        self._set_value(value)
+        self.async_write_ha_state()
+
+    def _set_value(self, value):
+        """Store a formatted value from NodeState.values on the entity's attributes."""
+        self._value = value
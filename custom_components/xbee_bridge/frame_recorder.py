@@ -0,0 +1,85 @@
+import logging
+import queue
+import struct
+import threading
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+MAGIC = b"XBREC001"
+# receive time (epoch seconds), frame data length
+RECORD_HEADER = struct.Struct("<dH")
+
+
+class FrameRecorder:
+    """
+    Appends raw API frames (frame data: type byte onwards, unescaped) with their
+    receive time to a file, for replay by src/xbee_simulator.py.
+
+    record() only queues the frame: a writer thread does the file I/O, so it is safe
+    to call from the event loop (asyncio engine) and costs the reader thread nothing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.frames = 0
+        self._queue = queue.SimpleQueue()
+        self._closed = False
+        # Unbuffered so a recording survives an unclean shutdown
+        self._file = open(path, "ab", buffering=0)  # noqa: SIM115 - open until close()
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+        self._thread = threading.Thread(target=self._write_frames, name="xbee_bridge_recorder", daemon=True)
+        self._thread.start()
+        _LOGGER.info("Recording API frames to %s", path)
+
+    def record(self, frame_data, timestamp=None):
+        if self._closed:
+            return
+        self._queue.put(RECORD_HEADER.pack(timestamp or time.time(), len(frame_data)) + bytes(frame_data))
+
+    def _write_frames(self):
+        """Writer thread: write whatever is queued in one go, until close() queues None."""
+        while True:
+            chunks = [self._queue.get()]
+            while True:
+                try:
+                    chunks.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = chunks[-1] is None
+            records = [chunk for chunk in chunks if chunk is not None]
+            if records:
+                try:
+                    self._file.write(b"".join(records))
+                    self.frames += len(records)
+                except OSError as e:
+                    _LOGGER.error("Failed to record API frames to %s: %s", self.path, e)
+            if stop:
+                return
+
+    def close(self):
+        """Write the frames still queued and close the file (blocking)."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+        _LOGGER.info("Recorded %d API frames to %s", self.frames, self.path)
+
+
+def read_recording(path):
+    """Yield (timestamp, frame data bytes) from a recording file."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an XBee frame recording")
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            timestamp, length = RECORD_HEADER.unpack(header)
+            frame_data = f.read(length)
+            if len(frame_data) < length:
+                return
+            yield timestamp, frame_data
@@ -0,0 +1,159 @@
+import logging
+import threading
+import time
+from array import array
+
+from .io_decoder import ADC_MAX
+from .mqtt_client import STREAM_SAMPLES
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_S = 10
+DEFAULT_HISTORY_SIZE = 600  # raw readings kept per line
+WINDOW_KEY = "window"  # node.topic("<line>/window") carries a line's window aggregates
+
+
+class LineHistory:
+    """
+    Ring of the last `capacity` raw ADC counts of one line and their monotonic receive
+    times, in two flat arrays. Sequences are absolute (slot = seq % capacity); the
+    current window is everything written since the last close_window().
+    """
+
+    __slots__ = ("capacity", "counts", "times", "window_start", "written")
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = array("H", bytes(2 * capacity))
+        self.times = array("d", bytes(8 * capacity))
+        self.written = 0
+        self.window_start = 0
+
+    def append(self, count, received):
+        slot = self.written % self.capacity
+        self.counts[slot] = count
+        self.times[slot] = received
+        self.written += 1
+
+    def _range(self, values, count):
+        """The last `count` values, oldest first, as an array."""
+        end = self.written % self.capacity
+        if count <= end:
+            return values[end - count:end]
+        return values[self.capacity - (count - end):] + values[:end]
+
+    def recent(self, limit=None):
+        """Return (counts, receive times) of the last `limit` readings still in the ring, oldest first."""
+        count = min(self.written, self.capacity)
+        if limit is not None:
+            count = min(count, limit)
+        return self._range(self.counts, count), self._range(self.times, count)
+
+    def close_window(self):
+        """Return (min, max, mean, last, count) of the readings since the last call, or None if there were none."""
+        count = min(self.written - self.window_start, self.capacity)
+        self.window_start = self.written
+        if not count:
+            return None
+        counts = self._range(self.counts, count)
+        return min(counts), max(counts), sum(counts) / count, counts[-1], count
+
+
+class SampleHistory:
+    """
+    Raw history and windowed aggregates of fast analog lines. Every reading of an
+    aggregated line goes into its LineHistory instead of being published; every
+    window_s the lines that got readings publish one JSON document
+    {"min", "max", "mean", "last", "count"} to <node topic>/<line>/window, converted
+    with the node's line map. With publish_format json the node document still
+    carries the latest values and is republished with every window, so a node whose
+    lines are all aggregated keeps a current state.
+
+        aggregate:
+          window_s: 10
+          history_size: 600
+          lines: [dio2_ad2]  # default: every analog line
+    """
+
+    def __init__(self, window_s=DEFAULT_WINDOW_S, history_size=DEFAULT_HISTORY_SIZE, lines=None):
+        self.window_s = window_s
+        self.history_size = history_size
+        self.keys = frozenset(lines) if lines else None  # None: every analog line
+        self._lines = {}  # (address, key) -> LineHistory
+        self._nodes = {}  # address -> NodeState, for topics and conversion tables
+        self._lock = threading.Lock()
+        self.readings = 0
+        self.windows = 0
+
+    @classmethod
+    def from_config(cls, conf):
+        return cls(
+            window_s=conf.get("window_s", DEFAULT_WINDOW_S),
+            history_size=conf.get("history_size", DEFAULT_HISTORY_SIZE),
+            lines=conf.get("lines"),
+        )
+
+    def record(self, node, received):
+        """
+        Store the raw counts of the node's aggregated lines (reader thread) and return
+        their keys, which are not published per sample.
+        """
+        address = node.address
+        keys = self.keys
+        lines = self._lines
+        recorded = []
+        with self._lock:
+            self._nodes[address] = node
+            for key, value in node.sample.iter_analog():
+                if keys is not None and key not in keys:
+                    continue
+                line = lines.get((address, key))
+                if line is None:
+                    line = lines[(address, key)] = LineHistory(self.history_size)
+                line.append(value, received)
+                recorded.append(key)
+            self.readings += len(recorded)
+        return recorded
+
+    def queue_windows(self, publish_queue, payloads=None):
+        """
+        Close the window of every line and queue the aggregates of those that got readings,
+        followed by the node documents of their nodes when `payloads` publishes JSON.
+        """
+        with self._lock:
+            windows = []
+            for (address, key), line in self._lines.items():
+                window = line.close_window()
+                if window is not None:
+                    windows.append((self._nodes[address], key, window))
+        for node, key, (low, high, mean, last, count) in windows:
+            table = node.lines.tables[key]
+            payload = (
+                f'{{"min":{table[min(low, ADC_MAX)]},"max":{table[min(high, ADC_MAX)]},'
+                f'"mean":{table[min(round(mean), ADC_MAX)]},"last":{table[min(last, ADC_MAX)]},"count":{count}}}'
+            )
+            publish_queue.put(node.topic(f"{key}/{WINDOW_KEY}"), payload, True, STREAM_SAMPLES)
+        self.windows += len(windows)
+        if payloads is not None:
+            for node in {id(node): node for node, _, _ in windows}.values():
+                payloads.queue_state(publish_queue, node)
+
+    def recent(self, address, key, limit=None):
+        """
+        Return {"counts": [...], "times": [...]} with the last raw readings of a line, oldest
+        first, receive times as Unix timestamps; None when the line has no history.
+        """
+        with self._lock:
+            line = self._lines.get((address, key))
+            if line is None:
+                return None
+            counts, times = line.recent(limit)
+        offset = time.time() - time.monotonic()
+        return {"counts": counts.tolist(), "times": [round(t + offset, 3) for t in times]}
+
+    def stats(self):
+        return {
+            "lines": len(self._lines),
+            "readings": self.readings,
+            "windows": self.windows,
+        }
@@ -0,0 +1,153 @@
+from digi.xbee.io import IOValue
+
+# Digital line names as reported by digi.xbee.io.IOLine, indexed by DIO number
+DIGITAL_LINES = (
+    "DIO0_AD0", "DIO1_AD1", "DIO2_AD2", "DIO3_AD3",
+    "DIO4_AD4", "DIO5_AD5", "DIO6", "DIO7",
+    "DIO8", "DIO9", "DIO10_PWM0", "DIO11_PWM1",
+    "DIO12", "DIO13", "DIO14", "DIO15",
+)
+# Analog channels AD0..AD3 share the first four DIO pins
+ANALOG_LINES = DIGITAL_LINES[:4]
+ANALOG_CHANNELS = len(ANALOG_LINES)
+
+# Keys used in the published data (e.g. "dio2_ad2")
+DIGITAL_KEYS = tuple(name.lower() for name in DIGITAL_LINES)
+ANALOG_KEYS = tuple(name.lower() for name in ANALOG_LINES)
+SUPPLY_KEY = "supply_voltage"
+
+# Bit 7 of the analog mask flags the supply voltage reading
+SUPPLY_VOLTAGE_BIT = 0x80
+
+ADC_MAX = 1023
+ADC_REFERENCE_V = 3.3  # Assuming a 3.3V reference
+# Supply voltage readings are scaled against the internal 1.2V reference
+SUPPLY_SCALE_V = 1.2 / 1024
+
+FRAME_TYPE_IO_SAMPLE_RX = 0x92
+# Frame type (1) + 64-bit address (8) + 16-bit address (2) + receive options (1)
+IO_SAMPLE_RX_HEADER_LEN = 12
+
+DIGITAL_NAMES = ("LOW", "HIGH")
+
+
+class IOSampleData:
+    """One decoded I/O sample: the masks plus raw line values, no formatting."""
+
+    __slots__ = ("analog_mask", "analog_values", "digital_mask", "digital_states", "power_supply")
+
+    def __init__(self, digital_mask, digital_states, analog_mask, analog_values, power_supply=None):
+        self.digital_mask = digital_mask
+        self.digital_states = digital_states
+        self.analog_mask = analog_mask
+        self.analog_values = analog_values
+        self.power_supply = power_supply
+
+    def digital(self, index):
+        """Return 0/1 for an enabled digital line, or None when it is not sampled."""
+        if not (self.digital_mask >> index) & 1:
+            return None
+        return (self.digital_states >> index) & 1
+
+    def analog(self, channel):
+        """Return the raw ADC count for an enabled analog channel, or None."""
+        return self.analog_values[channel]
+
+    def iter_digital(self):
+        """Yield (key, 0/1) for every enabled digital line."""
+        mask = self.digital_mask
+        states = self.digital_states
+        index = 0
+        while mask:
+            if mask & 1:
+                yield DIGITAL_KEYS[index], (states >> index) & 1
+            mask >>= 1
+            index += 1
+
+    def iter_analog(self):
+        """Yield (key, ADC count) for every enabled analog channel."""
+        for channel, value in enumerate(self.analog_values):
+            if value is not None:
+                yield ANALOG_KEYS[channel], value
+
+    def items(self):
+        """Yield (key, raw value) for every enabled line, then the supply voltage if present."""
+        yield from self.iter_digital()
+        yield from self.iter_analog()
+        if self.power_supply is not None:
+            yield SUPPLY_KEY, self.power_supply
+
+    def __repr__(self):
+        return f"IOSampleData({', '.join(f'{key}={value}' for key, value in self.items())})"
+
+
+def decode_io_payload(payload, offset=0):
+    """
+    Decode the I/O sample block of an API frame.
+
+    The block starts with the sample set count, followed by the 16-bit digital
+    mask, the 8-bit analog mask, the digital states (only when any digital line
+    is enabled) and one 16-bit reading per enabled analog channel.
+    Works on bytes, bytearray or memoryview without copying.
+    """
+    digital_mask = (payload[offset + 1] << 8) | payload[offset + 2]
+    analog_mask = payload[offset + 3]
+    pos = offset + 4
+    digital_states = 0
+    if digital_mask:
+        digital_states = ((payload[pos] << 8) | payload[pos + 1]) & digital_mask
+        pos += 2
+    analog_values = [None] * ANALOG_CHANNELS
+    for channel in range(ANALOG_CHANNELS):
+        if (analog_mask >> channel) & 1:
+            analog_values[channel] = (payload[pos] << 8) | payload[pos + 1]
+            pos += 2
+    power_supply = None
+    if analog_mask & SUPPLY_VOLTAGE_BIT:
+        power_supply = (payload[pos] << 8) | payload[pos + 1]
+    return IOSampleData(digital_mask, digital_states, analog_mask, analog_values, power_supply)
+
+
+def decode_io_sample_frame(frame, offset=0):
+    """
+    Decode an IO Data Sample Rx Indicator (0x92) frame data block.
+
+    `frame` starts at the frame type byte. Returns (64-bit source address, IOSampleData).
+    """
+    if frame[offset] != FRAME_TYPE_IO_SAMPLE_RX:
+        raise ValueError(f"Not an IO sample frame: 0x{frame[offset]:02X}")
+    address = bytes(frame[offset + 1:offset + 9])
+    return address, decode_io_payload(frame, offset + IO_SAMPLE_RX_HEADER_LEN)
+
+
+def decode_io_sample(io_sample):
+    """
+    Decode a digi.xbee.io.IOSample using its masks and already-parsed value maps,
+    without going through str() and regular expressions.
+    """
+    digital_mask = io_sample.digital_mask
+    analog_mask = io_sample.analog_mask
+    digital_states = 0
+    if digital_mask:
+        for line, value in io_sample.digital_values.items():
+            if value is IOValue.HIGH:
+                digital_states |= 1 << line.index
+    analog_values = [None] * ANALOG_CHANNELS
+    if analog_mask:
+        for line, value in io_sample.analog_values.items():
+            if line.index < ANALOG_CHANNELS:
+                analog_values[line.index] = value
+    power_supply = None
+    if analog_mask & SUPPLY_VOLTAGE_BIT:
+        power_supply = io_sample.power_supply_value
+    return IOSampleData(digital_mask, digital_states, analog_mask, analog_values, power_supply)
+
+
+def counts_to_volts(value):
+    """Convert a raw ADC count to volts."""
+    return (value / ADC_MAX) * ADC_REFERENCE_V
+
+
+def supply_to_volts(value):
+    """Convert a raw supply voltage reading to volts."""
+    return value * SUPPLY_SCALE_V
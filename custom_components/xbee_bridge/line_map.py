@@ -0,0 +1,244 @@
+import logging
+import math
+import re
+from itertools import pairwise
+
+from .io_decoder import ADC_MAX, ADC_REFERENCE_V, ANALOG_KEYS, DIGITAL_KEYS
+
+_LOGGER = logging.getLogger(__name__)
+
+# Line modes and their D0..D9 / P0..P5 AT parameter values
+MODE_DISABLED = "disabled"
+MODE_ADC = "adc"
+MODE_DIGITAL_IN = "digital_in"
+MODE_DIGITAL_OUT_LOW = "digital_out_low"
+MODE_DIGITAL_OUT_HIGH = "digital_out_high"
+MODE_VALUES = {
+    MODE_DISABLED: 0,
+    MODE_ADC: 2,
+    MODE_DIGITAL_IN: 3,
+    MODE_DIGITAL_OUT_LOW: 4,
+    MODE_DIGITAL_OUT_HIGH: 5,
+}
+
+# What the integration configured before line maps existed
+DEFAULT_LINES = {
+    "dio2_ad2": {"mode": MODE_ADC},  # DIO2_AD2 as Analog Input
+    "dio3_ad3": {"mode": MODE_DIGITAL_IN},  # DIO3_AD3 as Digital Input
+}
+DEFAULT_UNIT = "V"
+DEFAULT_PRECISION = 2
+# Home Assistant device classes are lowercase snake_case (temperature, pm25, ...);
+# the sensor platform still checks the value against its own list
+DEVICE_CLASS_PATTERN = re.compile(r"[a-z][a-z0-9_]*")
+TABLE_SIZE = ADC_MAX + 1
+
+TRANSFORM_LINEAR = "linear"
+TRANSFORM_TABLE = "table"
+TRANSFORM_THERMISTOR = "thermistor"
+KELVIN = 273.15
+
+
+def line_command(key):
+    """AT parameter that sets the mode of a line, e.g. "dio2_ad2" -> "D2", "dio11_pwm1" -> "P1"."""
+    index = DIGITAL_KEYS.index(key)
+    return f"D{index}" if index < 10 else f"P{index - 10}"
+
+
+def linear(scale=ADC_REFERENCE_V / ADC_MAX, offset=0.0):
+    return lambda counts: counts * scale + offset
+
+
+def calibration_table(points):
+    """Piecewise linear interpolation between (counts, value) points, flat beyond the ends."""
+    points = sorted((float(counts), float(value)) for counts, value in points)
+    if len(points) < 2:
+        raise ValueError("A calibration table needs at least two points")
+
+    def convert(counts):
+        if counts <= points[0][0]:
+            return points[0][1]
+        for (x0, y0), (x1, y1) in pairwise(points):
+            if counts <= x1:
+                return y0 + (y1 - y0) * (counts - x0) / (x1 - x0)
+        return points[-1][1]
+
+    return convert
+
+
+def thermistor(beta=3950, r0=10000, t0=25, series_r=10000, position="low"):
+    """
+    NTC thermistor in a divider with `series_r`, beta model, result in degrees Celsius.
+    position "low": thermistor between the ADC pin and ground; "high": between supply and pin.
+    """
+    inverse_t0 = 1 / (t0 + KELVIN)
+
+    def convert(counts):
+        # Keep the ends finite; a shorted or open sensor reads as the extreme of the table
+        ratio = min(max(counts, 0.5), ADC_MAX - 0.5) / ADC_MAX
+        if position == "low":
+            resistance = series_r * ratio / (1 - ratio)
+        else:
+            resistance = series_r * (1 - ratio) / ratio
+        return 1 / (inverse_t0 + math.log(resistance / r0) / beta) - KELVIN
+
+    return convert
+
+
+def compile_transform(conf):
+    """Return counts -> value for a transform config dict (None = volts)."""
+    if not conf:
+        return linear()
+    kind = conf.get("type", TRANSFORM_LINEAR)
+    if kind == TRANSFORM_LINEAR:
+        return linear(conf.get("scale", ADC_REFERENCE_V / ADC_MAX), conf.get("offset", 0.0))
+    if kind == TRANSFORM_TABLE:
+        return calibration_table(conf["points"])
+    if kind == TRANSFORM_THERMISTOR:
+        return thermistor(
+            conf.get("beta", 3950), conf.get("r0", 10000), conf.get("t0", 25),
+            conf.get("series_r", 10000), conf.get("position", "low"),
+        )
+    raise ValueError(f"Unknown transform type: {kind}")
+
+
+def build_table(convert, precision=DEFAULT_PRECISION):
+    """Every possible ADC count converted and formatted once: the published string is table[counts]."""
+    return tuple(f"{convert(counts):.{precision}f}" for counts in range(TABLE_SIZE))
+
+
+class LineSpec:
+    """How one line of a node is configured and published."""
+
+    __slots__ = ("device_class", "key", "mode", "table", "unit")
+
+    def __init__(self, key, mode, unit=None, device_class=None, table=None):
+        self.key = key
+        self.mode = mode
+        self.unit = unit
+        self.device_class = device_class
+        self.table = table  # 1024 ready-to-publish strings, analog lines only
+
+
+class NodeLines:
+    """Compiled line map of one node: a lookup table per analog channel plus unit metadata."""
+
+    __slots__ = ("specs", "tables")
+
+    def __init__(self, specs, default_table):
+        self.specs = specs  # key -> LineSpec, configured lines only
+        self.tables = {
+            key: specs[key].table if key in specs and specs[key].table else default_table
+            for key in ANALOG_KEYS
+        }
+
+    def unit(self, key):
+        spec = self.specs.get(key)
+        return spec.unit if spec is not None and spec.unit is not None else DEFAULT_UNIT
+
+    def device_class(self, key):
+        spec = self.specs.get(key)
+        if spec is not None and (spec.device_class or spec.unit not in (None, DEFAULT_UNIT)):
+            return spec.device_class
+        return "voltage"
+
+
+class LineMap:
+    """
+    Per-node IO line map from the `line_map` section of the integration config. `lines`
+    applies to every node (and sets the modes on the local module), `nodes` overrides
+    it per 64-bit address:
+
+        line_map:
+          lines:
+            dio2_ad2: {mode: adc}
+            dio3_ad3: {mode: digital_in}
+          nodes:
+            0013A20041000001:
+              dio0_ad0:
+                mode: adc
+                unit: "°C"
+                device_class: temperature
+                precision: 1
+                transform: {type: thermistor, beta: 3950, r0: 10000, series_r: 10000}
+              dio1_ad1:
+                mode: adc
+                unit: "%"
+                transform: {type: table, points: [[0, 0], [512, 40], [1023, 100]]}
+
+    Transforms are compiled into 1024-entry tables once; identical transforms share a table.
+    """
+
+    def __init__(self, lines=None, nodes=None):
+        self.lines = DEFAULT_LINES if lines is None else lines
+        self.nodes = {address.upper(): node_lines for address, node_lines in (nodes or {}).items()}
+        self._tables = {}  # (transform, precision) -> table
+        self._compiled = {}  # address hex -> NodeLines
+        self.default_table = self._table(None, DEFAULT_PRECISION)
+        for address_hex in (None, *self.nodes):
+            for key, line in self._merged(address_hex).items():
+                if key not in DIGITAL_KEYS:
+                    raise ValueError(f"Unknown IO line in line map: {key}")
+                mode = (line or {}).get("mode", MODE_ADC)
+                if mode not in MODE_VALUES:
+                    raise ValueError(f"Unknown mode for {key}: {mode}")
+                if mode == MODE_ADC and key not in ANALOG_KEYS:
+                    raise ValueError(f"{key} has no ADC, only {', '.join(ANALOG_KEYS)} can be in adc mode")
+                where = key if address_hex is None else f"{key} of node {address_hex}"
+                for field in ("unit", "device_class"):
+                    value = (line or {}).get(field)
+                    if value is not None and (not isinstance(value, str) or not value):
+                        raise ValueError(f"Invalid {field} for {where}: {value!r}, expected a string")
+                device_class = (line or {}).get("device_class")
+                if device_class is not None and not DEVICE_CLASS_PATTERN.fullmatch(device_class):
+                    raise ValueError(
+                        f"Invalid device_class for {where}: {device_class!r}, "
+                        "expected a Home Assistant sensor device class such as temperature"
+                    )
+
+    @classmethod
+    def from_config(cls, conf):
+        conf = conf or {}
+        return cls(conf.get("lines"), conf.get("nodes"))
+
+    def _table(self, transform, precision):
+        cache_key = (repr(transform), precision)
+        table = self._tables.get(cache_key)
+        if table is None:
+            table = self._tables[cache_key] = build_table(compile_transform(transform), precision)
+        return table
+
+    def _merged(self, address_hex):
+        merged = dict(self.lines)
+        if address_hex is not None:
+            merged.update(self.nodes.get(address_hex, {}))
+        return merged
+
+    def for_node(self, address_hex):
+        """Return the compiled NodeLines of a node, built on first use."""
+        compiled = self._compiled.get(address_hex)
+        if compiled is None:
+            specs = {}
+            for key, line in self._merged(address_hex).items():
+                line = line or {}
+                mode = line.get("mode", MODE_ADC)
+                table = None
+                if mode == MODE_ADC and key in ANALOG_KEYS:
+                    table = self._table(line.get("transform"), line.get("precision", DEFAULT_PRECISION))
+                specs[key] = LineSpec(key, mode, line.get("unit"), line.get("device_class"), table)
+            compiled = self._compiled[address_hex] = NodeLines(specs, self.default_table)
+        return compiled
+
+    def mode_settings(self, address_hex=None, previous=None):
+        """
+        AT parameters (D0..D9, P0..P5) setting the line modes of a node, or of the local module.
+        Lines configured by `previous` (the line map this one replaces) but not by this one are disabled.
+        """
+        settings = {
+            line_command(key): bytes((MODE_VALUES[(line or {}).get("mode", MODE_ADC)],))
+            for key, line in self._merged(address_hex).items()
+        }
+        if previous is not None:
+            for command in previous.mode_settings(address_hex):
+                settings.setdefault(command, bytes((MODE_VALUES[MODE_DISABLED],)))
+        return settings
@@ -0,0 +1,152 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+_LOGGER = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds, in milliseconds
+BUCKETS_MS = (
+    0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 300000,
+)
+
+COUNTERS = (
+    "frames_received",
+    "publish_acks",
+    "serial_reconnects",
+    "broker_reconnects",
+    "watchdog_stalls",
+)
+HISTOGRAMS = (
+    "parse",  # decode + node state update, per sample
+    "callback",  # data callback (publish filter + enqueue), per sample
+    "publish_ack",  # paho publish() to on_publish, per message
+    "serial_recovery",  # radio lost or stalled until it delivers again
+    "broker_recovery",  # broker connection lost until it is back
+)
+
+DEFAULT_SUMMARY_INTERVAL_S = 60
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; observe() is a bisect and two adds."""
+
+    __slots__ = ("count", "counts", "max", "total")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        ms = seconds * 1000
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of observations, in ms."""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return BUCKETS_MS[index] if index < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 3) if self.count else None,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "max_ms": round(self.max, 3),
+        }
+
+
+class Metrics:
+    """
+    Process-wide counters and latency histograms for the acquisition and publish path.
+    Updates are plain integer/float adds from the reader and publisher threads; a lost
+    increment under contention is acceptable for diagnostics.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.histograms = {name: Histogram() for name in HISTOGRAMS}
+        self.sources = {}  # name -> callable returning a dict of extra gauges (queue, spool, ...)
+
+    def inc(self, name, count=1):
+        self.counters[name] += count
+
+    def observe(self, name, seconds):
+        self.histograms[name].observe(seconds)
+
+    def add_source(self, name, stats):
+        self.sources[name] = stats
+
+    def remove_source(self, name):
+        self.sources.pop(name, None)
+
+    def samples_per_s(self):
+        elapsed = time.monotonic() - self.started
+        return round(self.counters["frames_received"] / elapsed, 2) if elapsed else 0.0
+
+    def snapshot(self):
+        snapshot = dict(self.counters)
+        snapshot["samples_per_s"] = self.samples_per_s()
+        for name, histogram in self.histograms.items():
+            snapshot[name] = histogram.snapshot()
+        for name, stats in list(self.sources.items()):
+            try:
+                snapshot[name] = stats()
+            except Exception as e:
+                _LOGGER.debug("Stats source %s failed: %s", name, e, exc_info=True)
+        return snapshot
+
+
+METRICS = Metrics()
+
+
+class SampleLog:
+    """
+    Per-sample logging switch: either log every sample, or a rate-limited summary
+    of how many samples arrived from how many nodes since the last one.
+    """
+
+    def __init__(self, every_sample=False, interval_s=DEFAULT_SUMMARY_INTERVAL_S):
+        self.every_sample = every_sample
+        self.interval_s = interval_s
+        self._lock = threading.Lock()
+        self._count = 0
+        self._nodes = set()
+        self._since = time.monotonic()
+
+    def sample(self, node):
+        if self.every_sample:
+            _LOGGER.info("Sample from %s: %s", node.address_hex, node.values)
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._count += 1
+            self._nodes.add(node.address)
+            if now - self._since < self.interval_s:
+                return
+            count, nodes, elapsed = self._count, len(self._nodes), now - self._since
+            self._count = 0
+            self._nodes = set()
+            self._since = now
+        _LOGGER.info("%d samples from %d nodes in the last %.0f s", count, nodes, elapsed)
+
+
+SAMPLE_LOG = SampleLog()
+
+
+def configure_sample_log(every_sample, interval_s=DEFAULT_SUMMARY_INTERVAL_S):
+    SAMPLE_LOG.every_sample = every_sample
+    SAMPLE_LOG.interval_s = interval_s
@@ -1,27 +1,161 @@
 import logging
+import threading
+import time
+
 import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+
+from .metrics import METRICS
 
 _LOGGER = logging.getLogger(__name__)
 
+DEFAULT_REPLAY_RATE = 50  # messages per second
+# Bound paho's own in-memory queue; anything beyond goes to the spool
+MAX_QUEUED_MESSAGES = 1000
+# Cap on publish timestamps kept while waiting for on_publish
+MAX_TRACKED_PUBLISHES = 10000
+# paho retries a lost connection after 1, 2, 4, ... seconds, up to the maximum
+DEFAULT_RECONNECT_MIN_S = 1
+DEFAULT_RECONNECT_MAX_S = 60
+
+PROTOCOL_311 = 311
+PROTOCOL_5 = 5
+
+# Message streams, each with its own QoS and (MQTT 5) message expiry
+STREAM_SAMPLES = "samples"
+STREAM_STATUS = "status"
+STREAM_DISCOVERY = "discovery"
+STREAM_STATS = "stats"
+STREAMS = (STREAM_SAMPLES, STREAM_STATUS, STREAM_DISCOVERY, STREAM_STATS)
+
+
+def stream_settings(name, conf, valid, expected):
+    """Validate a {stream: value} config section; raises ValueError naming the bad entry."""
+    if conf is None:
+        return {}
+    if not isinstance(conf, dict):
+        # Config errors are ValueErrors, reported as an invalid MQTT configuration
+        raise ValueError(  # noqa: TRY004
+            f"{name} must map message streams ({', '.join(STREAMS)}) to values, got {conf!r}"
+        )
+    for stream, value in conf.items():
+        if stream not in STREAMS:
+            raise ValueError(f"{name}: unknown message stream {stream!r}, expected one of {', '.join(STREAMS)}")
+        if not valid(value):
+            raise ValueError(f"{name}.{stream} must be {expected}, got {value!r}")
+    return dict(conf)
+
 class MQTTClient:
-    def __init__(self, broker, port, username=None, password=None):
-        try:
-            _LOGGER.warning("MQTTClient initialized")
-            self.broker = broker
-            self.port = port
-            self.username = username
-            self.password = password
-            self.client = mqtt.Client()
-            if self.username:
-                self.client.username_pw_set(self.username, self.password)
-        except Exception as e:
-            _LOGGER.error("MQTTClient __init__ failed: %s", e)
+    def __init__(
+        self, broker, port, username=None, password=None, spool=None, replay_rate=DEFAULT_REPLAY_RATE,
+        protocol=PROTOCOL_311, max_inflight=None, topic_aliases=True, qos=None, message_expiry_s=None,
+        reconnect_min_s=DEFAULT_RECONNECT_MIN_S, reconnect_max_s=DEFAULT_RECONNECT_MAX_S,
+    ):
+        _LOGGER.warning("MQTTClient initialized")
+        self.broker = broker
+        self.port = port
+        self.username = username
+        self.password = password
+        self.spool = spool  # Optional DiskSpool for store-and-forward
+        self.replay_rate = replay_rate
+        self.v5 = protocol == PROTOCOL_5
+        self.qos = dict.fromkeys(STREAMS, 0)  # stream -> QoS
+        self.qos.update(stream_settings("mqtt_qos", qos, lambda value: value in (0, 1, 2), "0, 1 or 2"))
+        # stream -> seconds a message stays valid at the broker (MQTT 5 only)
+        self.message_expiry_s = stream_settings(
+            "mqtt_message_expiry_s", message_expiry_s,
+            lambda value: isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0,
+            "a number of seconds > 0",
+        )
+        self.topic_aliases = topic_aliases and self.v5
+        self.connected = False
+        self.disconnected_at = None  # monotonic time the connection was lost, until it is back
+        self.reconnects = 0
+        self.last_recovery_s = None
+        self.expired = 0  # spooled messages dropped on replay because they expired
+        self._lock = threading.Lock()
+        self._replay_thread = None
+        self._publish_times = {}  # mid -> perf_counter() at publish, for ack latency
+        self._early_acks = set()  # mids acknowledged before their publish time was stored
+        # MQTT 5 topic aliases: valid for one connection, at most what the broker allows
+        self._alias_lock = threading.Lock()
+        self._aliases = {}  # topic -> alias
+        self._alias_max = 0
+        self._next_alias = 1
+        self.client = mqtt.Client(protocol=mqtt.MQTTv5) if self.v5 else mqtt.Client()
+        if self.username:
+            self.client.username_pw_set(self.username, self.password)
+        self.client.max_queued_messages_set(MAX_QUEUED_MESSAGES)
+        if max_inflight:
+            self.client.max_inflight_messages_set(max_inflight)
+        self.client.reconnect_delay_set(reconnect_min_s, reconnect_max_s)
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_publish = self._on_publish
+
+    def _on_connect(self, client, userdata, flags, rc, *args):
+        if rc != 0:
+            _LOGGER.error("MQTT broker refused connection: %s", rc)
+            return
+        if self.topic_aliases:
+            properties = args[0] if args else None
+            self._reset_aliases(getattr(properties, "TopicAliasMaximum", 0))
+        # Together with publish()'s spool check, so no message can be spooled after the
+        # replay decision without a replay to send it
+        with self._lock:
+            self.connected = True
+            if self.spool is not None and len(self.spool):
+                self._start_replay()
+        _LOGGER.info("MQTT connection established to %s:%s", self.broker, self.port)
+        if self.disconnected_at is not None:
+            self.last_recovery_s = time.monotonic() - self.disconnected_at
+            self.disconnected_at = None
+            self.reconnects += 1
+            METRICS.inc("broker_reconnects")
+            METRICS.observe("broker_recovery", self.last_recovery_s)
+            _LOGGER.warning("MQTT connection recovered after %.1f s", self.last_recovery_s)
+
+    def _on_disconnect(self, client, userdata, *args):
+        with self._lock:
+            was_connected = self.connected
+            self.connected = False
+        self._reset_aliases(0)
+        rc = args[0] if args else 0
+        if rc == 0:
+            return  # Our own disconnect()
+        if was_connected:
+            self.disconnected_at = time.monotonic()
+        _LOGGER.warning("MQTT connection to %s:%s lost (%s), reconnecting", self.broker, self.port, rc)
+
+    def _on_publish(self, client, userdata, mid, *args):
+        METRICS.inc("publish_acks")
+        started = self._publish_times.pop(mid, None)
+        if started is None:
+            self._early_acks.add(mid)
+        else:
+            METRICS.observe("publish_ack", time.perf_counter() - started)
+
+    def _track_publish(self, mid, started):
+        if mid in self._early_acks:
+            self._early_acks.discard(mid)
+            METRICS.observe("publish_ack", time.perf_counter() - started)
+            return
+        if len(self._publish_times) >= MAX_TRACKED_PUBLISHES:
+            # Acks that never came (e.g. connection dropped); start over
+            self._publish_times.clear()
+            self._early_acks.clear()
+        self._publish_times[mid] = started
 
     def connect(self):
+        """
+        Start connecting without blocking: the connection is made (and retried) on
+        paho's network thread, and on_connect reports when it is up.
+        """
         try:
-            self.client.connect(self.broker, self.port)
+            self.client.connect_async(self.broker, self.port)
             self.client.loop_start()
-            _LOGGER.info("Connected to MQTT broker at %s:%s", self.broker, self.port)
+            _LOGGER.info("Connecting to MQTT broker at %s:%s", self.broker, self.port)
         except Exception as e:
             _LOGGER.error("Failed to connect to MQTT broker: %s", e)
 
@@ -29,14 +163,142 @@ class MQTTClient:
         try:
             self.client.disconnect()
             self.client.loop_stop()
+            with self._lock:
+                self.connected = False
             _LOGGER.info("Disconnected from MQTT broker at %s:%s", self.broker, self.port)
         except Exception as e:
             _LOGGER.error("Failed to disconnect from MQTT broker: %s", e)
 
-    def publish_constant_test(self):
+    def stats(self):
+        down_since = self.disconnected_at
+        return {
+            "connected": self.connected,
+            "reconnects": self.reconnects,
+            "down_ms": round((time.monotonic() - down_since) * 1000) if down_since is not None else 0,
+            "last_recovery_ms": round(self.last_recovery_s * 1000) if self.last_recovery_s is not None else None,
+            "expired": self.expired,
+        }
+
+    def publish(self, topic, payload, retain=True, stream=STREAM_SAMPLES):
+        """
+        Publish one message; returns True if paho accepted it or it was spooled.
+        While the broker is unreachable, or older spooled messages are still being
+        replayed, messages go to the spool so they reach the broker in order.
+        `stream` picks the QoS and, with MQTT 5, the message expiry. A payload that is
+        not str or bytes (sample time, JSON document) is formatted here with str().
+        """
+        if not isinstance(payload, (str, bytes)):
+            payload = str(payload)
+        stream = stream or STREAM_SAMPLES
+        if self.spool is not None:
+            with self._lock:
+                if not self.connected or len(self.spool):
+                    appended = self.spool.append(topic, payload, retain, stream=STREAMS.index(stream))
+                    if self.connected:
+                        self._start_replay()
+                    return appended
+        return self._publish(topic, payload, retain, stream)
+
+    def _properties(self, topic, qos, expiry_s):
+        """
+        MQTT 5 PUBLISH properties and the topic to send. A topic that already has an
+        alias on this connection goes out as an empty string plus the alias; QoS 1/2
+        messages always carry the full topic since paho may resend them after a reconnect.
+        """
+        properties = None
+        if expiry_s is not None:
+            properties = Properties(PacketTypes.PUBLISH)
+            properties.MessageExpiryInterval = max(1, int(expiry_s))
+        if not self.topic_aliases:
+            return topic, properties
+        with self._alias_lock:
+            alias = self._aliases.get(topic)
+            if alias is None:
+                if self._next_alias > self._alias_max:
+                    return topic, properties
+                alias = self._aliases[topic] = self._next_alias
+                self._next_alias += 1
+            elif qos == 0:
+                topic = ""
+        if properties is None:
+            properties = Properties(PacketTypes.PUBLISH)
+        properties.TopicAlias = alias
+        return topic, properties
+
+    def _reset_aliases(self, alias_max):
+        with self._alias_lock:
+            self._aliases = {}
+            self._alias_max = alias_max
+            self._next_alias = 1
+
+    def _publish(self, topic, payload, retain, stream=STREAM_SAMPLES, age_s=0.0):
+        try:
+            started = time.perf_counter()
+            qos = self.qos[stream]
+            if self.v5:
+                expiry_s = self.message_expiry_s.get(stream)
+                if expiry_s is not None:
+                    expiry_s -= age_s
+                send_topic, properties = self._properties(topic, qos, expiry_s)
+                info = self.client.publish(send_topic, payload, qos, retain, properties)
+            else:
+                info = self.client.publish(topic, payload, qos, retain)
+            if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                _LOGGER.error("Failed to publish to %s: rc=%s", topic, info.rc)
+                if self.topic_aliases:
+                    # The broker may never have seen the alias; send the full topic next time
+                    with self._alias_lock:
+                        self._aliases.pop(topic, None)
+                return False
+            self._track_publish(info.mid, started)
+            return True
+        except Exception as e:
+            _LOGGER.error("Failed to publish to %s: %s", topic, e)
+            return False
+
+    def _start_replay(self):
+        """Start the replay thread unless it is running; call with self._lock held."""
+        if self._replay_thread is not None:
+            return
+        self._replay_thread = threading.Thread(target=self._replay, name="xbee_bridge_replay", daemon=True)
+        self._replay_thread.start()
+
+    def _replay(self):
+        """Send spooled messages oldest first, at most replay_rate per second, while connected."""
+        _LOGGER.info("Replaying %d spooled messages", len(self.spool))
+        sent = 0
+        while True:
+            started = time.monotonic()
+            with self._lock:
+                records = self.spool.peek(self.replay_rate) if self.connected else []
+                if not records:
+                    # Decided under the lock: a later spooled message starts a new replay
+                    self._replay_thread = None
+                    break
+                for seq, timestamp, topic, payload, retain, stream_id in records:
+                    # Each message goes out with its own stream's QoS and expiry
+                    stream = STREAMS[stream_id] if stream_id < len(STREAMS) else STREAM_SAMPLES
+                    age_s = time.time() - timestamp
+                    expiry_s = self.message_expiry_s.get(stream)
+                    if self.v5 and expiry_s is not None and age_s >= expiry_s:
+                        # Would be dropped by the broker anyway
+                        self.spool.release(seq)
+                        self.expired += 1
+                        continue
+                    if not self.connected or not self._publish(topic, payload, retain, stream, age_s):
+                        break
+                    self.spool.release(seq)
+                    sent += 1
+            time.sleep(max(0.0, 1.0 - (time.monotonic() - started)))
+        _LOGGER.info(
+            "Spool replay finished: %d sent, %d expired, %d pending", sent, self.expired, len(self.spool)
+        )
+
+    def publish_constant_test(self, node, status_topic):
+        """Publish fixed values to `node`'s topics (a NodeState) and a status, like real samples."""
         _LOGGER.warning("Entered publish_constant_test()")
-        self.client.publish("home/sensors/xbee/xbee_status", "TEST: XBEE module online", retain=True)
-        self.client.publish("home/sensors/xbee/sample_time", "2025-05-23T20:00:00", retain=True)
-        self.client.publish("home/sensors/xbee/dio2_ad2", "1234", retain=True)
-        self.client.publish("home/sensors/xbee/dio3_ad3", "HIGH", retain=True)
+        self.publish(status_topic, "TEST: XBEE module online", retain=True, stream=STREAM_STATUS)
+        self.publish(node.topic("sample_time"), "2025-05-23T20:00:00", retain=True)
+        self.publish(node.topic("dio2_ad2"), "1234", retain=True)
+        self.publish(node.topic("dio3_ad3"), "HIGH", retain=True)
         _LOGGER.info("Published constant test values to MQTT topics.")
@@ -0,0 +1,159 @@
+import json
+import logging
+
+from .history import WINDOW_KEY
+from .io_decoder import DIGITAL_NAMES
+from .mqtt_client import STREAM_DISCOVERY, STREAM_SAMPLES
+from .node_state import analog_keys, digital_keys
+from .publish_policy import SAMPLE_TIME_KEY
+
+_LOGGER = logging.getLogger(__name__)
+
+FORMAT_TOPICS = "topics"  # one retained message per key (the original layout)
+FORMAT_JSON = "json"  # one retained JSON document per node
+PUBLISH_FORMATS = (FORMAT_TOPICS, FORMAT_JSON)
+
+JSON_STATE_KEY = "state"  # node.topic("state") carries the JSON document
+DEFAULT_DISCOVERY_PREFIX = "homeassistant"
+
+
+class NodeDocument:
+    """
+    One JSON document with its values captured at sample time. The %-format (and with
+    it the sample time's ISO string) runs in str(), on the publisher thread.
+    """
+
+    __slots__ = ("template", "values")
+
+    def __init__(self, template, values):
+        self.template = template
+        self.values = values
+
+    def __str__(self):
+        return self.template % self.values
+
+
+class NodeEncoder:
+    """
+    Precompiled JSON encoder for one node's line layout. Field order is fixed when the
+    encoder is built and the document is a single %-format of the already formatted
+    values: analog readings go in as numbers, digital states and the sample time as strings.
+    """
+
+    __slots__ = ("keys", "signature", "template")
+
+    def __init__(self, node):
+        self.signature = len(node.values)
+        digital = digital_keys(node)
+        analog = analog_keys(node)
+        self.keys = (*digital, *analog, SAMPLE_TIME_KEY)
+        fields = [f'"{key}":"%s"' for key in digital]
+        fields += [f'"{key}":%s' for key in analog]
+        fields.append(f'"{SAMPLE_TIME_KEY}":"%s"')
+        self.template = "{" + ",".join(fields) + "}"
+
+    def encode(self, values):
+        return NodeDocument(self.template, tuple([values[key] for key in self.keys]))
+
+
+class NodePayloads:
+    """
+    Builds what goes to the broker for a node besides per-key values: the JSON document
+    in json format, and the MQTT discovery configs. Both are generated once per node
+    layout and cached; discovery() returns the configs only the first time a node (or
+    a new line on it, or a new topic base) is seen.
+    """
+
+    def __init__(self, publish_format=FORMAT_TOPICS, discovery=False, discovery_prefix=DEFAULT_DISCOVERY_PREFIX):
+        if publish_format not in PUBLISH_FORMATS:
+            raise ValueError(f"Unknown publish format: {publish_format}")
+        self.json = publish_format == FORMAT_JSON
+        self.discovery_enabled = discovery
+        self.discovery_prefix = discovery_prefix
+        self._encoders = {}  # address -> NodeEncoder
+        # address -> (topic prefix, line count, line map) of the published discovery configs
+        self._announced = {}
+
+    @classmethod
+    def from_config(cls, conf):
+        return cls(
+            conf.get("publish_format", FORMAT_TOPICS),
+            conf.get("mqtt_discovery", False),
+            conf.get("discovery_prefix", DEFAULT_DISCOVERY_PREFIX),
+        )
+
+    def encode(self, node):
+        """Return the node's current values as one compact JSON document, formatted by str()."""
+        encoder = self._encoders.get(node.address)
+        if encoder is None or encoder.signature != len(node.values):
+            encoder = self._encoders[node.address] = NodeEncoder(node)
+        return encoder.encode(node.values)
+
+    def queue(self, publish_queue, node, selected, aggregated=()):
+        """
+        Queue the node's pending discovery configs, then its selected keys (or its JSON
+        document). `aggregated` are the node's lines published as window aggregates.
+        """
+        for topic, payload in self.discovery(node, aggregated):
+            publish_queue.put(topic, payload, True, STREAM_DISCOVERY)
+        if self.json:
+            if selected:
+                self.queue_state(publish_queue, node)
+            return
+        values = node.values
+        for key in selected:
+            # Strings, except the sample time which is formatted when it is published
+            publish_queue.put(node.topic(key), values[key], True, STREAM_SAMPLES)
+
+    def queue_state(self, publish_queue, node):
+        """Queue the node's JSON document; nothing in topics format."""
+        if self.json:
+            publish_queue.put(node.topic(JSON_STATE_KEY), self.encode(node), True, STREAM_SAMPLES)
+
+    def discovery(self, node, aggregated=()):
+        """Return [(topic, payload)] discovery configs still to publish for this node, usually none."""
+        if not self.discovery_enabled:
+            return ()
+        announced = (node.topic_prefix, len(node.values), node.lines, tuple(aggregated))
+        if self._announced.get(node.address) == announced:
+            return ()
+        self._announced[node.address] = announced
+        _LOGGER.info("Publishing MQTT discovery for XBee node %s", node.address_hex)
+        return self.discovery_configs(node, aggregated)
+
+    def discovery_configs(self, node, aggregated=()):
+        device = {
+            "identifiers": [f"xbee_bridge_{node.address_hex}"],
+            "name": f"XBee {node.address_hex}",
+            "manufacturer": "Digi",
+        }
+        configs = []
+        for component, keys in (("binary_sensor", digital_keys(node)), ("sensor", analog_keys(node))):
+            for key in keys:
+                object_id = f"xbee_{node.address_hex}_{key}".lower()
+                config = {
+                    "name": key,
+                    "unique_id": object_id,
+                    "device": device,
+                }
+                if key in aggregated:
+                    # The window document; min, max and count become attributes
+                    config["state_topic"] = node.topic(f"{key}/{WINDOW_KEY}")
+                    config["value_template"] = "{{ value_json.mean }}"
+                    config["json_attributes_topic"] = config["state_topic"]
+                elif self.json:
+                    config["state_topic"] = node.topic(JSON_STATE_KEY)
+                    config["value_template"] = f"{{{{ value_json.{key} }}}}"
+                else:
+                    config["state_topic"] = node.topic(key)
+                if component == "binary_sensor":
+                    config["payload_off"], config["payload_on"] = DIGITAL_NAMES
+                else:
+                    device_class = node.lines.device_class(key)
+                    if device_class:
+                        config["device_class"] = device_class
+                    config["unit_of_measurement"] = node.lines.unit(key)
+                    config["state_class"] = "measurement"
+                topic = f"{self.discovery_prefix}/{component}/{object_id}/config"
+                configs.append((topic, json.dumps(config, separators=(",", ":"))))
+        return configs
@@ -0,0 +1,172 @@
+import time
+from datetime import UTC, datetime
+
+from .io_decoder import ADC_MAX, DIGITAL_NAMES, SUPPLY_KEY, supply_to_volts
+from .line_map import LineMap
+
+DEFAULT_TOPIC_BASE = "home/sensors/xbee"
+DEFAULT_LINE_MAP = LineMap()
+SAMPLE_TIME_KEY = "sample_time"
+
+
+class SampleTimeFormatter:
+    """
+    ISO 8601 timestamps in one timezone. Date, time and UTC offset are formatted once
+    per second, each timestamp only adds its microseconds.
+    """
+
+    def __init__(self, tz=UTC):
+        self.tz = tz
+        self._second = (None, "", "")  # (second, "YYYY-MM-DDTHH:MM:SS", "+HH:MM")
+
+    def format(self, timestamp):
+        second = int(timestamp)
+        cached_second, prefix, suffix = self._second
+        if second != cached_second:
+            iso = datetime.fromtimestamp(second, self.tz).isoformat()
+            prefix, suffix = iso[:19], iso[19:]
+            self._second = (second, prefix, suffix)
+        return f"{prefix}.{min(round((timestamp - second) * 1000000), 999999):06d}{suffix}"
+
+
+SAMPLE_TIME_FORMAT = SampleTimeFormatter()
+
+
+def set_time_zone(tz):
+    """Format sample times in `tz` (the HA time zone), resolved once by the caller."""
+    global SAMPLE_TIME_FORMAT
+    SAMPLE_TIME_FORMAT = SampleTimeFormatter(tz)
+
+
+class SampleTime(float):
+    """
+    Unix time a sample was received. Stored as a number and only turned into an ISO
+    string by str(), i.e. when a payload is built on the publisher thread.
+    """
+
+    __slots__ = ()
+
+    def __str__(self):
+        return SAMPLE_TIME_FORMAT.format(self)
+
+    __repr__ = __str__
+
+
+class NodeState:
+    """Latest state of one XBee node, keyed by its 64-bit address."""
+
+    __slots__ = (
+        "address", "address_hex", "last_seen", "lines", "published_times", "published_values",
+        "sample", "sample_count", "topic_prefix", "topics", "values",
+    )
+
+    def __init__(self, address, topic_base=DEFAULT_TOPIC_BASE, line_map=None):
+        self.address = address
+        self.address_hex = address.hex().upper()
+        self.lines = (line_map or DEFAULT_LINE_MAP).for_node(self.address_hex)  # Compiled NodeLines
+        self.topic_prefix = f"{topic_base}/{self.address_hex}"
+        self.topics = {}  # key -> full topic, built once per key
+        self.sample = None  # last IOSampleData
+        self.values = {}  # key -> formatted value, updated in place
+        self.last_seen = None  # monotonic receive time of the last sample
+        self.sample_count = 0
+        self.published_values = {}  # key -> raw value last published
+        self.published_times = {}  # key -> monotonic time of last publish
+
+    def apply(self, sample, received):
+        """
+        Store a decoded sample and refresh the formatted values in place. `received` is
+        the monotonic time the frame arrived; the sample time is kept unformatted.
+        """
+        data = self.values
+        for key, value in sample.iter_digital():
+            data[key] = DIGITAL_NAMES[value]
+        # Precomputed per line: the formatted, converted value is a table lookup
+        tables = self.lines.tables
+        for key, value in sample.iter_analog():
+            data[key] = tables[key][min(value, ADC_MAX)]
+        if sample.power_supply is not None:
+            data[SUPPLY_KEY] = f"{supply_to_volts(sample.power_supply):.2f}"
+        data[SAMPLE_TIME_KEY] = SampleTime(received + (time.time() - time.monotonic()))
+        self.sample = sample
+        self.last_seen = received
+        self.sample_count += 1
+
+    def topic(self, key):
+        """Return the MQTT topic for one of this node's keys."""
+        topic = self.topics.get(key)
+        if topic is None:
+            topic = self.topics[key] = f"{self.topic_prefix}/{key}"
+        return topic
+
+    def set_topic_base(self, topic_base):
+        self.topic_prefix = f"{topic_base}/{self.address_hex}"
+        self.topics = {}
+
+    def set_line_map(self, line_map):
+        self.lines = line_map.for_node(self.address_hex)
+
+    def __repr__(self):
+        return f"NodeState({self.address_hex}, samples={self.sample_count})"
+
+
+def digital_keys(node):
+    """Keys of the node's enabled digital lines, in line order."""
+    return [key for key, _ in node.sample.iter_digital()]
+
+
+def analog_keys(node):
+    """Keys of the node's enabled analog lines, plus the supply voltage when it is sampled."""
+    keys = [key for key, _ in node.sample.iter_analog()]
+    if node.sample.power_supply is not None:
+        keys.append(SUPPLY_KEY)
+    return keys
+
+
+class NodeTable:
+    """Per-node state store; lookups and updates cost the same for 1 or 1000 nodes."""
+
+    def __init__(self, topic_base=DEFAULT_TOPIC_BASE, line_map=None):
+        self.topic_base = topic_base
+        self.line_map = line_map or DEFAULT_LINE_MAP
+        self._nodes = {}
+        self.samples = 0  # Samples received across all nodes
+
+    def node_for(self, address):
+        """Return the state for a 64-bit address (bytes), creating it on first sight."""
+        node = self._nodes.get(address)
+        if node is None:
+            node = self._nodes[address] = NodeState(address, self.topic_base, self.line_map)
+        return node
+
+    def set_topic_base(self, topic_base):
+        """Move every node to a new topic base without dropping its state."""
+        self.topic_base = topic_base
+        for node in list(self._nodes.values()):
+            node.set_topic_base(topic_base)
+
+    def set_line_map(self, line_map):
+        """Switch every node to a new line map; values are converted with it from the next sample."""
+        self.line_map = line_map
+        for node in list(self._nodes.values()):
+            node.set_line_map(line_map)
+
+    def update(self, address, sample, received=None):
+        """
+        Apply a decoded sample to the node with this address and return the node.
+        `received` is the monotonic time its frame arrived, now if not given.
+        """
+        node = self.node_for(address)
+        node.apply(sample, time.monotonic() if received is None else received)
+        self.samples += 1
+        return node
+
+    def get(self, address):
+        """Return the state for an address, or None if the node was never seen."""
+        return self._nodes.get(address)
+
+    def __iter__(self):
+        return iter(self._nodes.values())
+
+    def __len__(self):
+        return len(self._nodes)
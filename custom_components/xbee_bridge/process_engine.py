@@ -0,0 +1,414 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+
+from .api_frames import API_MODE, FRAME_IO_SAMPLE_RX
+from .async_engine import AT_TIMEOUT_S, AsyncXBeeEngine
+from .io_decoder import decode_io_sample_frame
+from .line_map import LineMap
+from .metrics import METRICS, SAMPLE_LOG
+from .node_state import DEFAULT_LINE_MAP, DEFAULT_TOPIC_BASE, NodeTable
+from .sample_ring import DEFAULT_CAPACITY, SampleRing, sample_from_record
+
+_LOGGER = logging.getLogger(__name__)
+
+START_TIMEOUT_S = 30  # Interpreter spawn, imports, device open and configure
+STOP_TIMEOUT_S = 5
+DEFAULT_RESTART_DELAY_S = 2
+
+# Worker methods HA may call through the command pipe
+WORKER_COMMANDS = (
+    "set_sample_rate", "set_change_detection", "set_line_modes", "discover_nodes", "configure_remote",
+    "request_sample",
+)
+
+
+class RingEngine(AsyncXBeeEngine):
+    """AsyncXBeeEngine in the worker process: samples are decoded into the shared ring instead of a NodeTable."""
+
+    def __init__(self, ring, notify, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.ring = ring
+        self.notify = notify
+        self.disconnected = asyncio.Event()
+
+    def _on_frame(self, frame):
+        if frame[0] != FRAME_IO_SAMPLE_RX:
+            super()._on_frame(frame)
+            return
+        address, sample = decode_io_sample_frame(frame)
+        # Arrival time of the chunk that completed the frame, as in the in-loop engine
+        # (CLOCK_MONOTONIC is system-wide, so HA can compare it with its own clock)
+        if self.ring.write(address, sample, self._received):
+            self.notify.send_bytes(b"\x01")
+
+    def connection_lost(self, exc):
+        super().connection_lost(exc)
+        self.disconnected.set()
+
+    async def set_line_modes(self, lines, nodes):
+        await self.set_line_map(LineMap(lines, nodes))
+
+
+def run_worker(
+    port, baud_rate, api_mode, sample_rate_ms, change_detect, lines, nodes, ring_name, capacity, ring_lock, conn, notify,
+):
+    """Entry point of the acquisition worker process."""
+    logging.basicConfig(level=logging.WARNING, format="xbee_bridge worker %(levelname)s %(name)s: %(message)s")
+    asyncio.run(_worker_main(
+        port, baud_rate, api_mode, sample_rate_ms, change_detect, lines, nodes, ring_name, capacity, ring_lock, conn, notify,
+    ))
+
+
+async def _worker_main(
+    port, baud_rate, api_mode, sample_rate_ms, change_detect, lines, nodes, ring_name, capacity, ring_lock, conn, notify,
+):
+    ring = SampleRing.attach(ring_name, capacity, ring_lock)
+    engine = RingEngine(
+        ring, notify, port, baud_rate, sample_rate_ms, DEFAULT_TOPIC_BASE, api_mode, change_detect, LineMap(lines, nodes)
+    )
+    try:
+        await engine.start()
+    except Exception as e:  # noqa: BLE001
+        conn.send((None, False, str(e) or type(e).__name__))
+        ring.close()
+        return
+    conn.send((None, True, (engine.status, engine.local_address, engine.timer.total())))
+
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+
+    async def run_command(request_id, method, args):
+        try:
+            result = await getattr(engine, method)(*args)
+            conn.send((request_id, True, result))
+        except Exception as e:  # noqa: BLE001
+            conn.send((request_id, False, str(e) or type(e).__name__))
+
+    def on_command():
+        try:
+            request_id, method, args = conn.recv()
+        except (EOFError, OSError):
+            stop.set()  # HA went away
+            return
+        if method == "stop":
+            stop.set()
+        elif method in WORKER_COMMANDS:
+            loop.create_task(run_command(request_id, method, args))
+        else:
+            conn.send((request_id, False, f"Unknown worker command: {method}"))
+
+    loop.add_reader(conn.fileno(), on_command)
+    stopped = loop.create_task(stop.wait())
+    disconnected = loop.create_task(engine.disconnected.wait())
+    await asyncio.wait((stopped, disconnected), return_when=asyncio.FIRST_COMPLETED)
+    loop.remove_reader(conn.fileno())
+    stopped.cancel()
+    disconnected.cancel()
+    await engine.stop()
+    ring.close()
+
+
+class ProcessXBeeEngine:
+    """
+    Acquisition in a child process: serial I/O, frame parsing and sample decoding run in
+    a worker (an AsyncXBeeEngine of its own) that writes fixed-size records into a shared
+    memory SampleRing. HA is woken up through a pipe when records arrive while it is
+    idle, and drains the ring in batches on the event loop: only NodeState updates and
+    the data callback run in the HA process.
+
+    AT commands go through a command pipe, so the interface matches AsyncXBeeEngine.
+    A worker that exits (serial port lost, crash) is reported to the lost callback when
+    one is set (the radio supervisor reopens the radio); otherwise it is restarted after
+    restart_delay_s with the current settings, keeping the ring and the node states.
+
+        engine: process
+        process:
+          ring_size: 4096
+          restart_delay_s: 2
+    """
+
+    def __init__(
+        self, port, baud_rate, sample_rate_ms, topic_base=DEFAULT_TOPIC_BASE, api_mode=API_MODE, change_detect=0,
+        line_map=None, ring_size=DEFAULT_CAPACITY, restart_delay_s=DEFAULT_RESTART_DELAY_S,
+    ):
+        self.port = port
+        self.baud_rate = baud_rate
+        self.sample_rate_ms = sample_rate_ms
+        self.change_detect = change_detect
+        self.line_map = line_map or DEFAULT_LINE_MAP
+        self.api_mode = api_mode
+        self.ring_size = ring_size
+        self.restart_delay_s = restart_delay_s
+        self.nodes = NodeTable(topic_base, self.line_map)
+        self.status = None
+        self.local_address = None
+        self.data_callback = None
+        self.status_callback = None
+        self.lost_callback = None  # When set, whoever supervises restarts the worker
+        self.opened_at = None
+        self.startup_s = 0.0
+        self.restarts = 0
+        self.batches = 0
+        self.ring = None
+        self.process = None
+        self._conn = None
+        self._notify = None
+        self._started = None  # future of the worker's start handshake
+        self._request_id = 0
+        self._pending = {}  # request id -> future awaiting the worker's answer
+        self._stopping = False
+
+    @classmethod
+    def from_config(cls, conf, sample_rate_ms, change_detect, line_map):
+        process = conf.get("process") or {}
+        return cls(
+            conf.get("port", "/dev/ttyUSB1"),
+            conf.get("baud_rate", 57600),
+            sample_rate_ms,
+            conf.get("topic_base", DEFAULT_TOPIC_BASE),
+            conf.get("api_mode", API_MODE),
+            change_detect,
+            line_map,
+            process.get("ring_size", DEFAULT_CAPACITY),
+            process.get("restart_delay_s", DEFAULT_RESTART_DELAY_S),
+        )
+
+    def set_data_callback(self, callback):
+        self.data_callback = callback
+
+    def set_status_callback(self, callback):
+        self.status_callback = callback
+
+    def set_frame_recorder(self, recorder):
+        if recorder is not None:
+            _LOGGER.warning("Frame recording is not available with the process engine")
+
+    def set_lost_callback(self, callback):
+        self.lost_callback = callback
+
+    def is_open(self):
+        return self._conn is not None and self.opened_at is not None
+
+    # Worker lifecycle
+
+    async def start(self):
+        self._stopping = False
+        self.ring = SampleRing.create(self.ring_size)
+        try:
+            await self._spawn()
+        except Exception:
+            self.ring.close(unlink=True)
+            self.ring = None
+            raise
+
+    async def _spawn(self):
+        loop = asyncio.get_running_loop()
+        # spawn, not fork: the worker must not inherit HA's threads and locks
+        context = multiprocessing.get_context("spawn")
+        self._conn, worker_conn = context.Pipe()
+        self._notify, worker_notify = context.Pipe(duplex=False)
+        self.ring.renew_lock()
+        self.process = context.Process(
+            target=run_worker,
+            args=(
+                self.port, self.baud_rate, self.api_mode, self.sample_rate_ms, self.change_detect,
+                self.line_map.lines, self.line_map.nodes, self.ring.name, self.ring_size, self.ring.lock,
+                worker_conn, worker_notify,
+            ),
+            name=f"xbee_bridge_worker_{self.port}",
+            daemon=True,
+        )
+        started = time.monotonic()
+        self._started = loop.create_future()
+        await loop.run_in_executor(None, self.process.start)
+        worker_conn.close()
+        worker_notify.close()
+        loop.add_reader(self._conn.fileno(), self._on_message)
+        loop.add_reader(self._notify.fileno(), self._on_notify)
+        try:
+            status, local_address, startup_s = await asyncio.wait_for(self._started, START_TIMEOUT_S)
+        except Exception as e:
+            _LOGGER.error("XBee worker for %s failed to start: %s", self.port, e)
+            await self._reap()
+            raise
+        self.status = status
+        self.local_address = local_address
+        self.startup_s = time.monotonic() - started
+        self.opened_at = time.monotonic()
+        _LOGGER.info(
+            "XBee worker %d started on %s in %.0f ms (device %.0f ms)",
+            self.process.pid, self.port, self.startup_s * 1000, startup_s * 1000,
+        )
+        if self.status_callback:
+            try:
+                self.status_callback(status)
+            except Exception:
+                _LOGGER.exception("Error in status_callback")
+
+    async def _reap(self):
+        """Detach from an exited (or failed) worker and release its pipes."""
+        loop = asyncio.get_running_loop()
+        for conn in (self._conn, self._notify):
+            if conn is not None:
+                loop.remove_reader(conn.fileno())
+                conn.close()
+        self._conn = self._notify = None
+        self.opened_at = None
+        process, self.process = self.process, None
+        if process is not None:
+            await loop.run_in_executor(None, process.join, STOP_TIMEOUT_S)
+            if process.is_alive():
+                process.kill()
+                await loop.run_in_executor(None, process.join)
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("XBee worker exited"))
+        self._pending.clear()
+        # Anything the worker managed to write before it went away
+        self._drain()
+
+    async def _restart(self):
+        self.restarts += 1
+        try:
+            await self._spawn()
+            METRICS.inc("serial_reconnects")
+        except Exception:  # noqa: BLE001
+            if not self._stopping:
+                asyncio.get_running_loop().call_later(
+                    self.restart_delay_s, lambda: asyncio.ensure_future(self._restart())
+                )
+
+    def _worker_exited(self):
+        if self._stopping or self.opened_at is None:
+            return
+        loop = asyncio.get_running_loop()
+        if self.lost_callback:
+            _LOGGER.error("XBee worker for %s exited", self.port)
+            loop.create_task(self._reap()).add_done_callback(lambda task: self.lost_callback())
+            return
+        _LOGGER.error("XBee worker for %s exited, restarting in %s s", self.port, self.restart_delay_s)
+
+        async def reap_and_restart():
+            await self._reap()
+            if not self._stopping:
+                loop.call_later(self.restart_delay_s, lambda: asyncio.ensure_future(self._restart()))
+
+        loop.create_task(reap_and_restart())
+
+    # Pipes
+
+    def _on_message(self):
+        try:
+            request_id, ok, result = self._conn.recv()
+        except (EOFError, OSError):
+            asyncio.get_running_loop().remove_reader(self._conn.fileno())
+            if self._started is not None and not self._started.done():
+                self._started.set_exception(ConnectionError("XBee worker exited during startup"))
+                return
+            self._worker_exited()
+            return
+        future = self._started if request_id is None else self._pending.pop(request_id, None)
+        if future is None or future.done():
+            return
+        if ok:
+            future.set_result(result)
+        else:
+            future.set_exception(ConnectionError(result) if request_id is None else RuntimeError(result))
+
+    def _on_notify(self):
+        try:
+            while self._notify.poll():
+                self._notify.recv_bytes()
+        except (EOFError, OSError):
+            asyncio.get_running_loop().remove_reader(self._notify.fileno())
+        self._drain()
+
+    def _drain(self):
+        """Apply every sample in the ring to its node and run the data callback, in batches."""
+        ring = self.ring
+        if ring is None:
+            return
+        nodes = self.nodes
+        while True:
+            records = ring.read_batch()
+            if not records:
+                return
+            self.batches += 1
+            METRICS.inc("frames_received", len(records))
+            for record in records:
+                started = time.perf_counter()
+                address, sample, received = sample_from_record(record)
+                node = nodes.update(address, sample, received)
+                parsed = time.perf_counter()
+                METRICS.observe("parse", parsed - started)
+                SAMPLE_LOG.sample(node)
+                if self.data_callback:
+                    try:
+                        self.data_callback(node)
+                    except Exception:
+                        _LOGGER.exception("Error in data_callback")
+                    METRICS.observe("callback", time.perf_counter() - parsed)
+
+    async def _call(self, method, *args, timeout=None):
+        if self._conn is None:
+            raise ConnectionError("XBee worker is not running")
+        self._request_id += 1
+        request_id = self._request_id
+        future = self._pending[request_id] = asyncio.get_running_loop().create_future()
+        self._conn.send((request_id, method, args))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    # Same interface as AsyncXBeeEngine
+
+    async def set_sample_rate(self, sample_rate_ms):
+        self.sample_rate_ms = sample_rate_ms
+        await self._call("set_sample_rate", sample_rate_ms, timeout=4 * AT_TIMEOUT_S)
+
+    async def set_change_detection(self, change_detect):
+        self.change_detect = change_detect
+        await self._call("set_change_detection", change_detect, timeout=4 * AT_TIMEOUT_S)
+
+    async def set_line_map(self, line_map):
+        self.line_map = line_map
+        self.nodes.set_line_map(line_map)
+        await self._call("set_line_modes", line_map.lines, line_map.nodes, timeout=4 * AT_TIMEOUT_S)
+
+    async def discover_nodes(self, timeout_s):
+        return await self._call("discover_nodes", timeout_s, timeout=timeout_s + START_TIMEOUT_S)
+
+    async def configure_remote(self, address, settings, timeout_s=AT_TIMEOUT_S):
+        return await self._call("configure_remote", address, settings, timeout_s)
+
+    async def request_sample(self):
+        await self._call("request_sample", timeout=4 * AT_TIMEOUT_S)
+
+    async def stop(self):
+        self._stopping = True
+        if self._conn is not None:
+            try:
+                self._conn.send((None, "stop", ()))
+            except OSError:
+                pass
+        await self._reap()
+        if self.ring is not None:
+            self.ring.close(unlink=True)
+            self.ring = None
+
+    def stats(self):
+        elapsed = time.monotonic() - self.opened_at if self.opened_at else 0
+        return {
+            "startup_ms": round(self.startup_s * 1000),
+            "sample_rate_ms": self.sample_rate_ms,
+            "change_detect": self.change_detect,
+            "samples": self.nodes.samples,
+            "batches": self.batches,
+            "worker_pid": self.process.pid if self.process is not None else None,
+            "worker_restarts": self.restarts,
+            "ring": self.ring.stats() if self.ring is not None else None,
+            "frames_per_s": round(self.nodes.samples / elapsed, 1) if elapsed else 0.0,
+        }
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import time
+
+from .at_config import BROADCAST_DH, sample_rate_bytes
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+DEFAULT_TIMEOUT_S = 15
+DEFAULT_RETRIES = 2
+DEFAULT_DISCOVERY_TIMEOUT_S = 10
+DEFAULT_COMMAND_TIMEOUT_S = 5
+
+# Remote routers send their samples to the coordinator (DH/DL = 0)
+COORDINATOR_DL = b"\x00\x00\x00\x00"
+
+STATUS_CONFIGURED = "configured"
+STATUS_UNCHANGED = "unchanged"
+STATUS_FAILED = "failed"
+STATUS_TIMEOUT = "timeout"
+
+
+def remote_settings(line_map, address_hex, sample_rate_ms, change_detect=0):
+    """AT parameters for a remote node: its line modes from the line map, sampling, destination."""
+    return {
+        **line_map.mode_settings(address_hex),
+        "IR": sample_rate_bytes(sample_rate_ms),
+        "IC": change_detect.to_bytes(2, "big"),
+        "DH": BROADCAST_DH,
+        "DL": COORDINATOR_DL,
+    }
+
+
+class NodeResult:
+    """Outcome of provisioning one node."""
+
+    __slots__ = ("address_hex", "attempts", "changes", "elapsed_s", "error", "status")
+
+    def __init__(self, address_hex):
+        self.address_hex = address_hex
+        self.status = None
+        self.attempts = 0
+        self.elapsed_s = 0.0
+        self.changes = []
+        self.error = None
+
+    def as_dict(self):
+        return {
+            "status": self.status,
+            "attempts": self.attempts,
+            "ms": round(self.elapsed_s * 1000),
+            "changes": self.changes,
+            "error": self.error,
+        }
+
+
+class ProvisioningReport:
+    def __init__(self):
+        self.started = time.time()
+        self.discovery_s = 0.0
+        self.elapsed_s = 0.0
+        self.results = {}  # address hex -> NodeResult
+
+    def counts(self):
+        counts = {STATUS_CONFIGURED: 0, STATUS_UNCHANGED: 0, STATUS_FAILED: 0, STATUS_TIMEOUT: 0}
+        for result in self.results.values():
+            counts[result.status] += 1
+        return counts
+
+    def summary(self):
+        counts = self.counts()
+        return (
+            f"{len(self.results)} nodes in {self.elapsed_s:.1f} s (discovery {self.discovery_s:.1f} s): "
+            + ", ".join(f"{count} {status}" for status, count in counts.items())
+        )
+
+    def as_dict(self):
+        return {
+            "started": self.started,
+            "elapsed_ms": round(self.elapsed_s * 1000),
+            "discovery_ms": round(self.discovery_s * 1000),
+            **self.counts(),
+            "nodes": {address: result.as_dict() for address, result in self.results.items()},
+        }
+
+
+class Provisioner:
+    """
+    Discovers remote nodes and configures them concurrently. At most `workers` nodes
+    are in progress at once; each attempt on a node is bounded by timeout_s and retried
+    up to `retries` times, so a dead node only costs its own timeouts.
+
+        provisioning:
+          workers: 4
+          timeout_s: 15
+          retries: 2
+          discovery_timeout_s: 10
+          command_timeout_s: 5
+          nodes: [0013A20041000001]   # always provisioned, discovered or not
+
+    `discover()` is a coroutine function returning 64-bit addresses, and
+    `configure(address, settings)` a coroutine function returning the changed commands,
+    so the same orchestration drives the asyncio engine directly and the digi
+    handler through an executor. A node that times out is retried only when its attempt
+    could be cancelled (a coroutine); an executor attempt cannot, so the node is reported
+    as timed out and its slot freed without waiting for the thread.
+    """
+
+    def __init__(
+        self, workers=DEFAULT_WORKERS, timeout_s=DEFAULT_TIMEOUT_S, retries=DEFAULT_RETRIES,
+        discovery_timeout_s=DEFAULT_DISCOVERY_TIMEOUT_S, nodes=None, command_timeout_s=DEFAULT_COMMAND_TIMEOUT_S,
+    ):
+        self.workers = workers
+        self.timeout_s = timeout_s
+        self.command_timeout_s = command_timeout_s  # one AT round-trip over the mesh
+        self.retries = retries
+        self.discovery_timeout_s = discovery_timeout_s
+        self.nodes = [bytes.fromhex(address) for address in nodes or ()]
+
+    @classmethod
+    def from_config(cls, conf):
+        return cls(
+            workers=conf.get("workers", DEFAULT_WORKERS),
+            timeout_s=conf.get("timeout_s", DEFAULT_TIMEOUT_S),
+            retries=conf.get("retries", DEFAULT_RETRIES),
+            discovery_timeout_s=conf.get("discovery_timeout_s", DEFAULT_DISCOVERY_TIMEOUT_S),
+            nodes=conf.get("nodes"),
+            command_timeout_s=conf.get("command_timeout_s", DEFAULT_COMMAND_TIMEOUT_S),
+        )
+
+    async def run(self, discover, configure, settings_for):
+        """Provision every discovered (and listed) node and return a ProvisioningReport."""
+        report = ProvisioningReport()
+        started = time.monotonic()
+        try:
+            discovered = await discover(self.discovery_timeout_s)
+        except Exception as e:  # noqa: BLE001
+            _LOGGER.error("Node discovery failed: %s", e)
+            discovered = []
+        report.discovery_s = time.monotonic() - started
+        addresses = list(dict.fromkeys([*discovered, *self.nodes]))
+        _LOGGER.info("Provisioning %d nodes, %d at a time", len(addresses), self.workers)
+
+        semaphore = asyncio.Semaphore(self.workers)
+
+        async def provision(address):
+            result = report.results[address.hex().upper()] = NodeResult(address.hex().upper())
+            settings = settings_for(address)
+            async with semaphore:
+                node_started = time.monotonic()
+                for attempt in range(1, self.retries + 2):
+                    result.attempts = attempt
+                    attempt_future = asyncio.ensure_future(configure(address, settings))
+                    try:
+                        # wait_for cancels the attempt on timeout: a coroutine stops there,
+                        # an executor call keeps its thread until the AT timeouts run out
+                        result.changes = await asyncio.wait_for(attempt_future, self.timeout_s)
+                        result.status = STATUS_CONFIGURED if result.changes else STATUS_UNCHANGED
+                        result.error = None
+                        break
+                    except TimeoutError:
+                        result.status = STATUS_TIMEOUT
+                        result.error = f"no answer within {self.timeout_s} s"
+                        if not isinstance(attempt_future, asyncio.Task):
+                            # Still talking to the node in its thread: no second attempt next to it
+                            break
+                    except Exception as e:  # noqa: BLE001
+                        result.status = STATUS_FAILED
+                        result.error = str(e) or type(e).__name__
+                    _LOGGER.debug(
+                        "Provisioning %s attempt %d failed: %s", result.address_hex, attempt, result.error
+                    )
+                result.elapsed_s = time.monotonic() - node_started
+            if result.status in (STATUS_FAILED, STATUS_TIMEOUT):
+                _LOGGER.warning("Could not provision node %s: %s", result.address_hex, result.error)
+
+        await asyncio.gather(*(provision(address) for address in addresses))
+        report.elapsed_s = time.monotonic() - started
+        _LOGGER.info("Provisioning finished: %s", report.summary())
+        return report
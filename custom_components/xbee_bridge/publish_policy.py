@@ -0,0 +1,151 @@
+import logging
+
+from .io_decoder import ADC_MAX, ADC_REFERENCE_V, SUPPLY_KEY, SUPPLY_SCALE_V
+from .node_state import SAMPLE_TIME_KEY
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_HEARTBEAT_S = 300
+ADC_COUNTS_PER_V = ADC_MAX / ADC_REFERENCE_V
+SUPPLY_COUNTS_PER_V = 1 / SUPPLY_SCALE_V
+
+
+class PublishPolicy:
+    """
+    How one line is published: on change, outside a deadband, and at least every heartbeat_s.
+    The deadband only applies to analog lines and the supply voltage; digital lines
+    are published on every change.
+    """
+
+    __slots__ = ("deadband", "heartbeat_s", "on_change")
+
+    def __init__(self, on_change=True, deadband=0, heartbeat_s=DEFAULT_HEARTBEAT_S):
+        self.on_change = on_change
+        self.deadband = deadband  # in raw counts of the line, 0 = any change
+        self.heartbeat_s = heartbeat_s
+
+    @classmethod
+    def from_config(cls, conf, default=None, counts_per_v=ADC_COUNTS_PER_V):
+        """
+        Build a policy from a config dict, falling back to `default` for missing keys.
+        The deadband may be given in counts (deadband_counts) or volts (deadband_v),
+        converted with the line's counts_per_v (ADC or supply voltage scale).
+        """
+        default = default or cls()
+        deadband = default.deadband
+        if "deadband_counts" in conf:
+            deadband = int(conf["deadband_counts"])
+        elif "deadband_v" in conf:
+            deadband = float(conf["deadband_v"]) * counts_per_v
+        return cls(
+            on_change=conf.get("on_change", default.on_change),
+            deadband=deadband,
+            heartbeat_s=conf.get("heartbeat_s", default.heartbeat_s),
+        )
+
+
+class PublishFilter:
+    """
+    Decides which of a node's keys need publishing for the current sample.
+    Keeps published/suppressed counters for diagnostics.
+    """
+
+    def __init__(self, default_policy=None, line_policies=None):
+        self.default_policy = default_policy or PublishPolicy()
+        self.line_policies = dict(line_policies or {})
+        # The supply voltage is not on the ADC scale: no deadband unless it has its own
+        default_policy = self.default_policy
+        self.line_policies.setdefault(
+            SUPPLY_KEY, PublishPolicy(default_policy.on_change, 0, default_policy.heartbeat_s)
+        )
+        self.published = 0
+        self.suppressed = 0
+
+    @classmethod
+    def from_config(cls, conf):
+        """
+        Build a filter from the `publish` section of the integration config:
+
+            publish:
+              heartbeat_s: 300
+              deadband_v: 0.02
+              lines:
+                dio2_ad2: {deadband_counts: 5, heartbeat_s: 60}
+                dio3_ad3: {on_change: false}
+                supply_voltage: {deadband_v: 0.05}
+
+        The top-level deadband is for the ADC lines; the supply voltage has its own
+        scale and only gets a deadband from its own entry.
+        """
+        conf = conf or {}
+        default_policy = PublishPolicy.from_config(conf)
+        lines = conf.get("lines", {})
+        line_policies = {
+            key: PublishPolicy.from_config(line_conf or {}, default_policy)
+            for key, line_conf in lines.items()
+            if key != SUPPLY_KEY
+        }
+        if lines.get(SUPPLY_KEY):
+            line_policies[SUPPLY_KEY] = PublishPolicy.from_config(
+                lines[SUPPLY_KEY],
+                PublishPolicy(default_policy.on_change, 0, default_policy.heartbeat_s),
+                SUPPLY_COUNTS_PER_V,
+            )
+        return cls(default_policy, line_policies)
+
+    def policy(self, key):
+        return self.line_policies.get(key, self.default_policy)
+
+    def select(self, node, now, skip=()):
+        """
+        Return the keys of `node` to publish for its latest sample, and record them as published.
+        `now` is a monotonic timestamp in seconds. The sample time rides along with any publish.
+        Keys in `skip` (e.g. aggregated lines) are neither selected nor counted.
+        """
+        last_values = node.published_values
+        last_times = node.published_times
+        line_policies = self.line_policies
+        default_policy = self.default_policy
+        sample = node.sample
+        selected = []
+        total = 1  # the sample time
+
+        def due(key, raw, policy, deadband):
+            last = last_values.get(key)
+            if (
+                last is None
+                or not policy.on_change
+                or abs(raw - last) > deadband
+                or (policy.heartbeat_s and now - last_times[key] >= policy.heartbeat_s)
+            ):
+                last_values[key] = raw
+                last_times[key] = now
+                selected.append(key)
+
+        # Digital lines: any change
+        for key, raw in sample.iter_digital():
+            if key in skip:
+                continue
+            total += 1
+            due(key, raw, line_policies.get(key, default_policy), 0)
+        for key, raw in sample.iter_analog():
+            if key in skip:
+                continue
+            total += 1
+            policy = line_policies.get(key, default_policy)
+            due(key, raw, policy, policy.deadband)
+        if sample.power_supply is not None:
+            total += 1
+            policy = line_policies[SUPPLY_KEY]
+            due(SUPPLY_KEY, sample.power_supply, policy, policy.deadband)
+        if selected:
+            selected.append(SAMPLE_TIME_KEY)
+        self.published += len(selected)
+        self.suppressed += total - len(selected)
+        return selected
+
+    def stats(self):
+        return {"published": self.published, "suppressed": self.suppressed}
+
+    def log_stats(self):
+        _LOGGER.info("Publish filter: %d published, %d suppressed", self.published, self.suppressed)
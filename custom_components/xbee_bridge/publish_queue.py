@@ -0,0 +1,138 @@
+import logging
+import threading
+from collections import deque
+
+_LOGGER = logging.getLogger(__name__)
+
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_COALESCE = "coalesce"
+OVERFLOW_POLICIES = (OVERFLOW_DROP_OLDEST, OVERFLOW_COALESCE)
+
+
+class PublishQueue:
+    """
+    Bounded queue between the XBee reader thread and the MQTT client.
+
+    The reader only appends (topic, payload, retain, stream) under a short lock; a dedicated
+    publisher thread drains up to batch_size messages per cycle and hands them to
+    `publish`. When full, either the oldest message is dropped (drop_oldest) or,
+    with coalesce, messages are keyed by topic so only the latest value per topic
+    is kept and the oldest topic is dropped on overflow.
+    """
+
+    def __init__(self, publish, max_size=1000, overflow=OVERFLOW_DROP_OLDEST, batch_size=100):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.publish = publish  # callable(topic, payload, retain, stream) -> bool
+        self.max_size = max_size
+        self.overflow = overflow
+        self.batch_size = batch_size
+        self._coalesce = overflow == OVERFLOW_COALESCE
+        self._pending = {} if self._coalesce else deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        # Counters
+        self.enqueued = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.published = 0
+        self.failed = 0
+        self.max_depth = 0
+
+    @classmethod
+    def from_config(cls, publish, conf):
+        conf = conf or {}
+        return cls(
+            publish,
+            max_size=conf.get("max_size", 1000),
+            overflow=conf.get("overflow", OVERFLOW_DROP_OLDEST),
+            batch_size=conf.get("batch_size", 100),
+        )
+
+    @property
+    def depth(self):
+        return len(self._pending)
+
+    def put(self, topic, payload, retain=True, stream=None):
+        """Queue a message without blocking the caller; `stream` selects the MQTT QoS/expiry settings."""
+        with self._cond:
+            pending = self._pending
+            if self._coalesce:
+                if topic in pending:
+                    # Keep the topic's position, replace its value
+                    self.coalesced += 1
+                elif len(pending) >= self.max_size:
+                    del pending[next(iter(pending))]
+                    self.dropped += 1
+                pending[topic] = (payload, retain, stream)
+            else:
+                if len(pending) >= self.max_size:
+                    pending.popleft()
+                    self.dropped += 1
+                pending.append((topic, payload, retain, stream))
+            self.enqueued += 1
+            depth = len(pending)
+            self.max_depth = max(self.max_depth, depth)
+            self._cond.notify()
+
+    def _take_batch(self):
+        """Remove and return up to batch_size messages; caller holds the lock."""
+        pending = self._pending
+        count = min(len(pending), self.batch_size)
+        if self._coalesce:
+            batch = []
+            for _ in range(count):
+                topic = next(iter(pending))
+                payload, retain, stream = pending.pop(topic)
+                batch.append((topic, payload, retain, stream))
+            return batch
+        return [pending.popleft() for _ in range(count)]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and not self._pending:
+                    self._cond.wait()
+                if not self._pending and not self._running:
+                    return
+                batch = self._take_batch()
+            for topic, payload, retain, stream in batch:
+                try:
+                    ok = self.publish(topic, payload, retain, stream)
+                except Exception:
+                    _LOGGER.exception("Publish to %s failed", topic)
+                    ok = False
+                if ok:
+                    self.published += 1
+                else:
+                    self.failed += 1
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="xbee_bridge_publisher", daemon=True)
+        self._thread.start()
+        _LOGGER.info("Publish queue started (max_size=%d, overflow=%s)", self.max_size, self.overflow)
+
+    def stop(self, timeout=5):
+        """Stop the publisher thread after draining what is already queued."""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        _LOGGER.info("Publish queue stopped: %s", self.stats())
+
+    def stats(self):
+        return {
+            "depth": len(self._pending),
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "published": self.published,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import os
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_RADIO = "default"  # The single radio configured by the top-level port/baud_rate
+
+# Keys a radio entry can set; anything else comes from the top level of the config
+RADIO_KEYS = ("port", "baud_rate", "engine", "api_mode", "process", "force_configure")
+
+
+def radio_configs(conf):
+    """
+    Return {radio name: config} for the integration config. Without a `radios` list
+    the top-level port/baud_rate/engine make up one radio; with it, every entry is a
+    coordinator of its own, on its own port and PAN, inheriting the other top-level keys:
+
+        radios:
+          - name: north
+            port: /dev/ttyUSB0
+          - name: south
+            port: /dev/ttyUSB1
+            engine: process
+    """
+    radios = conf.get("radios")
+    if not radios:
+        return {DEFAULT_RADIO: conf}
+    configs = {}
+    for radio in radios:
+        if "port" not in radio:
+            raise ValueError(f"Radio without a port: {radio}")
+        name = str(radio.get("name") or os.path.basename(radio["port"]))
+        if name in configs:
+            raise ValueError(f"Duplicate radio name: {name}")
+        configs[name] = {**conf, **{key: radio[key] for key in RADIO_KEYS if key in radio}}
+    return configs
+
+
+class Radio:
+    """
+    One coordinator and its acquisition: either an AsyncXBeeEngine, or an
+    XBeeDeviceHandler with its listener thread. Radios fail and restart independently;
+    all of them feed the same data callback and publish pipeline.
+    """
+
+    def __init__(self, name, conf):
+        self.name = name
+        self.conf = conf
+        self.engine = None
+        self.handler = None
+        self.thread = None
+        self.stop_event = None
+        self.supervisor = None  # Optional RadioSupervisor
+        self.lock = asyncio.Lock()  # Held while the radio is stopped or (re)started
+        self.error = None  # Last start failure
+        self.failures = 0
+        self.started_at = None
+
+    @property
+    def acquisition(self):
+        """The running engine or handler, or None."""
+        return self.engine or self.handler
+
+    @property
+    def serial_settings(self):
+        return {key: self.conf.get(key) for key in RADIO_KEYS}
+
+    def topic(self, topic_base, key):
+        """Per-radio topic such as status: {topic_base}/status, or {topic_base}/status/<name> for named radios."""
+        if self.name == DEFAULT_RADIO:
+            return f"{topic_base}/{key}"
+        return f"{topic_base}/{key}/{self.name}"
+
+    def connected(self):
+        if self.engine is not None:
+            return self.engine.is_open()
+        if self.handler is not None:
+            device = self.handler.device
+            return device is not None and device.is_open() and self.thread is not None and self.thread.is_alive()
+        return False
+
+    def notify_lost(self):
+        """The engine lost its device on its own; wakes the supervisor, from any thread."""
+        if self.supervisor is not None:
+            self.supervisor.notify_lost()
+
+    def started(self):
+        self.error = None
+        self.started_at = time.monotonic()
+
+    def failed(self, error):
+        self.error = str(error) or type(error).__name__
+        self.failures += 1
+        _LOGGER.error("XBee radio %s on %s unavailable: %s", self.name, self.conf.get("port"), self.error)
+
+    def stats(self):
+        acquisition = self.acquisition
+        return {
+            "port": self.conf.get("port"),
+            "connected": self.connected(),
+            "failures": self.failures,
+            "error": self.error,
+            "supervisor": self.supervisor.stats() if self.supervisor is not None else None,
+            **(acquisition.stats() if acquisition is not None else {}),
+        }
@@ -0,0 +1,157 @@
+import multiprocessing
+import struct
+from multiprocessing import shared_memory
+
+from .io_decoder import ANALOG_CHANNELS, IOSampleData
+
+# Header fields each live in their own slot so each side only ever writes its own:
+# the worker (producer) the write sequence, drop count and high-water mark, HA
+# (consumer) the read sequence; the waiting flag is set by HA and cleared by the worker.
+SEQUENCE = struct.Struct("<Q")
+WRITE_OFFSET = 0
+DROPPED_OFFSET = 8
+HIGH_WATER_OFFSET = 16
+READ_OFFSET = 24
+WAITING_OFFSET = 32
+HEADER_SIZE = 64
+
+# 64-bit address, digital mask, digital states, analog mask, AD0..AD3, supply, receive time
+RECORD = struct.Struct(f"<8sHHB{ANALOG_CHANNELS}HHxd")
+NO_VALUE = 0xFFFF  # Analog channel or supply voltage not sampled
+
+DEFAULT_CAPACITY = 4096
+# How long HA waits for the header lock before treating the ring as empty for now
+LOCK_TIMEOUT_S = 0.5
+
+
+class SampleRing:
+    """
+    Single-producer, single-consumer ring of fixed-size decoded sample records in shared
+    memory, between the acquisition worker process and HA.
+
+    Sequences are absolute (slot = seq % capacity). The worker writes a record, then
+    publishes the new write sequence; when the ring is full the new sample is dropped and
+    counted. HA reads everything between its read sequence and the write sequence in one
+    batch. HA sets the waiting flag when it has drained the ring, and write() returns True
+    when it cleared that flag, so the worker only wakes HA up once per batch.
+
+    The sequences and the waiting flag are only read and written under `lock`, a
+    process-shared semaphore: its release/acquire pair orders the record stores before
+    the sequence that publishes them, which plain stores to shared memory do not on
+    weakly ordered CPUs such as ARM.
+    """
+
+    def __init__(self, memory, capacity, lock):
+        self.memory = memory
+        self.capacity = capacity
+        self.lock = lock
+        self._buf = memory.buf
+        self._write_seq = SEQUENCE.unpack_from(self._buf, WRITE_OFFSET)[0]
+        self._read_seq = SEQUENCE.unpack_from(self._buf, READ_OFFSET)[0]
+
+    @classmethod
+    def create(cls, capacity=DEFAULT_CAPACITY):
+        memory = shared_memory.SharedMemory(create=True, size=HEADER_SIZE + capacity * RECORD.size)
+        memory.buf[:HEADER_SIZE] = bytes(HEADER_SIZE)
+        memory.buf[WAITING_OFFSET] = 1
+        return cls(memory, capacity, new_lock())
+
+    @classmethod
+    def attach(cls, name, capacity, lock):
+        return cls(shared_memory.SharedMemory(name=name), capacity, lock)
+
+    def renew_lock(self):
+        """Use a fresh lock for the next worker, in case the previous one died holding the old one."""
+        self.lock = new_lock()
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    # Worker side
+
+    def write(self, address, sample, received):
+        """Append one decoded sample; returns True when HA is waiting and should be woken up."""
+        buf = self._buf
+        write_seq = self._write_seq
+        with self.lock:
+            backlog = write_seq - SEQUENCE.unpack_from(buf, READ_OFFSET)[0]
+        if backlog >= self.capacity:
+            SEQUENCE.pack_into(buf, DROPPED_OFFSET, SEQUENCE.unpack_from(buf, DROPPED_OFFSET)[0] + 1)
+            return False
+        supply = sample.power_supply
+        RECORD.pack_into(
+            buf, HEADER_SIZE + (write_seq % self.capacity) * RECORD.size,
+            address, sample.digital_mask, sample.digital_states, sample.analog_mask,
+            *[NO_VALUE if value is None else value for value in sample.analog_values],
+            NO_VALUE if supply is None else supply,
+            received,
+        )
+        self._write_seq = write_seq + 1
+        if backlog + 1 > SEQUENCE.unpack_from(buf, HIGH_WATER_OFFSET)[0]:
+            SEQUENCE.pack_into(buf, HIGH_WATER_OFFSET, backlog + 1)
+        with self.lock:
+            SEQUENCE.pack_into(buf, WRITE_OFFSET, write_seq + 1)
+            waiting = buf[WAITING_OFFSET]
+            buf[WAITING_OFFSET] = 0
+        return bool(waiting)
+
+    # HA side
+
+    def read_batch(self):
+        """Return every record written since the last call, oldest first; [] once drained."""
+        buf = self._buf
+        read_seq = self._read_seq
+        if not self.lock.acquire(timeout=LOCK_TIMEOUT_S):
+            return []  # the worker died holding it; it is restarted with a new lock
+        try:
+            write_seq = SEQUENCE.unpack_from(buf, WRITE_OFFSET)[0]
+            if write_seq == read_seq:
+                buf[WAITING_OFFSET] = 1
+                return []
+        finally:
+            self.lock.release()
+        count = write_seq - read_seq
+        start = read_seq % self.capacity
+        first = min(count, self.capacity - start)
+        offset = HEADER_SIZE + start * RECORD.size
+        records = list(RECORD.iter_unpack(buf[offset:offset + first * RECORD.size]))
+        if count > first:
+            records += RECORD.iter_unpack(buf[HEADER_SIZE:HEADER_SIZE + (count - first) * RECORD.size])
+        self._read_seq = write_seq
+        with self.lock:
+            SEQUENCE.pack_into(buf, READ_OFFSET, write_seq)
+        return records
+
+    def stats(self):
+        buf = self._buf
+        written = SEQUENCE.unpack_from(buf, WRITE_OFFSET)[0]
+        return {
+            "capacity": self.capacity,
+            "written": written,
+            "backlog": written - self._read_seq,
+            "high_water": SEQUENCE.unpack_from(buf, HIGH_WATER_OFFSET)[0],
+            "dropped": SEQUENCE.unpack_from(buf, DROPPED_OFFSET)[0],
+        }
+
+    def close(self, unlink=False):
+        self._buf = None
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
+
+
+def new_lock():
+    # spawn context: the lock is handed to the worker, which is started with spawn
+    return multiprocessing.get_context("spawn").Lock()
+
+
+def sample_from_record(record):
+    """Return (64-bit address, IOSampleData, receive time) for a ring record."""
+    address, digital_mask, digital_states, analog_mask, *analog, supply, received = record
+    analog_values = [None if value == NO_VALUE else value for value in analog]
+    return (
+        address,
+        IOSampleData(digital_mask, digital_states, analog_mask, analog_values, None if supply == NO_VALUE else supply),
+        received,
+    )
@@ -0,0 +1,125 @@
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorStateClass,
+)
+from homeassistant.const import EntityCategory, UnitOfElectricPotential
+
+from .entity_updates import XBeeNodeEntity, async_setup_node_entities
+from .metrics import METRICS
+from .node_state import analog_keys
+
+_LOGGER = logging.getLogger(__name__)
+
+SCAN_INTERVAL = timedelta(seconds=30)
+
+MEASUREMENT = SensorStateClass.MEASUREMENT
+TOTAL = SensorStateClass.TOTAL_INCREASING
+
+# The diagnostic sensors are polled together each SCAN_INTERVAL; they share one
+# METRICS snapshot per cycle instead of building one each.
+SNAPSHOT_MAX_AGE_S = 5.0
+
+# key, name, unit, state class, path into METRICS.snapshot()
+DIAGNOSTIC_SENSORS = (
+    ("frames_received", "Frames received", None, TOTAL, ("frames_received",)),
+    ("samples_per_s", "Samples per second", "samples/s", MEASUREMENT, ("samples_per_s",)),
+    ("parse_p95", "Parse time p95", "ms", MEASUREMENT, ("parse", "p95_ms")),
+    ("callback_p95", "Callback time p95", "ms", MEASUREMENT, ("callback", "p95_ms")),
+    ("publish_ack_p95", "Publish ack time p95", "ms", MEASUREMENT, ("publish_ack", "p95_ms")),
+    ("queue_depth", "Publish queue depth", None, MEASUREMENT, ("publish_queue", "depth")),
+    ("queue_dropped", "Publishes dropped", None, TOTAL, ("publish_queue", "dropped")),
+    ("queue_failed", "Publishes failed", None, TOTAL, ("publish_queue", "failed")),
+    ("publishes_suppressed", "Publishes suppressed", None, TOTAL, ("publish_filter", "suppressed")),
+    ("serial_reconnects", "Serial reconnects", None, TOTAL, ("serial_reconnects",)),
+    ("radios_connected", "Radios connected", None, MEASUREMENT, ("radios", "connected")),
+    ("watchdog_stalls", "Watchdog stalls", None, TOTAL, ("watchdog_stalls",)),
+    ("serial_recovery_max", "Serial time to recover max", "ms", MEASUREMENT, ("serial_recovery", "max_ms")),
+    ("broker_reconnects", "Broker reconnects", None, TOTAL, ("broker_reconnects",)),
+    ("broker_recovery_max", "Broker time to recover max", "ms", MEASUREMENT, ("broker_recovery", "max_ms")),
+    ("sample_rate", "Sample rate", "ms", MEASUREMENT, ("sample_rate", "sample_rate_ms")),
+    ("sample_interval", "Effective sample interval", "ms", MEASUREMENT, ("sample_rate", "effective_interval_ms")),
+)
+
+
+async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
+    """
+    Set up the XBee Bridge sensors, loaded via discovery from async_setup: either the
+    diagnostic sensors or the per-node analog line sensors, depending on discovery_info.
+    """
+    if discovery_info is None:
+        return
+    if discovery_info.get("nodes"):
+        async_setup_node_entities(hass, async_add_entities, analog_keys, XBeeNodeSensor)
+        return
+    async_add_entities(
+        XBeeBridgeDiagnosticSensor(*description) for description in DIAGNOSTIC_SENSORS
+    )
+
+
+_snapshot_lock = threading.Lock()
+_snapshot = None
+_snapshot_taken = 0.0
+
+
+def metrics_snapshot():
+    """The METRICS snapshot of the current polling cycle, taken by its first caller."""
+    global _snapshot, _snapshot_taken
+    with _snapshot_lock:
+        now = time.monotonic()
+        if _snapshot is None or now - _snapshot_taken > SNAPSHOT_MAX_AGE_S:
+            _snapshot = METRICS.snapshot()
+            _snapshot_taken = now
+        return _snapshot
+
+
+class XBeeNodeSensor(XBeeNodeEntity, SensorEntity):
+    """
+    Analog line or supply voltage of an XBee node, pushed on every changed sample.
+    Unit and device class come from the line map (volts unless configured otherwise).
+    """
+
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(self, node, key):
+        super().__init__(node, key)
+        unit = node.lines.unit(key)
+        device_class = node.lines.device_class(key)
+        self._attr_native_unit_of_measurement = UnitOfElectricPotential.VOLT if unit == "V" else unit
+        self._attr_device_class = None
+        if device_class:
+            try:
+                self._attr_device_class = SensorDeviceClass(device_class)
+            except ValueError:
+                _LOGGER.warning(
+                    "Unknown device_class %r for %s of node %s in the line map, using none",
+                    device_class, key, node.address_hex,
+                )
+
+    def _set_value(self, value):
+        super()._set_value(value)
+        self._attr_native_value = float(value) if value is not None else None
+
+
+class XBeeBridgeDiagnosticSensor(SensorEntity):
+    """One runtime metric of the bridge, read from the polling cycle's METRICS snapshot."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, key, name, unit, state_class, path):
+        self._path = path
+        self._attr_name = f"XBee Bridge {name}"
+        self._attr_unique_id = f"xbee_bridge_{key}"
+        self._attr_native_unit_of_measurement = unit
+        self._attr_state_class = state_class
+
+    def update(self):
+        value = metrics_snapshot()
+        for part in self._path:
+            value = value.get(part) if isinstance(value, dict) else None
+        self._attr_native_value = value
@@ -1,5 +1,6 @@
 import logging
-import serial  # pySerial
+import threading
+
 from digi.xbee.devices import XBeeDevice  # Digi XBee library
 
 # Logger for Home Assistant
@@ -9,16 +10,24 @@ _LOGGER = logging.getLogger(__name__)
 REMOTE_SENSORS = False
 
 class XBeeBridge:
+    """
+    Minimal digi-xbee listener that logs every I/O sample. Samples arrive on digi's
+    reader thread; run() only waits until stop() is called. For the full pipeline
+    as a service, use the daemon: python -m custom_components.xbee_bridge.daemon
+    """
+
     def __init__(self, port, baud_rate):
         self.port = port
         self.baud_rate = baud_rate
         self.device = None
+        self._stop_event = threading.Event()
 
     def setup_device(self):
         """Set up the XBee device."""
         try:
             self.device = XBeeDevice(self.port, self.baud_rate)
             self.device.open()
+            self.device.add_io_sample_received_callback(self.process_io_sample)
             _LOGGER.info("XBee device opened on port %s with baud rate %s", self.port, self.baud_rate)
         except Exception as e:
             _LOGGER.error("Failed to open XBee device: %s", e)
@@ -26,38 +35,33 @@ class XBeeBridge:
     def close_device(self):
         """Close the XBee device."""
         if self.device and self.device.is_open():
+            self.device.del_io_sample_received_callback(self.process_io_sample)
             self.device.close()
             _LOGGER.info("XBee device closed.")
 
-    def process_io_samples(self):
-        """Process I/O samples."""
+    def process_io_sample(self, io_sample, remote_xbee, send_time):
+        """Handle one I/O sample (digi reader thread)."""
         if REMOTE_SENSORS:
             # Future stub for remote sensors
             _LOGGER.debug("REMOTE_SENSORS is enabled. Remote sensors processing is not implemented yet.")
-        else:
-            _LOGGER.debug("Processing I/O samples from local XBee module.")
-
-        # Example: Read and log I/O samples (pseudo-code)
-        try:
-            io_sample = self.device.read_io_sample()
-            if io_sample:
-                _LOGGER.info("Received I/O sample: %s", io_sample)
-                # Handle MQTT publication here
-        except Exception as e:
-            _LOGGER.error("Error reading I/O samples: %s", e)
+        source = remote_xbee.get_64bit_addr() if remote_xbee is not None else "local"
+        _LOGGER.info("Received I/O sample from %s: %s", source, io_sample)
 
     def run(self):
-        """Main loop to process I/O samples."""
+        """Wait for samples until stop() is called or the process is interrupted."""
         try:
-            while True:
-                self.process_io_samples()
+            self._stop_event.wait()
         except KeyboardInterrupt:
             _LOGGER.info("XBeeBridge interrupted by user.")
         finally:
             self.close_device()
 
+    def stop(self):
+        self._stop_event.set()
+
 # Example initialization (replace with actual parameters)
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     bridge = XBeeBridge(port="/dev/ttyUSB0", baud_rate=9600)
     bridge.setup_device()
-    bridge.run()
\ No newline at end of file
+    bridge.run()
@@ -0,0 +1,145 @@
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+MAGIC = b"XBSPOOL1"
+# magic, record size, capacity, head sequence, tail sequence, evicted count
+HEADER = struct.Struct("<8sIIQQQ")
+HEADER_SIZE = 64
+# timestamp, retain flag, stream id, topic length, payload length
+RECORD_HEADER = struct.Struct("<dBBHH")
+
+DEFAULT_RECORD_SIZE = 256
+DEFAULT_CAPACITY = 20000  # ~5 MB with 256-byte records
+
+
+class DiskSpool:
+    """
+    Persistent append-only ring of MQTT messages, backed by a memory-mapped file.
+
+    The file is a 64-byte header followed by `capacity` fixed-size records, so its size
+    never grows past HEADER_SIZE + capacity * record_size. Head and tail are absolute
+    sequence numbers (slot = seq % capacity). When the ring is full the oldest record
+    is evicted and counted; messages too large for a record are rejected. Each record
+    keeps the id of its message stream (an index chosen by the client) so it is
+    replayed with that stream's QoS and expiry.
+    """
+
+    def __init__(self, path, capacity=DEFAULT_CAPACITY, record_size=DEFAULT_RECORD_SIZE):
+        self.path = path
+        self.capacity = capacity
+        self.record_size = record_size
+        self.max_data = record_size - RECORD_HEADER.size
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._map = None
+        self._head = 0
+        self._tail = 0
+        self.evicted = 0
+        self._open()
+
+    @classmethod
+    def from_config(cls, conf, default_path):
+        return cls(
+            conf.get("path", default_path),
+            capacity=conf.get("max_records", DEFAULT_CAPACITY),
+            record_size=conf.get("record_size", DEFAULT_RECORD_SIZE),
+        )
+
+    def _open(self):
+        size = HEADER_SIZE + self.capacity * self.record_size
+        exists = os.path.exists(self.path) and os.path.getsize(self.path) == size
+        self._file = open(self.path, "r+b" if exists else "w+b")  # noqa: SIM115 - mapped until close()
+        if not exists:
+            self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+        magic, record_size, capacity, head, tail, evicted = HEADER.unpack_from(self._map, 0)
+        if exists and magic == MAGIC and record_size == self.record_size and capacity == self.capacity:
+            self._head, self._tail, self.evicted = head, tail, evicted
+            if self._tail != self._head:
+                _LOGGER.info("Spool %s holds %d unsent messages", self.path, len(self))
+        else:
+            if exists:
+                _LOGGER.warning("Spool %s has an incompatible layout, starting empty", self.path)
+            self._write_header()
+
+    def _write_header(self):
+        HEADER.pack_into(
+            self._map, 0, MAGIC, self.record_size, self.capacity, self._head, self._tail, self.evicted
+        )
+
+    def __len__(self):
+        return self._tail - self._head
+
+    def append(self, topic, payload, retain=True, timestamp=None, stream=0):
+        """Store one message; returns False if it does not fit in a record."""
+        topic_bytes = topic.encode()
+        payload_bytes = payload.encode() if isinstance(payload, str) else bytes(payload)
+        if len(topic_bytes) + len(payload_bytes) > self.max_data:
+            self.rejected += 1
+            _LOGGER.warning("Message for %s too large for the spool, dropped", topic)
+            return False
+        with self._lock:
+            if self._tail - self._head >= self.capacity:
+                self._head += 1
+                self.evicted += 1
+            offset = HEADER_SIZE + (self._tail % self.capacity) * self.record_size
+            RECORD_HEADER.pack_into(
+                self._map, offset, timestamp or time.time(), 1 if retain else 0, stream,
+                len(topic_bytes), len(payload_bytes),
+            )
+            start = offset + RECORD_HEADER.size
+            self._map[start:start + len(topic_bytes)] = topic_bytes
+            start += len(topic_bytes)
+            self._map[start:start + len(payload_bytes)] = payload_bytes
+            self._tail += 1
+            self._write_header()
+        return True
+
+    def peek(self, count):
+        """
+        Return up to `count` oldest messages as (seq, timestamp, topic, payload, retain, stream id),
+        without removing them.
+        """
+        records = []
+        with self._lock:
+            for seq in range(self._head, min(self._tail, self._head + count)):
+                offset = HEADER_SIZE + (seq % self.capacity) * self.record_size
+                timestamp, retain, stream, topic_len, payload_len = RECORD_HEADER.unpack_from(self._map, offset)
+                start = offset + RECORD_HEADER.size
+                topic = self._map[start:start + topic_len].decode()
+                start += topic_len
+                payload = self._map[start:start + payload_len]
+                records.append((seq, timestamp, topic, payload, bool(retain), stream))
+        return records
+
+    def release(self, seq):
+        """Remove every message up to and including `seq` once they have been sent."""
+        with self._lock:
+            if seq >= self._head:
+                self._head = min(self._tail, seq + 1)
+                self._write_header()
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.flush()
+                self._map.close()
+                self._map = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self):
+        return {
+            "pending": len(self),
+            "capacity": self.capacity,
+            "evicted": self.evicted,
+            "rejected": self.rejected,
+        }
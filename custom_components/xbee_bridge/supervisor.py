@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import time
+
+from .metrics import METRICS
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_STALL_FACTOR = 3  # IR periods without a sample before the radio counts as stalled
+DEFAULT_MIN_STALL_S = 10
+DEFAULT_BACKOFF_MIN_S = 1
+DEFAULT_BACKOFF_MAX_S = 60
+SAMPLE_REQUEST_TIMEOUT_S = 5
+
+
+class Backoff:
+    """Exponential retry delays: min_s, 2 * min_s, ... capped at max_s."""
+
+    def __init__(self, min_s=DEFAULT_BACKOFF_MIN_S, max_s=DEFAULT_BACKOFF_MAX_S):
+        self.min_s = min_s
+        self.max_s = max_s
+        self.delay_s = None
+
+    def next(self):
+        self.delay_s = self.min_s if self.delay_s is None else min(self.delay_s * 2, self.max_s)
+        return self.delay_s
+
+    def reset(self):
+        self.delay_s = None
+
+
+class RadioSupervisor:
+    """
+    Keeps one radio running. It wakes up when the engine reports a lost connection,
+    and otherwise once per stall window (stall_factor x IR, at least min_stall_s):
+
+    - lost connection, or a radio that never came up: reopen, retrying with exponential
+      backoff until it is back;
+    - no sample during a whole window: request one with IS. No answer means the serial
+      link is gone and the radio is reopened; an answer but still no sample a window
+      later also ends in a reopen.
+
+    The watchdog only arms once the radio has delivered a sample, so a coordinator
+    without sampling nodes is left alone. Time from failure to the first good state is
+    recorded as the time to recover.
+
+        supervisor:
+          stall_factor: 3
+          min_stall_s: 10
+          backoff_min_s: 1
+          backoff_max_s: 60
+    """
+
+    def __init__(
+        self, radio, reopen, request_sample, stall_factor=DEFAULT_STALL_FACTOR, min_stall_s=DEFAULT_MIN_STALL_S,
+        backoff_min_s=DEFAULT_BACKOFF_MIN_S, backoff_max_s=DEFAULT_BACKOFF_MAX_S,
+    ):
+        self.radio = radio
+        self.reopen = reopen  # coroutine function: stop and start the radio
+        self.request_sample = request_sample  # coroutine function: send IS to the radio
+        self.stall_factor = stall_factor
+        self.min_stall_s = min_stall_s
+        self.backoff = Backoff(backoff_min_s, backoff_max_s)
+        self.state = "starting"
+        self.stalls = 0
+        self.reopens = 0
+        self.recoveries = 0
+        self.last_recovery_s = None
+        self.max_recovery_s = None
+        self._lost = asyncio.Event()
+        self._loop = None
+        self._task = None
+
+    @classmethod
+    def from_config(cls, radio, reopen, request_sample, conf):
+        return cls(
+            radio, reopen, request_sample,
+            stall_factor=conf.get("stall_factor", DEFAULT_STALL_FACTOR),
+            min_stall_s=conf.get("min_stall_s", DEFAULT_MIN_STALL_S),
+            backoff_min_s=conf.get("backoff_min_s", DEFAULT_BACKOFF_MIN_S),
+            backoff_max_s=conf.get("backoff_max_s", DEFAULT_BACKOFF_MAX_S),
+        )
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._task = self._loop.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify_lost(self):
+        """The engine lost its device; safe to call from any thread."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._lost.set)
+
+    def stall_timeout_s(self):
+        acquisition = self.radio.acquisition
+        sample_rate_ms = acquisition.sample_rate_ms if acquisition is not None else 0
+        return max(self.stall_factor * sample_rate_ms / 1000, self.min_stall_s)
+
+    def _samples(self):
+        acquisition = self.radio.acquisition
+        return acquisition.nodes.samples if acquisition is not None else 0
+
+    async def _wait(self, timeout_s):
+        """Wait up to timeout_s; returns True when the connection was reported lost."""
+        try:
+            await asyncio.wait_for(self._lost.wait(), timeout_s)
+            return True
+        except TimeoutError:
+            return False
+
+    async def _run(self):
+        while True:
+            if not self.radio.connected():
+                await self._recover(time.monotonic())
+                continue
+            self.state = "ok"
+            self._lost.clear()
+            samples = self._samples()
+            timeout_s = self.stall_timeout_s()
+            if await self._wait(timeout_s):
+                _LOGGER.warning("XBee radio %s lost its device", self.radio.name)
+                await self._recover(time.monotonic())
+                continue
+            if not samples or self._samples() != samples:
+                continue
+
+            # Stalled: no sample during a whole window
+            stalled_since = time.monotonic() - timeout_s
+            self.stalls += 1
+            self.state = "stalled"
+            METRICS.inc("watchdog_stalls")
+            _LOGGER.warning("XBee radio %s: no samples for %.0f s, requesting one", self.radio.name, timeout_s)
+            try:
+                await asyncio.wait_for(self.request_sample(self.radio), SAMPLE_REQUEST_TIMEOUT_S)
+            except Exception as e:  # noqa: BLE001
+                _LOGGER.warning("XBee radio %s does not answer (%s), reopening it", self.radio.name, e)
+                await self._recover(stalled_since, force=True)
+                continue
+            if not await self._wait(timeout_s) and self._samples() == samples:
+                _LOGGER.warning("XBee radio %s answers but sends no samples, reopening it", self.radio.name)
+            elif self._samples() != samples:
+                self._recovered(stalled_since)
+                continue
+            await self._recover(stalled_since, force=True)
+
+    async def _recover(self, down_since, force=False):
+        """
+        Reopen the radio until it is connected, with exponential backoff between attempts.
+        A stalled radio still looks connected, so it is reopened at least once (force).
+        """
+        self.state = "recovering"
+        self.backoff.reset()
+        while True:
+            self._lost.clear()
+            if force or not self.radio.connected():
+                force = False
+                self.reopens += 1
+                METRICS.inc("serial_reconnects")
+                await self.reopen(self.radio)
+            if self.radio.connected():
+                self._recovered(down_since)
+                return
+            delay_s = self.backoff.next()
+            _LOGGER.warning("XBee radio %s still unavailable, retrying in %.0f s", self.radio.name, delay_s)
+            await asyncio.sleep(delay_s)
+
+    def _recovered(self, down_since):
+        recovery_s = time.monotonic() - down_since
+        self.recoveries += 1
+        self.last_recovery_s = recovery_s
+        self.max_recovery_s = max(self.max_recovery_s or 0, recovery_s)
+        self.state = "ok"
+        METRICS.observe("serial_recovery", recovery_s)
+        _LOGGER.warning("XBee radio %s recovered after %.1f s", self.radio.name, recovery_s)
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "stalls": self.stalls,
+            "reopens": self.reopens,
+            "recoveries": self.recoveries,
+            "last_recovery_ms": round(self.last_recovery_s * 1000) if self.last_recovery_s is not None else None,
+            "max_recovery_ms": round(self.max_recovery_s * 1000) if self.max_recovery_s is not None else None,
+        }
@@ -1,45 +1,83 @@
 import logging
-from digi.xbee.devices import XBeeDevice, XBee64BitAddress
-from digi.xbee.io import IOLine, IOMode
 import struct
-import re
-from datetime import datetime   # , timezone
-from zoneinfo import ZoneInfo
+import threading
+import time
+
+from digi.xbee.devices import RemoteXBeeDevice, XBeeDevice
+from digi.xbee.exception import TimeoutException, XBeeException
+from digi.xbee.models.address import XBee64BitAddress
+
+from .at_config import (
+    PhaseTimer,
+    desired_settings,
+    diff_settings,
+    same_value,
+    sample_rate_bytes,
+)
+from .io_decoder import decode_io_sample
+from .metrics import METRICS, SAMPLE_LOG
+from .node_state import DEFAULT_LINE_MAP, DEFAULT_TOPIC_BASE, NodeTable
 
 _LOGGER = logging.getLogger(__name__)
 
 class XBeeDeviceHandler:
-    def __init__(self, port, baud_rate, sample_rate_ms):
+    def __init__(
+        self, port, baud_rate, sample_rate_ms, topic_base=DEFAULT_TOPIC_BASE, change_detect=0, line_map=None
+    ):
         self.port = port
         self.baud_rate = baud_rate
         self.sample_rate_ms = sample_rate_ms
+        self.change_detect = change_detect  # IC mask of digital lines sampled on change
+        self.line_map = line_map or DEFAULT_LINE_MAP  # Line modes and value conversion
         self.device = None
-        self.data = {
-            "status": None,
-            "sample_time": None,
-            "dio2_ad2": None,
-            "dio3_ad3": None,
-        }
+        self.status = None
+        self.local_address = None  # 64-bit address of the local module, as bytes
+        self.nodes = NodeTable(topic_base, self.line_map)  # Per-node state keyed by 64-bit address
         self.data_callback = None  # Callback for new data
+        self.status_callback = None  # Callback for the module status string
+        self.opened_at = None
+        self.timer = PhaseTimer()  # Startup time broken down by phase
+        self.applied_settings = {}  # AT parameters known to be on the module
+        self.recorder = None  # Optional FrameRecorder for raw API frames
 
     def set_data_callback(self, callback):
         """
-        Sets a callback function that will be called with a dictionary of parsed sensor data.
+        Sets a callback function that will be called with the NodeState of the node
+        that sent a sample. The node's values dict is updated in place, not copied.
         """
         self.data_callback = callback
 
+    def set_status_callback(self, callback):
+        """
+        Sets a callback function that will be called with the module status string once the device is open.
+        """
+        self.status_callback = callback
+
+    def set_frame_recorder(self, recorder):
+        """Record every raw API frame received from the module (see frame_recorder.py)."""
+        self.recorder = recorder
+
     def open_device(self):
         """Open the XBee device and fetch device information."""
         try:
-            self.device = XBeeDevice(self.port, self.baud_rate)
-            self.device.open(force_settings=True)
+            with self.timer.phase("open"):
+                self.device = XBeeDevice(self.port, self.baud_rate)
+                self.device.open(force_settings=True)
+            self.opened_at = time.monotonic()
             # _LOGGER.info("Device opened successfully on port %s", self.port)
-            node_id = self.device.get_node_id().strip()
-            firmware_bytes = self.device.get_firmware_version()
+            with self.timer.phase("device info"):
+                node_id = self.device.get_node_id().strip()
+                firmware_bytes = self.device.get_firmware_version()
             version_hex = "".join(f"{b:02x}" for b in firmware_bytes)
             status_str = f"XBEE module: {node_id}, Firmware version: {version_hex}"
-            self.data["status"] = status_str
+            self.status = status_str
+            self.local_address = bytes(self.device.get_64bit_addr().address)
             _LOGGER.info(status_str)
+            if self.status_callback:
+                try:
+                    self.status_callback(status_str)
+                except Exception:
+                    _LOGGER.exception("Error in status_callback")
 
             # # Structured and formatted version
             # self.data["status_struct"] = {
@@ -52,40 +90,43 @@ class XBeeDeviceHandler:
             _LOGGER.error("Failed to open XBee device: %s", e)
             raise
 
-    def configure_device(self):
-        """Configure the XBee device."""
+    def configure_device(self, force=False):
+        """
+        Configure the XBee device: read the current parameters, write only the ones
+        that differ and apply changes only if something was written. digi reads one
+        parameter per round-trip; with `force` nothing is read: the settings are diffed
+        against what this handler last wrote, i.e. all of them are written the first time.
+        """
         try:
-            # Configure DIO2_AD2 as Analog Input
-            self.device.set_io_configuration(IOLine.DIO2_AD2, IOMode.ADC)
-            # Configure DIO3_AD3 as Digital Input
-            self.device.set_io_configuration(IOLine.DIO3_AD3, IOMode.DIGITAL_IN)
-            _LOGGER.info("DIO2 and DIO3 configured")
-
-            # Set destination address to broadcast
-            self.device.set_dest_address(XBee64BitAddress.from_hex_string("000000000000FFFF"))
-            _LOGGER.info("Address set to broadcast")
-
-            # Set I/O sampling rate
-            sample_rate_bytes = struct.pack(">H", self.sample_rate_ms)
-            self.device.set_parameter("IR", sample_rate_bytes)
-            _LOGGER.info("Sample rate set to %d milliseconds", self.sample_rate_ms)
-            #  note: N/A for XBee-PRO
-            # # Setting the "NJ" parameter (Node Join) to 0 disables the module from joining any new networks.
-            # self.device.set_parameter("NJ", b'\x00')  # Set NJ to 0
-            # _LOGGER.info("NJ command disable the module from joining any new networks")
-            # RF Channels to scan
-            self.device.set_parameter("SC", b'\x00\x02')  # Set SC to 2 - prevent RF spam
-
-            # RF Power Level
-            self.device.set_parameter("PL", b'\x00')  # 0 = -8 dBm - lowest radio power
-
-            # Apply changes to save the configuration
-            self.device.apply_changes()
-            _LOGGER.info("Configuration changes applied")
+            desired = desired_settings(self.sample_rate_ms, self.change_detect, self.line_map.mode_settings())
+            if force:
+                current = dict(self.applied_settings)
+            else:
+                with self.timer.phase("read"):
+                    current = {}
+                    for command in desired:
+                        try:
+                            current[command] = bytes(self.device.get_parameter(command))
+                        except XBeeException as e:
+                            _LOGGER.warning("Could not read %s, will write it: %s", command, e)
+            changes = diff_settings(current, desired)
+
+            if changes:
+                with self.timer.phase("write"):
+                    for command, value in changes.items():
+                        self.device.set_parameter(command, value)
+                # Apply changes to activate the configuration
+                with self.timer.phase("apply"):
+                    self.device.apply_changes()
+                _LOGGER.info("Configuration changed: %s", ", ".join(changes))
+            else:
+                _LOGGER.info("Configuration already up to date, nothing written")
+            self.applied_settings = dict(desired)
 
             # note: IS command executed as request, not expected returned data
-            self.device.execute_command("IS")
-            _LOGGER.info("IS command sent to request immediate sample")
+            with self.timer.phase("sample request"):
+                self.device.execute_command("IS")
+            _LOGGER.info("Startup took %s", self.timer.report())
 
         except Exception as e:
             _LOGGER.error("Failed to configure XBee device: %s", e)
@@ -94,55 +135,141 @@ class XBeeDeviceHandler:
     def register_io_sample_callback(self):
         """Register a callback function to process incoming I/O samples."""
         def io_sample_callback(io_sample, remote_xbee, send_time):
-            _LOGGER.info("I/O sample received at time %s", datetime.now().strftime('%H:%M:%S'))
-
+            started = time.perf_counter()
+            # send_time is the wall-clock time digi's reader got the frame
+            received = time.monotonic() - max(0.0, time.time() - send_time) if send_time else time.monotonic()
+            METRICS.inc("frames_received")
             try:
-                # Convert the object to a string and parse it manually
-                sample_str = str(io_sample)
-                _LOGGER.info("Raw sample data: %s", sample_str)
-
-                # Parse digital values
-                digital_matches = re.findall(r'IOLine\.([A-Z0-9_]+):\s*IOValue\.([A-Z]+)', sample_str)
-                for line, value in digital_matches:
-                    if line == "DIO3_AD3":
-                        self.data["dio3_ad3"] = value
-                    _LOGGER.info("%s: %s", line, value)
-
-                # Parse analog values
-                analog_matches = re.findall(r'IOLine\.([A-Z0-9_]+):\s*(\d+)', sample_str)
-                for line, value_str in analog_matches:
-                    if line == "DIO2_AD2":
-                        value = int(value_str)
-                        voltage = (value / 1023) * 3.3  # Assuming a 3.3V reference
-                        formatted = f"{line}: {value} (approx. {voltage:.2f}V)"
-                        # self.data["dio2_ad2"] = formatted
-                        self.data["dio2_ad2"] = f"{voltage:.2f}"
-                    _LOGGER.info(formatted)
-                # Save the sample time
-                self.data["sample_time"] = datetime.now(tz=ZoneInfo('Asia/Jerusalem')).isoformat()
-                time2log = datetime.now(tz=ZoneInfo('Asia/Jerusalem'))
-                _LOGGER.info("Sample time: %s", time2log)
+                # Read the enabled lines straight from the sample masks/values
+                sample = decode_io_sample(io_sample)
+                if remote_xbee is not None:
+                    address = bytes(remote_xbee.get_64bit_addr().address)
+                else:
+                    address = self.local_address
+                node = self.nodes.update(address, sample, received)
+                parsed = time.perf_counter()
+                METRICS.observe("parse", parsed - started)
+                SAMPLE_LOG.sample(node)
                 # Call the external data callback if set
                 if self.data_callback:
                     try:
-                        self.data_callback(self.data.copy())
-                    except Exception as e:
-                        _LOGGER.error("Error in data_callback: %s", e)
+                        self.data_callback(node)
+                    except Exception:
+                        _LOGGER.exception("Error in data_callback")
+                    METRICS.observe("callback", time.perf_counter() - parsed)
             except Exception as e:
                 _LOGGER.error("Error processing I/O sample: %s", e)
 
+        def packet_callback(packet):
+            # Frame data only: strip delimiter, length and checksum
+            self.recorder.record(packet.output()[3:-1])
+
         try:
+            if self.recorder is not None:
+                self.device.add_packet_received_callback(packet_callback)
             self.device.add_io_sample_received_callback(io_sample_callback)
             _LOGGER.info("I/O sample callback registered")
         except Exception as e:
             _LOGGER.error("Failed to register I/O sample callback: %s", e)
             raise
 
+    def discover_nodes(self, timeout_s):
+        """Run a node discovery (ND) and return the 64-bit addresses (bytes) of the nodes found."""
+        network = self.device.get_network()
+        finished = threading.Event()
+
+        def discovery_finished(*args):
+            finished.set()
+
+        network.add_discovery_process_finished_callback(discovery_finished)
+        try:
+            network.set_discovery_timeout(timeout_s)
+            network.start_discovery_process()
+            finished.wait(timeout_s + 5)
+        finally:
+            network.del_discovery_process_finished_callback(discovery_finished)
+        return [bytes(remote.get_64bit_addr().address) for remote in network.get_devices()]
+
+    def configure_remote(self, address, settings):
+        """
+        Read `settings` from the remote node with 64-bit `address`, write the ones that
+        differ and apply them. Returns the changed commands. Each AT round-trip is bounded
+        by the device's sync operations timeout; the first read that times out raises, so
+        an unreachable node fails after one timeout instead of one per setting.
+        """
+        remote = RemoteXBeeDevice(self.device, XBee64BitAddress(address))
+        current = {}
+        for command in settings:
+            try:
+                current[command] = bytes(remote.get_parameter(command))
+            except TimeoutException:
+                raise
+            except XBeeException as e:
+                _LOGGER.debug("Could not read %s from %s, will write it: %s", command, address.hex(), e)
+        changes = diff_settings(current, settings)
+        if changes:
+            for command, value in changes.items():
+                remote.set_parameter(command, value, apply=False)
+            remote.apply_changes()
+        return list(changes)
+
+    def set_sample_rate(self, sample_rate_ms):
+        """Change IR on the open device without reopening or reconfiguring anything else."""
+        value = sample_rate_bytes(sample_rate_ms)
+        self.sample_rate_ms = sample_rate_ms
+        if same_value(self.applied_settings.get("IR"), value):
+            return
+        try:
+            self.device.set_parameter("IR", value)
+            self.device.apply_changes()
+            self.applied_settings["IR"] = value
+            _LOGGER.info("Sample rate set to %d milliseconds", sample_rate_ms)
+        except Exception as e:
+            _LOGGER.error("Failed to set sample rate: %s", e)
+            raise
+
+    def set_line_map(self, line_map):
+        """Convert values with a new line map from the next sample on, and write any changed line modes."""
+        previous, self.line_map = self.line_map, line_map
+        self.nodes.set_line_map(line_map)
+        changes = diff_settings(self.applied_settings, line_map.mode_settings(previous=previous))
+        if not changes:
+            return
+        try:
+            for command, value in changes.items():
+                self.device.set_parameter(command, value)
+            self.device.apply_changes()
+            self.applied_settings.update(changes)
+            _LOGGER.info("Line modes changed: %s", ", ".join(changes))
+        except Exception as e:
+            _LOGGER.error("Failed to set line modes: %s", e)
+            raise
+
+    def set_change_detection(self, change_detect):
+        """Change the IC mask on the open device."""
+        value = struct.pack(">H", change_detect)
+        self.change_detect = change_detect
+        if same_value(self.applied_settings.get("IC"), value):
+            return
+        try:
+            self.device.set_parameter("IC", value)
+            self.device.apply_changes()
+            self.applied_settings["IC"] = value
+            _LOGGER.info("Change detection mask set to 0x%04X", change_detect)
+        except Exception as e:
+            _LOGGER.error("Failed to set change detection: %s", e)
+            raise
+
+    def request_sample(self):
+        """Ask the module for an immediate IO sample (IS); raises when it does not answer."""
+        self.device.execute_command("IS")
+
     def disable_io_sampling(self):
         """Disable I/O sampling."""
         try:
             self.device.set_parameter("IR", b'\x00\x00')  # Set IR to 0
             self.device.apply_changes()
+            self.applied_settings["IR"] = b"\x00\x00"
             _LOGGER.info("I/O sampling disabled")
         except Exception as e:
             _LOGGER.error("Failed to disable I/O sampling: %s", e)
@@ -157,6 +284,16 @@ class XBeeDeviceHandler:
             except Exception as e:
                 _LOGGER.error("Error closing XBee device: %s", e)
 
+    def stats(self):
+        elapsed = time.monotonic() - self.opened_at if self.opened_at else 0
+        return {
+            "startup_ms": round(self.timer.total() * 1000),
+            "sample_rate_ms": self.sample_rate_ms,
+            "change_detect": self.change_detect,
+            "samples": self.nodes.samples,
+            "frames_per_s": round(self.nodes.samples / elapsed, 1) if elapsed else 0.0,
+        }
+
     def execute_sequence(self):
         """Execute the full sequence: open, configure, register callback, wait for one sample, disable sampling, close."""
         try:
@@ -0,0 +1,184 @@
+"""
+End-to-end benchmark: simulated XBee on a pty -> engine -> publish filter -> publish
+queue -> MQTTClient -> in-process broker stand-in.
+
+Reports sustained samples/s arriving at the broker and the serial-to-publish latency
+(frame written to the pty until the broker receives the AD0 value), as percentiles.
+Every line is published on every sample so the numbers measure the pipeline, not
+the deadband.
+
+Run from the repository root:
+    python src/bench_end_to_end.py --nodes 50 --rate 10 --seconds 20
+    python src/bench_end_to_end.py --engine digi
+    python src/bench_end_to_end.py --replay /config/xbee_frames.bin --speedup 10
+    python src/bench_end_to_end.py --mqtt-protocol 5 --max-inflight 100   # compare with 311
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from custom_components.xbee_bridge.io_decoder import ADC_MAX, ADC_REFERENCE_V
+from custom_components.xbee_bridge.metrics import METRICS
+from custom_components.xbee_bridge.mqtt_client import MQTTClient
+from custom_components.xbee_bridge.publish_policy import PublishFilter, PublishPolicy
+from custom_components.xbee_bridge.publish_queue import PublishQueue
+from mqtt_broker_stub import MQTTBrokerStub
+from xbee_simulator import XBeeSimulator, sequence_from_counts
+
+TOPIC_BASE = "bench/xbee"
+LATENCY_KEY = "dio0_ad0"
+
+
+class LatencyProbe:
+    """Matches AD0 publishes at the broker to the simulator's frame write times."""
+
+    def __init__(self, simulator):
+        self.simulator = simulator
+        self.latencies = []
+        self.messages = 0
+        self.samples = 0  # AD0 publishes, one per sample
+        self.first = None
+        self.last = None
+
+    def on_publish(self, topic, payload, received):
+        self.messages += 1
+        if not topic.endswith("/" + LATENCY_KEY):
+            return
+        self.samples += 1
+        if self.first is None:
+            self.first = received
+        self.last = received
+        address_hex = topic.split("/")[-2]
+        index = int(address_hex[-8:], 16) - 0x41000000
+        counts = float(payload) * ADC_MAX / ADC_REFERENCE_V
+        written = self.simulator.write_times.get((index, sequence_from_counts(counts)))
+        if written is not None:
+            self.latencies.append(received - written)
+
+
+def build_pipeline(args, broker_port):
+    mqtt = MQTTClient(
+        "127.0.0.1", broker_port,
+        protocol=args.mqtt_protocol,
+        max_inflight=args.max_inflight,
+        topic_aliases=not args.no_topic_aliases,
+        qos={"samples": args.qos},
+        message_expiry_s={"samples": args.expiry_s} if args.expiry_s else None,
+    )
+    mqtt.connect()
+    deadline = time.monotonic() + 5
+    while not mqtt.connected and time.monotonic() < deadline:
+        time.sleep(0.01)
+    if not mqtt.connected:
+        raise SystemExit("Could not connect to the broker stand-in")
+    queue = PublishQueue(mqtt.publish, max_size=100000)
+    queue.start()
+    publish_filter = PublishFilter(PublishPolicy(on_change=False))
+
+    def data_callback(node):
+        values = node.values
+        for key in publish_filter.select(node, time.monotonic()):
+            queue.put(node.topic(key), values[key], True)
+
+    return mqtt, queue, data_callback
+
+
+def run_digi(args, port, data_callback):
+    from custom_components.xbee_bridge.xbee_device_handler import XBeeDeviceHandler
+
+    handler = XBeeDeviceHandler(port, args.baud_rate, args.sample_rate_ms, TOPIC_BASE)
+    handler.set_data_callback(data_callback)
+    handler.open_device()
+    try:
+        handler.configure_device()
+        handler.register_io_sample_callback()
+        time.sleep(args.seconds)
+    finally:
+        handler.close_device()
+    return handler.stats()
+
+
+def run_asyncio(args, port, data_callback):
+    from custom_components.xbee_bridge.async_engine import AsyncXBeeEngine
+
+    async def run():
+        engine = AsyncXBeeEngine(port, args.baud_rate, args.sample_rate_ms, TOPIC_BASE, args.api_mode)
+        engine.set_data_callback(data_callback)
+        await engine.start()
+        try:
+            await asyncio.sleep(args.seconds)
+        finally:
+            await engine.close_device()
+        return engine.stats()
+
+    return asyncio.run(run())
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine", choices=("asyncio", "digi"), default="asyncio")
+    parser.add_argument("--nodes", type=int, default=20)
+    parser.add_argument("--rate", type=float, default=10.0, help="samples per second per node")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--api-mode", type=int, default=1, choices=(1, 2))
+    parser.add_argument("--baud-rate", type=int, default=115200)
+    parser.add_argument("--sample-rate-ms", type=int, default=1000, help="IR written to the simulated module")
+    parser.add_argument("--replay", help="replay a record_frames recording instead of synthetic nodes")
+    parser.add_argument("--speedup", type=float, default=1.0)
+    parser.add_argument("--mqtt-protocol", type=int, default=311, choices=(311, 5))
+    parser.add_argument("--max-inflight", type=int, help="paho max in-flight messages (QoS 1/2)")
+    parser.add_argument("--no-topic-aliases", action="store_true", help="MQTT 5 without topic aliases")
+    parser.add_argument("--qos", type=int, default=0, choices=(0, 1, 2), help="QoS of the sample stream")
+    parser.add_argument("--expiry-s", type=int, help="MQTT 5 message expiry of the sample stream")
+    args = parser.parse_args()
+    if args.engine == "digi" and args.api_mode != 1:
+        parser.error("the digi engine is benchmarked in API mode 1")
+
+    simulator = XBeeSimulator(args.nodes, args.rate, args.api_mode, args.replay, args.speedup)
+    port = simulator.open()
+    probe = LatencyProbe(simulator)
+    broker = MQTTBrokerStub(on_publish=probe.on_publish)
+    mqtt, queue, data_callback = build_pipeline(args, broker.start())
+
+    simulator.start()
+    started = time.perf_counter()
+    try:
+        runner = run_digi if args.engine == "digi" else run_asyncio
+        engine_stats = runner(args, port, data_callback)
+    finally:
+        elapsed = time.perf_counter() - started
+        simulator.stop()
+        queue.stop()
+        mqtt.disconnect()
+        broker.stop()
+
+    window = (probe.last - probe.first) if probe.first is not None and probe.last != probe.first else 0
+    print(f"Engine:              {args.engine} (API mode {args.api_mode})")
+    print(f"Frames written:      {simulator.frames_written} in {elapsed:.1f} s")
+    print(f"Engine stats:        {engine_stats}")
+    per_message = broker.bytes_received / broker.messages if broker.messages else 0
+    print(f"MQTT:                {args.mqtt_protocol}, QoS {args.qos}, max in-flight {args.max_inflight or 'default'}")
+    print(f"Broker:              {broker.messages} messages, {broker.bytes_received} bytes ({per_message:.1f} B/message)")
+    print(f"Publish queue:       {queue.stats()}")
+    if window:
+        print(f"Sustained rate:      {probe.samples / window:.0f} samples/s at the broker")
+    if probe.latencies:
+        latencies = sorted(latency * 1000 for latency in probe.latencies)
+        print(
+            f"Serial-to-publish:   p50 {percentile(latencies, 0.5):.2f} ms, "
+            f"p95 {percentile(latencies, 0.95):.2f} ms, p99 {percentile(latencies, 0.99):.2f} ms, "
+            f"max {latencies[-1]:.2f} ms, mean {statistics.mean(latencies):.2f} ms"
+        )
+    print(f"Parse p95:           {METRICS.histograms['parse'].percentile(0.95)} ms")
+
+
+if __name__ == "__main__":
+    main()
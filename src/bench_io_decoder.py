@@ -0,0 +1,65 @@
+"""
+Micro-benchmark: structured I/O sample decoding vs. the old str() + regex path.
+
+Run from the repository root:
+    python src/bench_io_decoder.py [iterations]
+"""
+import os
+import re
+import sys
+import timeit
+
+from digi.xbee.io import IOSample
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "custom_components", "xbee_bridge"))
+from io_decoder import decode_io_payload, decode_io_sample
+
+# Sample set count, digital mask (DIO3), analog mask (AD2), digital states, AD2 reading
+PAYLOAD_ONE_LINE = bytearray([0x01, 0x00, 0x08, 0x04, 0x00, 0x08, 0x02, 0x1F])
+# DIO4..DIO12 enabled as digital (mask 0x1FF0), AD0..AD3 + supply voltage as analog (mask 0x8F)
+PAYLOAD_ALL_LINES = bytearray(
+    [0x01, 0x1F, 0xF0, 0x8F, 0x15, 0x50,
+     0x00, 0x10, 0x01, 0x20, 0x02, 0x30, 0x03, 0x40, 0x0A, 0x80]
+)
+
+
+def regex_decode(io_sample):
+    """The original io_sample_callback parsing, kept for comparison."""
+    data = {}
+    sample_str = str(io_sample)
+    for line, value in re.findall(r'IOLine\.([A-Z0-9_]+):\s*IOValue\.([A-Z]+)', sample_str):
+        data[line.lower()] = value
+    for line, value_str in re.findall(r'IOLine\.([A-Z0-9_]+):\s*(\d+)', sample_str):
+        data[line.lower()] = f"{(int(value_str) / 1023) * 3.3:.2f}"
+    return data
+
+
+def structured_decode(io_sample):
+    sample = decode_io_sample(io_sample)
+    return dict(sample.items())
+
+
+def raw_decode(payload):
+    sample = decode_io_payload(payload)
+    return dict(sample.items())
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    for name, payload in (("one line", PAYLOAD_ONE_LINE), ("all lines", PAYLOAD_ALL_LINES)):
+        io_sample = IOSample(payload)
+        results = {
+            "str+regex": timeit.timeit(lambda io_sample=io_sample: regex_decode(io_sample), number=iterations),
+            "IOSample masks": timeit.timeit(
+                lambda io_sample=io_sample: structured_decode(io_sample), number=iterations
+            ),
+            "raw payload": timeit.timeit(lambda payload=payload: raw_decode(payload), number=iterations),
+        }
+        baseline = results["str+regex"]
+        print(f"{name} ({iterations} samples):")
+        for label, elapsed in results.items():
+            print(f"  {label:<15} {elapsed / iterations * 1e6:8.2f} us/sample  x{baseline / elapsed:5.1f}")
+
+
+if __name__ == "__main__":
+    main()
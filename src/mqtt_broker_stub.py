@@ -0,0 +1,183 @@
+"""
+Minimal in-process MQTT 3.1.1 / 5 broker stand-in for benchmarks.
+
+Accepts any CONNECT, acknowledges QoS 1 publishes, answers SUBSCRIBE and PINGREQ,
+and records every PUBLISH it receives (topic, payload, receive time) plus bytes on
+the wire. MQTT 5 clients are offered topic aliases, which are resolved per
+connection. It does not route messages to subscribers.
+
+    broker = MQTTBrokerStub()
+    port = broker.start()
+    ...
+    broker.stop()
+"""
+import asyncio
+import threading
+import time
+
+CONNECT = 1
+CONNACK = 2
+PUBLISH = 3
+PUBACK = 4
+SUBSCRIBE = 8
+SUBACK = 9
+PINGREQ = 12
+PINGRESP = 13
+DISCONNECT = 14
+
+MQTT_5 = 5
+PROPERTY_TOPIC_ALIAS = 0x23
+PROPERTY_TOPIC_ALIAS_MAXIMUM = 0x22
+# Size of the fixed-length PUBLISH properties; the rest are strings or binary (2-byte length)
+PROPERTY_SIZES = {0x01: 1, 0x02: 4, 0x0B: None, 0x23: 2}
+
+
+async def read_packet(reader):
+    """Read one MQTT control packet, return (first byte, body, total bytes)."""
+    header = await reader.readexactly(1)
+    length = 0
+    multiplier = 1
+    size = 1
+    while True:
+        byte = (await reader.readexactly(1))[0]
+        size += 1
+        length += (byte & 0x7F) * multiplier
+        if not byte & 0x80:
+            break
+        multiplier *= 128
+    body = await reader.readexactly(length) if length else b""
+    return header[0], body, size + length
+
+
+def read_varint(data, offset):
+    value = 0
+    multiplier = 1
+    while True:
+        byte = data[offset]
+        offset += 1
+        value += (byte & 0x7F) * multiplier
+        if not byte & 0x80:
+            return value, offset
+        multiplier *= 128
+
+
+def topic_alias(properties):
+    """Return the Topic Alias in a PUBLISH property block, or None."""
+    offset = 0
+    while offset < len(properties):
+        identifier = properties[offset]
+        offset += 1
+        if identifier == PROPERTY_TOPIC_ALIAS:
+            return int.from_bytes(properties[offset:offset + 2], "big")
+        size = PROPERTY_SIZES.get(identifier, -1)
+        if size is None:
+            _, offset = read_varint(properties, offset)
+        elif size >= 0:
+            offset += size
+        else:
+            length = int.from_bytes(properties[offset:offset + 2], "big")
+            offset += 2 + length
+            if identifier == 0x26:  # user property: a second string follows
+                length = int.from_bytes(properties[offset:offset + 2], "big")
+                offset += 2 + length
+    return None
+
+
+class MQTTBrokerStub:
+    def __init__(self, host="127.0.0.1", port=0, on_publish=None, topic_alias_maximum=64):
+        self.host = host
+        self.port = port
+        self.on_publish = on_publish  # callable(topic, payload, received) on the broker thread
+        self.topic_alias_maximum = topic_alias_maximum
+        self.messages = 0
+        self.bytes_received = 0
+        self.connections = 0
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def start(self):
+        """Start serving on a background thread and return the bound port."""
+        self._thread = threading.Thread(target=self._run, name="mqtt_broker_stub", daemon=True)
+        self._thread.start()
+        self._ready.wait(5)
+        return self.port
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            tasks = asyncio.all_tasks(self._loop)
+            for task in tasks:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._loop.close()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        version = None
+        aliases = {}  # alias -> topic, per connection
+        try:
+            while True:
+                first, body, size = await read_packet(reader)
+                self.bytes_received += size
+                packet_type = first >> 4
+                if packet_type == CONNECT:
+                    version = body[6]
+                    if version == MQTT_5:
+                        properties = bytes((PROPERTY_TOPIC_ALIAS_MAXIMUM,)) + self.topic_alias_maximum.to_bytes(2, "big")
+                        writer.write(bytes((CONNACK << 4, 3 + len(properties), 0, 0, len(properties))) + properties)
+                    else:
+                        writer.write(bytes((CONNACK << 4, 2, 0, 0)))
+                elif packet_type == PUBLISH:
+                    packet_id = self._publish(first, body, version, aliases)
+                    if packet_id is not None:
+                        writer.write(bytes((PUBACK << 4, 2)) + packet_id)
+                elif packet_type == SUBSCRIBE:
+                    writer.write(bytes((SUBACK << 4 | 0, 3)) + body[:2] + b"\x00")
+                elif packet_type == PINGREQ:
+                    writer.write(bytes((PINGRESP << 4, 0)))
+                elif packet_type == DISCONNECT:
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.CancelledError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _publish(self, first, body, version, aliases):
+        """Record one PUBLISH and return its packet id when it needs a PUBACK."""
+        received = time.perf_counter()
+        self.messages += 1
+        topic_length = int.from_bytes(body[:2], "big")
+        topic = body[2:2 + topic_length].decode()
+        offset = 2 + topic_length
+        packet_id = None
+        if (first >> 1) & 0x03:
+            packet_id = body[offset:offset + 2]
+            offset += 2
+        if version == MQTT_5:
+            length, start = read_varint(body, offset)
+            offset = start + length
+            alias = topic_alias(body[start:offset])
+            if alias is not None:
+                if topic:
+                    aliases[alias] = topic
+                else:
+                    topic = aliases.get(alias, "")
+        if self.on_publish is not None:
+            self.on_publish(topic, body[offset:], received)
+        return packet_id
@@ -0,0 +1,215 @@
+"""
+Simulated XBee coordinator on a pseudo-terminal.
+
+Serves IO sample (0x92) frames from N synthetic nodes at a fixed rate, or replays a
+recording made with the integration's `record_frames` option, and answers local AT
+commands so XBeeDeviceHandler / AsyncXBeeEngine can open and configure it.
+
+Synthetic samples carry DIO3 (digital), AD0 and AD2. AD0 encodes a per-node sequence
+number (count = (seq % 128) * 8) so a benchmark can match a published value back to
+the time its frame was written.
+
+Run from the repository root:
+    python src/xbee_simulator.py --nodes 50 --rate 2
+    python src/xbee_simulator.py --replay /config/xbee_frames.bin
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import tty
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from custom_components.xbee_bridge.api_frames import (
+    API_MODE,
+    AT_STATUS_OK,
+    FRAME_AT_COMMAND,
+    FRAME_AT_RESPONSE,
+    FRAME_IO_SAMPLE_RX,
+    FrameParser,
+    build_frame,
+)
+from custom_components.xbee_bridge.frame_recorder import read_recording
+
+FRAME_AT_COMMAND_QUEUED = 0x09
+SEQUENCE_MODULO = 128
+SEQUENCE_STEP = 8  # ADC counts per sequence step, survives "%.2f" volt formatting
+
+# Answers to AT queries; enough for digi-xbee to identify a Zigbee module
+DEFAULT_PARAMETERS = {
+    "HV": b"\x19\x41",
+    "VR": b"\x21\xA7",
+    "AP": b"\x01",
+    "NI": b"SIMULATOR",
+    "SH": b"\x00\x13\xA2\x00",
+    "SL": b"\x00\x00\x00\x01",
+    "MY": b"\x00\x00",
+    "ID": b"\x00\x00\x00\x00\x00\x00\x00\x00",
+    "D2": b"\x00",
+    "D3": b"\x00",
+    "DH": b"\x00\x00\x00\x00",
+    "DL": b"\x00\x00\x00\x00",
+    "IR": b"\x00\x00",
+    "SC": b"\x00\x01",
+    "PL": b"\x04",
+}
+
+
+def node_address(index):
+    return b"\x00\x13\xA2\x00" + (0x41000000 + index).to_bytes(4, "big")
+
+
+def sequence_from_counts(counts):
+    """Recover the sequence number encoded in AD0 (the inverse of io_sample_frame)."""
+    return round(counts / SEQUENCE_STEP) % SEQUENCE_MODULO
+
+
+def io_sample_frame(address, seq, digital_high, analog):
+    """Frame data of a 0x92 IO sample from `address` with DIO3, AD0 (sequence) and AD2 enabled."""
+    ad0 = (seq % SEQUENCE_MODULO) * SEQUENCE_STEP
+    return (
+        bytes((FRAME_IO_SAMPLE_RX,)) + address + b"\xFF\xFE\x01"
+        + bytes((0x01, 0x00, 0x08, 0x05))  # one sample set, DIO3 digital, AD0 + AD2 analog
+        + bytes((0x00, 0x08 if digital_high else 0x00))
+        + ad0.to_bytes(2, "big") + analog.to_bytes(2, "big")
+    )
+
+
+class XBeeSimulator:
+    def __init__(self, nodes=10, rate_hz=1.0, api_mode=API_MODE, replay=None, speedup=1.0):
+        self.nodes = nodes
+        self.rate_hz = rate_hz
+        self.api_mode = api_mode
+        self.replay = replay
+        self.speedup = speedup
+        self.parameters = dict(DEFAULT_PARAMETERS)
+        self.port = None
+        self.frames_written = 0
+        self.at_commands = 0
+        # (node index, seq % SEQUENCE_MODULO) -> perf_counter() when the frame was written
+        self.write_times = {}
+        self._master = None
+        self._slave = None
+        self._stop = threading.Event()
+        self._threads = []
+        self._write_lock = threading.Lock()
+        self._parser = FrameParser(self._on_frame, api_mode)
+
+    def open(self):
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        tty.setraw(self._master)
+        self.port = os.ttyname(self._slave)
+        return self.port
+
+    def start(self):
+        self._stop.clear()
+        source = self._replay if self.replay else self._synthetic
+        for target in (self._read_commands, source):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._threads = []
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                os.close(fd)
+        self._master = self._slave = None
+
+    def _write(self, frame_data):
+        data = build_frame(frame_data, self.api_mode)
+        with self._write_lock:
+            os.write(self._master, data)
+
+    # AT command responder
+
+    def _read_commands(self):
+        while not self._stop.is_set():
+            try:
+                data = os.read(self._master, 4096)
+            except OSError:
+                return
+            if data:
+                self._parser.feed(data)
+
+    def _on_frame(self, frame):
+        if frame[0] not in (FRAME_AT_COMMAND, FRAME_AT_COMMAND_QUEUED):
+            return
+        self.at_commands += 1
+        frame_id = frame[1]
+        command = bytes(frame[2:4]).decode()
+        parameter = bytes(frame[4:])
+        if parameter:
+            self.parameters[command] = parameter
+            value = b""
+        else:
+            value = self.parameters.get(command, b"")
+        if frame_id:
+            self._write(bytes((FRAME_AT_RESPONSE, frame_id)) + command.encode() + bytes((AT_STATUS_OK,)) + value)
+
+    # Sample sources
+
+    def _synthetic(self):
+        """Round-robin over the nodes, writing whatever frames are due every few milliseconds."""
+        total_rate = self.nodes * self.rate_hz
+        addresses = [node_address(index) for index in range(self.nodes)]
+        sequences = [0] * self.nodes
+        started = time.perf_counter()
+        sent = 0
+        while not self._stop.is_set():
+            due = int((time.perf_counter() - started) * total_rate)
+            while sent < due:
+                index = sent % self.nodes
+                seq = sequences[index]
+                sequences[index] += 1
+                frame = io_sample_frame(addresses[index], seq, seq & 1, (seq * 37) % 1024)
+                self.write_times[(index, seq % SEQUENCE_MODULO)] = time.perf_counter()
+                self._write(frame)
+                sent += 1
+            self.frames_written = sent
+            time.sleep(0.002)
+
+    def _replay(self):
+        first = None
+        started = time.perf_counter()
+        for timestamp, frame_data in read_recording(self.replay):
+            if self._stop.is_set():
+                return
+            if first is None:
+                first = timestamp
+            delay = (timestamp - first) / self.speedup - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+            self._write(frame_data)
+            self.frames_written += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=1.0, help="samples per second per node")
+    parser.add_argument("--api-mode", type=int, default=API_MODE, choices=(1, 2))
+    parser.add_argument("--replay", help="recording made with the record_frames option")
+    parser.add_argument("--speedup", type=float, default=1.0, help="replay speed factor")
+    args = parser.parse_args()
+
+    simulator = XBeeSimulator(args.nodes, args.rate, args.api_mode, args.replay, args.speedup)
+    print(f"Simulated XBee on {simulator.open()} - point the integration's 'port' at it. Ctrl+C to stop.")
+    simulator.start()
+    try:
+        while True:
+            time.sleep(5)
+            print(f"{simulator.frames_written} frames written, {simulator.at_commands} AT commands answered")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
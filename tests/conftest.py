@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# Import the integration as custom_components.xbee_bridge from the repository root;
+# its requirements (manifest.json) must be installed
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
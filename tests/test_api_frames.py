@@ -0,0 +1,83 @@
+from custom_components.xbee_bridge.api_frames import (
+    API_MODE,
+    API_MODE_ESCAPED,
+    ESCAPE,
+    FrameParser,
+    build_at_command,
+    build_frame,
+    parse_at_response,
+)
+
+# Frame data whose length, payload and checksum all need escaping in API mode 2
+SPECIAL = bytes((0x92, 0x7E, 0x7D, 0x11, 0x13, 0x00, 0x42)) + bytes(0x7E - 7)
+
+
+def collect(api_mode=API_MODE):
+    frames = []
+    parser = FrameParser(lambda frame: frames.append(bytes(frame)), api_mode)
+    return parser, frames
+
+
+def test_escaped_frame_is_unescaped():
+    raw = build_frame(SPECIAL, API_MODE_ESCAPED)
+    assert ESCAPE in raw and len(raw) > len(SPECIAL) + 4
+    parser, frames = collect(API_MODE_ESCAPED)
+    parser.feed(raw)
+    assert frames == [SPECIAL]
+    assert parser.checksum_errors == 0
+
+
+def test_escaped_frames_split_at_every_byte():
+    raw = build_frame(SPECIAL, API_MODE_ESCAPED) + build_frame(b"\x8a\x02", API_MODE_ESCAPED)
+    parser, frames = collect(API_MODE_ESCAPED)
+    # One byte per feed: an escape byte always ends a chunk
+    for b in raw:
+        parser.feed(bytes((b,)))
+    assert frames == [SPECIAL, b"\x8a\x02"]
+    assert parser.frames == 2
+
+
+def test_several_frames_in_one_chunk():
+    raw = build_at_command(1, "IS") + build_frame(b"\x88\x01IS\x00\x01") + build_at_command(2, "D2", b"\x02")
+    parser, frames = collect()
+    parser.feed(raw)
+    assert len(frames) == 3
+    assert parse_at_response(frames[1]) == (1, "IS", 0, b"\x01")
+
+
+def test_bad_checksum_resyncs_on_next_frame():
+    bad = bytearray(build_frame(b"\x8a\x02"))
+    bad[-1] ^= 0xFF
+    parser, frames = collect()
+    parser.feed(bytes(bad) + build_frame(b"\x8a\x06"))
+    assert frames == [b"\x8a\x06"]
+    assert parser.checksum_errors == 1
+
+
+def test_noise_between_frames_is_discarded():
+    parser, frames = collect()
+    parser.feed(b"\x01\x02\x03" + build_frame(b"\x8a\x02") + b"\x04")
+    assert frames == [b"\x8a\x02"]
+    assert parser.discarded_bytes == 4
+
+
+def test_partial_frame_waits_for_the_rest():
+    raw = build_frame(b"\x8a\x02")
+    parser, frames = collect()
+    parser.feed(raw[:3])
+    parser.feed(raw[3:-1])
+    assert frames == []
+    parser.feed(raw[-1:])
+    assert frames == [b"\x8a\x02"]
+
+
+def test_handler_error_does_not_stop_parsing():
+    seen = []
+
+    def on_frame(frame):
+        seen.append(bytes(frame))
+        raise RuntimeError("boom")
+
+    parser = FrameParser(on_frame)
+    parser.feed(build_frame(b"\x8a\x02") + build_frame(b"\x8a\x03"))
+    assert seen == [b"\x8a\x02", b"\x8a\x03"]
@@ -0,0 +1,27 @@
+import pytest
+
+from custom_components.xbee_bridge.async_engine import AsyncXBeeEngine
+
+
+@pytest.fixture
+def engine():
+    return AsyncXBeeEngine("/dev/null", 9600, 1000)
+
+
+def test_frame_ids_wrap_after_255(engine):
+    ids = [engine._next_frame_id() for _ in range(256)]
+    assert ids[:2] == [1, 2]
+    assert ids[254:] == [255, 1]
+
+
+def test_frame_ids_in_flight_are_skipped(engine):
+    engine._frame_id = 254
+    engine._pending[255] = object()
+    engine._collectors[1] = []
+    assert engine._next_frame_id() == 2
+
+
+def test_no_free_frame_id(engine):
+    engine._pending.update((frame_id, object()) for frame_id in range(1, 256))
+    with pytest.raises(RuntimeError):
+        engine._next_frame_id()
@@ -0,0 +1,73 @@
+import json
+
+from custom_components.xbee_bridge.history import LineHistory, SampleHistory
+from custom_components.xbee_bridge.io_decoder import IOSampleData
+from custom_components.xbee_bridge.mqtt_client import STREAM_SAMPLES
+from custom_components.xbee_bridge.node_state import NodeState
+
+ADDRESS = bytes.fromhex("0013A20041000001")
+
+
+class Queue:
+    def __init__(self):
+        self.messages = []
+
+    def put(self, topic, payload, retain=True, stream=None):
+        self.messages.append((topic, payload, retain, stream))
+
+
+def record(history, node, ad1, ad2, received):
+    node.apply(IOSampleData(0, 0, 0b0110, [None, ad1, ad2, None]), received)
+    return history.record(node, received)
+
+
+def test_line_history_wraparound():
+    line = LineHistory(4)
+    for count in range(6):
+        line.append(count, float(count))
+    counts, times = line.recent()
+    assert list(counts) == [2, 3, 4, 5]
+    assert list(times) == [2.0, 3.0, 4.0, 5.0]
+    assert list(line.recent(2)[0]) == [4, 5]
+
+
+def test_line_history_windows():
+    line = LineHistory(4)
+    for count in (10, 30, 20):
+        line.append(count, 0.0)
+    assert line.close_window() == (10, 30, 20.0, 20, 3)
+    assert line.close_window() is None
+    # A window longer than the ring covers what is still in it
+    for count in range(6):
+        line.append(count, 0.0)
+    assert line.close_window() == (2, 5, 3.5, 5, 4)
+
+
+def test_records_only_aggregated_lines():
+    history = SampleHistory(history_size=8, lines=["dio2_ad2"])
+    node = NodeState(ADDRESS)
+    assert record(history, node, 100, 200, 1.0) == ["dio2_ad2"]
+    record(history, node, 101, 201, 2.0)
+    assert history.recent(ADDRESS, "dio2_ad2", 1)["counts"] == [201]
+    assert history.recent(ADDRESS, "dio2_ad2")["counts"] == [200, 201]
+    assert history.recent(ADDRESS, "dio1_ad1") is None
+    assert history.stats()["readings"] == 2
+
+
+def test_windows_are_queued_converted():
+    history = SampleHistory(history_size=8)
+    node = NodeState(ADDRESS)
+    for ad2 in (0, 1023, 512):
+        record(history, node, 10, ad2, 1.0)
+    queue = Queue()
+    history.queue_windows(queue)
+    messages = {topic: (json.loads(payload), retain, stream) for topic, payload, retain, stream in queue.messages}
+    assert messages[node.topic("dio2_ad2/window")] == (
+        {"min": 0.0, "max": 3.3, "mean": 1.65, "last": 1.65, "count": 3}, True, STREAM_SAMPLES,
+    )
+    assert messages[node.topic("dio1_ad1/window")][0]["count"] == 3
+    # Nothing new: no windows
+    queue = Queue()
+    history.queue_windows(queue)
+    assert queue.messages == []
+    assert history.windows == 2
@@ -0,0 +1,67 @@
+import pytest
+
+from custom_components.xbee_bridge.line_map import LineMap, line_command
+
+NODE = "0013A20041000001"
+
+
+def test_line_commands():
+    assert line_command("dio0_ad0") == "D0"
+    assert line_command("dio9") == "D9"
+    assert line_command("dio11_pwm1") == "P1"
+
+
+def test_default_lines():
+    line_map = LineMap()
+    assert line_map.mode_settings() == {"D2": b"\x02", "D3": b"\x03"}
+    lines = line_map.for_node(NODE)
+    assert lines.unit("dio2_ad2") == "V"
+    assert lines.device_class("dio2_ad2") == "voltage"
+    assert lines.tables["dio2_ad2"][1023] == "3.30"
+    assert lines.tables["dio2_ad2"][0] == "0.00"
+
+
+def test_node_overrides_and_previous_map():
+    line_map = LineMap.from_config({
+        "lines": {"dio2_ad2": {"mode": "adc"}},
+        "nodes": {NODE.lower(): {"dio0_ad0": {"mode": "adc"}, "dio4_ad4": {"mode": "digital_out_high"}}},
+    })
+    assert line_map.mode_settings(NODE) == {"D2": b"\x02", "D0": b"\x02", "D4": b"\x05"}
+    # Lines the previous map configured and this one does not are disabled
+    assert line_map.mode_settings(previous=LineMap()) == {"D2": b"\x02", "D3": b"\x00"}
+
+
+def test_transforms_share_tables():
+    thermistor = {"type": "thermistor", "beta": 3950, "r0": 10000, "series_r": 10000}
+    line_map = LineMap(None, {NODE: {
+        "dio0_ad0": {"mode": "adc", "unit": "°C", "device_class": "temperature", "precision": 1,
+                     "transform": thermistor},
+        "dio1_ad1": {"mode": "adc", "unit": "%", "transform": {"type": "table", "points": [[0, 0], [1023, 100]]}},
+        "dio3_ad3": {"mode": "adc", "unit": "°C", "precision": 1, "transform": dict(thermistor)},
+    }})
+    lines = line_map.for_node(NODE)
+    # Equal resistances: the midpoint reads t0
+    assert lines.tables["dio0_ad0"][512] == "25.0"
+    assert lines.tables["dio1_ad1"][1023] == "100.00"
+    assert lines.tables["dio0_ad0"] is lines.tables["dio3_ad3"]
+    assert lines.device_class("dio0_ad0") == "temperature"
+    # A custom unit without a device class has none
+    assert lines.device_class("dio1_ad1") is None
+    assert line_map.for_node(NODE) is lines
+
+
+@pytest.mark.parametrize(("line", "message"), [
+    ({"dio99": {"mode": "adc"}}, "Unknown IO line"),
+    ({"dio2_ad2": {"mode": "analog"}}, "Unknown mode"),
+    ({"dio4_ad4": {"mode": "adc"}}, "has no ADC"),
+    ({"dio2_ad2": {"unit": 5}}, "Invalid unit for dio2_ad2"),
+    ({"dio2_ad2": {"device_class": "Temperature"}}, "Invalid device_class for dio2_ad2"),
+])
+def test_invalid_lines(line, message):
+    with pytest.raises(ValueError, match=message):
+        LineMap(line)
+
+
+def test_invalid_node_line_names_the_node():
+    with pytest.raises(ValueError, match=f"dio0_ad0 of node {NODE}"):
+        LineMap(None, {NODE: {"dio0_ad0": {"device_class": ""}}})
@@ -0,0 +1,62 @@
+import pytest
+
+from custom_components.xbee_bridge.io_decoder import IOSampleData
+from custom_components.xbee_bridge.node_state import SAMPLE_TIME_KEY, NodeState
+from custom_components.xbee_bridge.publish_policy import ADC_COUNTS_PER_V, PublishFilter
+
+
+def make_node():
+    return NodeState(bytes.fromhex("0013A20041000001"))
+
+
+def select(publish_filter, node, analog, digital=1, supply=None, now=0.0):
+    node.apply(IOSampleData(0b1000, digital << 3, 0b0100, [None, None, analog, None], supply), now)
+    return publish_filter.select(node, now)
+
+
+def test_first_sample_publishes_everything():
+    publish_filter = PublishFilter()
+    assert select(publish_filter, make_node(), 500, supply=3000) == [
+        "dio3_ad3", "dio2_ad2", "supply_voltage", SAMPLE_TIME_KEY,
+    ]
+
+
+def test_unchanged_sample_is_suppressed():
+    publish_filter = PublishFilter()
+    node = make_node()
+    select(publish_filter, node, 500)
+    assert select(publish_filter, node, 500, now=1.0) == []
+    assert publish_filter.stats() == {"published": 3, "suppressed": 3}
+
+
+def test_deadband_and_digital_change():
+    publish_filter = PublishFilter.from_config({"deadband_counts": 5})
+    node = make_node()
+    select(publish_filter, node, 500)
+    assert select(publish_filter, node, 505, now=1.0) == []
+    assert select(publish_filter, node, 506, now=2.0) == ["dio2_ad2", SAMPLE_TIME_KEY]
+    # Digital lines ignore the deadband
+    assert select(publish_filter, node, 506, digital=0, now=3.0) == ["dio3_ad3", SAMPLE_TIME_KEY]
+
+
+def test_heartbeat_republishes_unchanged_values():
+    publish_filter = PublishFilter.from_config({"heartbeat_s": 60, "lines": {"dio3_ad3": {"heartbeat_s": 0}}})
+    node = make_node()
+    select(publish_filter, node, 500)
+    assert select(publish_filter, node, 500, now=59.0) == []
+    assert select(publish_filter, node, 500, now=60.0) == ["dio2_ad2", SAMPLE_TIME_KEY]
+
+
+def test_deadband_in_volts_and_supply_scale():
+    publish_filter = PublishFilter.from_config({
+        "deadband_v": 0.1,
+        "lines": {"dio2_ad2": {"on_change": False}},
+    })
+    assert publish_filter.policy("dio1_ad1").deadband == pytest.approx(0.1 * ADC_COUNTS_PER_V)
+    # The top-level deadband is on the ADC scale and does not apply to the supply voltage
+    assert publish_filter.policy("supply_voltage").deadband == 0
+    node = make_node()
+    select(publish_filter, node, 500, supply=3000)
+    assert select(publish_filter, node, 500, supply=3001, now=1.0) == [
+        "dio2_ad2", "supply_voltage", SAMPLE_TIME_KEY,
+    ]
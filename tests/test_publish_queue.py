@@ -0,0 +1,80 @@
+import pytest
+
+from custom_components.xbee_bridge.publish_queue import OVERFLOW_COALESCE, PublishQueue
+
+
+class Recorder:
+    def __init__(self, result=True):
+        self.result = result
+        self.messages = []
+
+    def __call__(self, topic, payload, retain, stream):
+        if isinstance(self.result, Exception):
+            raise self.result
+        self.messages.append((topic, payload, retain, stream))
+        return self.result
+
+
+def drain(queue):
+    # stop() publishes whatever is queued before the thread exits
+    queue.start()
+    queue.stop()
+
+
+def test_coalesce_keeps_latest_value_in_first_position():
+    recorder = Recorder()
+    queue = PublishQueue(recorder, overflow=OVERFLOW_COALESCE)
+    queue.put("a", "1")
+    queue.put("b", "1")
+    queue.put("a", "2", retain=False, stream=1)
+    assert queue.depth == 2
+    drain(queue)
+    assert recorder.messages == [("a", "2", False, 1), ("b", "1", True, None)]
+    assert queue.stats()["coalesced"] == 1
+    assert queue.stats()["published"] == 2
+
+
+def test_coalesce_overflow_drops_oldest_topic():
+    recorder = Recorder()
+    queue = PublishQueue(recorder, max_size=2, overflow=OVERFLOW_COALESCE)
+    queue.put("a", "1")
+    queue.put("b", "1")
+    queue.put("b", "2")
+    queue.put("c", "1")
+    drain(queue)
+    assert recorder.messages == [("b", "2", True, None), ("c", "1", True, None)]
+    assert queue.stats()["dropped"] == 1
+
+
+def test_drop_oldest_overflow():
+    recorder = Recorder()
+    queue = PublishQueue(recorder, max_size=2)
+    for i in range(4):
+        queue.put("a", str(i))
+    assert queue.stats()["max_depth"] == 2
+    drain(queue)
+    assert [payload for _, payload, _, _ in recorder.messages] == ["2", "3"]
+    assert queue.stats()["dropped"] == 2
+
+
+def test_drains_in_batches():
+    recorder = Recorder()
+    queue = PublishQueue(recorder, batch_size=3)
+    for i in range(10):
+        queue.put(f"t/{i}", str(i))
+    drain(queue)
+    assert [topic for topic, _, _, _ in recorder.messages] == [f"t/{i}" for i in range(10)]
+
+
+@pytest.mark.parametrize("result", [False, RuntimeError("broker gone")])
+def test_failed_publishes_are_counted(result):
+    queue = PublishQueue(Recorder(result))
+    queue.put("a", "1")
+    drain(queue)
+    assert queue.stats()["failed"] == 1
+    assert queue.stats()["published"] == 0
+
+
+def test_unknown_overflow_policy():
+    with pytest.raises(ValueError):
+        PublishQueue(Recorder(), overflow="block")
@@ -0,0 +1,65 @@
+import pytest
+
+from custom_components.xbee_bridge.io_decoder import IOSampleData
+from custom_components.xbee_bridge.sample_ring import SampleRing, sample_from_record
+
+ADDRESS = bytes.fromhex("0013A20041000001")
+
+
+@pytest.fixture
+def ring():
+    ring = SampleRing.create(capacity=4)
+    yield ring
+    ring.close(unlink=True)
+
+
+def sample(value, supply=None):
+    return IOSampleData(0b1000, 0b1000, 0b0100, [None, None, value, None], supply)
+
+
+def values(records):
+    return [sample_from_record(record)[1].analog(2) for record in records]
+
+
+def test_record_round_trip(ring):
+    ring.write(ADDRESS, sample(512, supply=3000), 12.5)
+    (record,) = ring.read_batch()
+    address, decoded, received = sample_from_record(record)
+    assert address == ADDRESS
+    assert received == 12.5
+    assert list(decoded.items()) == [("dio3_ad3", 1), ("dio2_ad2", 512), ("supply_voltage", 3000)]
+
+
+def test_overflow_drops_new_samples(ring):
+    for value in range(6):
+        ring.write(ADDRESS, sample(value), float(value))
+    stats = ring.stats()
+    assert stats["dropped"] == 2
+    assert stats["high_water"] == 4
+    assert stats["backlog"] == 4
+    # The oldest samples are kept, the ones that did not fit are lost
+    assert values(ring.read_batch()) == [0, 1, 2, 3]
+    assert ring.read_batch() == []
+
+
+def test_batches_keep_order_across_wraparound(ring):
+    for value in range(3):
+        ring.write(ADDRESS, sample(value), 0.0)
+    assert values(ring.read_batch()) == [0, 1, 2]
+    # Slots 3, 0, 1, 2: the batch is read in two parts
+    for value in range(3, 7):
+        ring.write(ADDRESS, sample(value), 0.0)
+    assert values(ring.read_batch()) == [3, 4, 5, 6]
+    assert ring.stats()["dropped"] == 0
+
+
+def test_wakes_reader_once_per_batch(ring):
+    # A new ring counts as drained: the first write wakes the reader, the next ones do not
+    assert ring.write(ADDRESS, sample(1), 0.0)
+    assert not ring.write(ADDRESS, sample(2), 0.0)
+    assert len(ring.read_batch()) == 2
+    assert not ring.write(ADDRESS, sample(3), 0.0)
+    assert len(ring.read_batch()) == 1
+    # Only a read that finds the ring empty sets the waiting flag again
+    assert ring.read_batch() == []
+    assert ring.write(ADDRESS, sample(4), 0.0)
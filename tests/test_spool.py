@@ -0,0 +1,99 @@
+import pytest
+
+from custom_components.xbee_bridge.spool import HEADER, DiskSpool
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "spool.bin")
+
+
+def topics(records):
+    return [topic for _, _, topic, _, _, _ in records]
+
+
+def test_replays_in_append_order(path):
+    spool = DiskSpool(path, capacity=8)
+    for i in range(5):
+        spool.append(f"t/{i}", str(i))
+    records = spool.peek(10)
+    assert [seq for seq, *_ in records] == [0, 1, 2, 3, 4]
+    assert topics(records) == ["t/0", "t/1", "t/2", "t/3", "t/4"]
+    assert [bytes(payload) for _, _, _, payload, _, _ in records] == [b"0", b"1", b"2", b"3", b"4"]
+    spool.close()
+
+
+def test_release_removes_sent_records(path):
+    spool = DiskSpool(path, capacity=8)
+    for i in range(5):
+        spool.append(f"t/{i}", str(i))
+    records = spool.peek(2)
+    spool.release(records[-1][0])
+    assert len(spool) == 3
+    assert topics(spool.peek(10)) == ["t/2", "t/3", "t/4"]
+    # Releasing an already released or future sequence neither rewinds nor overshoots
+    spool.release(0)
+    assert len(spool) == 3
+    spool.release(100)
+    assert len(spool) == 0
+    assert spool.peek(10) == []
+    spool.close()
+
+
+def test_wraparound_evicts_oldest(path):
+    spool = DiskSpool(path, capacity=4)
+    for i in range(7):
+        spool.append(f"t/{i}", str(i))
+    assert len(spool) == 4
+    assert spool.evicted == 3
+    records = spool.peek(10)
+    assert [seq for seq, *_ in records] == [3, 4, 5, 6]
+    assert topics(records) == ["t/3", "t/4", "t/5", "t/6"]
+    spool.close()
+
+
+def test_wraparound_replay_after_partial_release(path):
+    spool = DiskSpool(path, capacity=4)
+    for i in range(3):
+        spool.append(f"t/{i}", str(i))
+    spool.release(spool.peek(2)[-1][0])
+    # The ring wraps: sequences 4 and 5 land in slots 0 and 1
+    for i in range(3, 6):
+        spool.append(f"t/{i}", str(i))
+    assert spool.evicted == 0
+    assert topics(spool.peek(10)) == ["t/2", "t/3", "t/4", "t/5"]
+    spool.close()
+
+
+def test_reopen_keeps_pending_records(path):
+    spool = DiskSpool(path, capacity=4)
+    for i in range(6):
+        spool.append(f"t/{i}", str(i), retain=i % 2 == 0, stream=i % 3)
+    spool.release(2)
+    spool.close()
+
+    spool = DiskSpool(path, capacity=4)
+    records = spool.peek(10)
+    assert [seq for seq, *_ in records] == [3, 4, 5]
+    assert topics(records) == ["t/3", "t/4", "t/5"]
+    assert [(retain, stream) for _, _, _, _, retain, stream in records] == [(False, 0), (True, 1), (False, 2)]
+    assert spool.stats()["evicted"] == 2
+    spool.close()
+
+
+def test_incompatible_layout_starts_empty(path):
+    spool = DiskSpool(path, capacity=4)
+    spool.append("t/0", "0")
+    HEADER.pack_into(spool._map, 0, b"XBSPOOL0", spool.record_size, spool.capacity, 0, 1, 0)
+    spool.close()
+    spool = DiskSpool(path, capacity=4)
+    assert len(spool) == 0
+    spool.close()
+
+
+def test_message_too_large_is_rejected(path):
+    spool = DiskSpool(path, capacity=4, record_size=32)
+    assert not spool.append("t", "x" * 32)
+    assert spool.append("t", "x")
+    assert spool.stats() == {"pending": 1, "capacity": 4, "evicted": 0, "rejected": 1}
+    spool.close()